@@ -0,0 +1,120 @@
+"""
+Content-Addressed Training Data Cache
+=====================================
+Stores what the training scripts prepare before any model is fitted (the
+built dataset, train/test split, fitted LabelEncoders/scaler and CV fold
+indices) under a key derived from everything that determines it:
+
+- the bytes of the five CSV files (hashed without parsing them),
+- the version of the student roster (same content hash the API uses),
+- the source of the dataset builder functions and of the modules they
+  depend on (features, subject taxonomy, feature store) and FEATURES_VERSION,
+- the split parameters.
+
+A re-run with unchanged inputs loads the prepared data with joblib and goes
+straight to model fitting; any change produces a new key, so stale entries
+are never read. Old entries are pruned beyond MAX_ENTRIES.
+
+Layout:
+    training_cache/<key>.joblib
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import joblib
+
+from analysis.features import CSV_DIR, CSV_SOURCES
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'training_cache')
+
+# Cache entries kept on disk (least recently written are removed first)
+MAX_ENTRIES = 8
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def csv_digests():
+    """Content hash of every CSV source: key -> digest"""
+    return {key: file_digest(os.path.join(CSV_DIR, filename)) for key, filename in CSV_SOURCES.items()}
+
+
+def code_digest(*objects):
+    """Hash of the source code of functions/modules (the builder code version)"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cache_key(**parts):
+    """Stable key of the JSON-serializable inputs"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:24]
+
+
+class TrainingCache:
+    """
+    Prepared training data on disk, one joblib file per input key
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.joblib")
+
+    def load(self, key):
+        """Cached payload of a key (None if missing or unreadable)"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            print(f"  ⚠️ Ignoring unreadable cache entry {key}: {e}")
+            return None
+
+    def save(self, key, payload):
+        """Write a payload atomically and prune old entries"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(key) + '.tmp'
+        joblib.dump(payload, tmp_path)
+        os.replace(tmp_path, self.path(key))
+        self._prune()
+
+    def get_or_build(self, key, build, refresh=False):
+        """
+        Cached payload of a key, building and storing it on a miss
+
+        Args:
+            refresh: Rebuild even if the key is cached
+
+        Returns:
+            (payload, True if it came from the cache)
+        """
+        payload = None if refresh else self.load(key)
+        if payload is not None:
+            return payload, True
+        payload = build()
+        self.save(key, payload)
+        return payload, False
+
+    def _prune(self):
+        entries = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.endswith('.joblib')
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            os.remove(path)
@@ -0,0 +1,518 @@
+"""
+Shared Student Feature Definitions
+==================================
+Helpers, CSV loading and the record builders used by both training scripts
+(train_comprehensive_model.py, train_enhanced_model.py) and by serving
+(services/feature_store.py, the scoring pipeline), so all of them produce
+exactly the same features.
+
+The scalar parsers (parse_si_no, parse_count, ...) define the rules; the
+column-wise transformers apply them once per distinct value of a whole
+column and broadcast the result with a NumPy lookup.
+
+A comprehensive record is built in two steps:
+1. collect_feature_inputs() gathers, per student, only the raw values the
+   features depend on (database fields + the matching CSV rows). These
+   inputs are what the feature store hashes to detect changes.
+2. build_student_records() turns a batch of those inputs into 47-feature
+   records (plus the at_risk target), or None for students that must be
+   skipped.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from services.subject_taxonomy import subject_taxonomy
+
+# Bump when build_student_record changes so stored features are rebuilt
+# (2: subjects resolved through the shared subject taxonomy)
+FEATURES_VERSION = 2
+
+# Expected age by grade level
+EXPECTED_AGE = {
+    '1': 6, '2': 7, '3': 8, '4': 9, '5': 10,
+    '6': 11, '7': 12, '8': 13, '9': 14, '10': 15,
+    '1BGU': 16, '2BGU': 17, '3BGU': 18
+}
+
+# High-risk subjects (based on failure rate analysis)
+HIGH_RISK_SUBJECTS = [
+    'Lengua y Literatura', 'Matemáticas',
+    'Física', 'Emprendimiento', 'Ciencias Naturales',
+    'Educación ciudadanía', 'Inglés'
+]
+
+# Education level by grade
+NIVEL_EDUCATIVO = {
+    '1': 'Basica_Elemental', '2': 'Basica_Elemental', '3': 'Basica_Elemental', '4': 'Basica_Elemental',
+    '5': 'Basica_Media', '6': 'Basica_Media', '7': 'Basica_Media',
+    '8': 'Basica_Superior', '9': 'Basica_Superior', '10': 'Basica_Superior',
+    '1BGU': 'Bachillerato', '2BGU': 'Bachillerato', '3BGU': 'Bachillerato'
+}
+
+# Categorical features of the comprehensive model
+CATEGORICAL_FEATURES = [
+    'nivel_educativo',
+    'age_grade_status',
+    'indice_accesibilidad',
+    'genero',
+    'grupo_socioeconomico',
+    'tipo_vivienda',
+    'material_paredes',
+    'material_piso',
+    'tipo_sanitario',
+    'relacion',
+    'estado_civil',
+    'ocupacion_jefe'
+]
+
+# Directory of the CSV sources (repository root)
+CSV_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# CSV sources: key -> file name
+CSV_SOURCES = {
+    'first_page': 'First page of the students information.csv',
+    'house': 'Information about the house of the student.csv',
+    'habit': 'Information about the habit of the student.csv',
+    'parent': 'Information of the parent.orlegalrepresentative.csv',
+    'economic': 'Economic activity of the student.csv',
+}
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def get_nivel_educativo(grado):
+    """Map grade to education level category"""
+    return NIVEL_EDUCATIVO.get(str(grado), 'Unknown')
+
+def get_age_grade_status(edad, grado):
+    """Determine if student is young/normal/old for their grade"""
+    if not edad or not grado or str(grado) not in EXPECTED_AGE:
+        return 'unknown'
+
+    expected = EXPECTED_AGE[str(grado)]
+    diff = edad - expected
+
+    if diff < -1:
+        return 'young'
+    elif diff > 1:
+        return 'old'
+    return 'normal'
+
+def parse_si_no(value):
+    """Convert Si/No to 1/0"""
+    if pd.isna(value) or value == '':
+        return 0
+    return 1 if str(value).strip().upper() == 'SI' else 0
+
+def parse_count(value):
+    """Parse count fields like TV, Vehiculos, Celulares"""
+    if pd.isna(value) or value == '':
+        return 0
+    val_str = str(value).strip()
+    if '3 o más' in val_str or '4 o más' in val_str or '4 o mas' in val_str:
+        return 4
+    try:
+        return int(val_str)
+    except:
+        return 0
+
+def parse_bathrooms(value):
+    """Parse N_banos text field"""
+    if pd.isna(value) or value == '':
+        return 1
+    val_str = str(value).strip()
+    if 'No tiene' in val_str:
+        return 0
+    elif '3 o más' in val_str:
+        return 3
+    elif '2' in val_str:
+        return 2
+    elif '1' in val_str:
+        return 1
+    return 1
+
+def parse_education_level(value):
+    """Convert education level to numeric"""
+    if pd.isna(value) or value == '':
+        return 2  # Default to secondary incomplete
+
+    mapping = {
+        'sin estudios': 0, 'ninguno': 0,
+        'primaria': 1, 'primaria completa': 1, 'educación básica': 1,
+        'secundaria incompleta': 2,
+        'secundaria': 3, 'secundaria completa': 3, 'bachillerato': 3,
+        'superior': 4, 'educación superior': 4, 'tercer nivel': 4,
+        'postgrado': 5, 'cuarto nivel': 5
+    }
+
+    val_lower = str(value).strip().lower()
+    return mapping.get(val_lower, 2)
+
+def parse_diagnostico(value):
+    """Psychological diagnosis flag from the first page CSV"""
+    return 1 if str(value).upper() == 'SI' else 0
+
+def parse_escuela_procedencia(value):
+    """Previous school flag from the first page CSV"""
+    return 1 if str(value).upper() in ['SI', 'SI '] else 0
+
+def normalize_subject(materia):
+    """Canonical subject name from the shared taxonomy (None if empty)"""
+    return subject_taxonomy.canonical(materia)
+
+def clean_category(value, default):
+    """Replace missing/'nan' categorical values with a default"""
+    if value is None or pd.isna(value) or str(value) == 'nan':
+        return default
+    return str(value)
+
+# ============================================================================
+# COLUMN-WISE TRANSFORMERS
+# ============================================================================
+
+def map_column(values, parse):
+    """Apply a scalar parser once per distinct value of a column (object array)"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    lookup[:-1] = [parse(value) for value in uniques]
+    lookup[-1] = parse(np.nan)  # factorize codes missing values as -1
+    return lookup[codes]
+
+def si_no_column(values):
+    return map_column(values, parse_si_no).astype(np.int64)
+
+def count_column(values):
+    return map_column(values, parse_count).astype(np.int64)
+
+def bathrooms_column(values):
+    return map_column(values, parse_bathrooms).astype(np.int64)
+
+def education_level_column(values):
+    return map_column(values, parse_education_level).astype(np.int64)
+
+def nivel_educativo_column(grado):
+    return map_column(grado, get_nivel_educativo)
+
+def age_grade_status_column(edad, grado):
+    """Column version of get_age_grade_status"""
+    expected = map_column(grado, lambda g: EXPECTED_AGE.get(str(g), np.nan)).astype(float)
+    edad = pd.to_numeric(pd.Series(edad, dtype=object), errors='coerce').to_numpy(dtype=float)
+    diff = edad - expected
+    unknown = np.isnan(edad) | (edad == 0) | np.isnan(expected)
+    return np.select(
+        [unknown, diff < -1, diff > 1], ['unknown', 'young', 'old'], 'normal'
+    ).astype(object)
+
+def derived_scores(columns):
+    """asset_score, tech_score and digital_score from the binary feature columns"""
+    return {
+        'asset_score': (columns['tiene_telefono'] + columns['tiene_cocina'] + columns['tiene_refrigeradora'] +
+                        columns['tiene_lavadora'] + columns['tiene_equipo_sonido'] +
+                        (columns['num_vehiculos'] > 0).astype(np.int64)),
+        'tech_score': columns['tiene_internet'] + columns['tiene_computadora'] + columns['tiene_laptop'],
+        'digital_score': columns['usa_internet'] + columns['usa_correo'] + columns['usa_redes'],
+    }
+
+def rows_by_id(df, ids):
+    """
+    First CSV row of each ID (same row as df[df['ID'] == id].iloc[0])
+
+    Returns:
+        (DataFrame aligned with ids, boolean array of ids with a row)
+    """
+    source = df.drop_duplicates('ID', keep='first').set_index('ID').astype(object)
+    frame = source.reindex(ids).reset_index(drop=True)
+    matched = np.asarray(pd.Index(ids).isin(source.index))
+    return frame, matched
+
+def rows_from_records(rows):
+    """
+    Frame of per-student CSV row dicts (None when the student has no row)
+
+    Returns:
+        (DataFrame aligned with rows, boolean array of students with a row)
+    """
+    matched = np.array([row is not None for row in rows], dtype=bool)
+    return pd.DataFrame([row or {} for row in rows], dtype=object), matched
+
+def parsed_column(frame, matched, column, default, parse):
+    """
+    Parsed CSV column for students with a row, default for the rest
+
+    A column absent from the CSV parses as missing (like row.get(column)).
+    """
+    values = frame[column] if column in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+    return np.where(matched, map_column(values, parse), default).astype(np.int64)
+
+def text_column(frame, matched, column, default, missing=None):
+    """
+    Text CSV column for students with a row, default for the rest
+
+    Missing values (NaN or 'nan') become `missing` (the default if not given);
+    a column absent from the CSV keeps the default.
+    """
+    if column not in frame.columns:
+        return np.full(len(frame), default, dtype=object)
+    missing = default if missing is None else missing
+    text = map_column(frame[column], lambda v: missing if pd.isna(v) or str(v) == 'nan' else str(v))
+    return np.where(matched, text, default)
+
+def numeric_column(frame, matched, column, default):
+    """CSV value for students with a non-missing value, default elsewhere (object array)"""
+    if column in frame.columns:
+        values = frame[column].to_numpy(dtype=object)
+    else:
+        values = np.full(len(frame), np.nan, dtype=object)
+    return np.where(matched & ~pd.isna(values), values, default)
+
+# ============================================================================
+# DATA LOADING
+# ============================================================================
+
+def load_all_csv_data():
+    """Load all CSV files"""
+    print("Loading CSV files...")
+
+    frames = []
+    labels = {
+        'first_page': 'First Page', 'house': 'House', 'habit': 'Habit',
+        'parent': 'Parent', 'economic': 'Economic'
+    }
+    for key, filename in CSV_SOURCES.items():
+        df = pd.read_csv(os.path.join(CSV_DIR, filename), sep=';', encoding='latin-1')
+        df.columns = df.columns.str.strip()
+        print(f"  {labels[key]}: {len(df)} records")
+        frames.append(df)
+
+    return tuple(frames)
+
+def index_by_id(df):
+    """Map ID -> row dict (first row wins, like the original df[df['ID'] == id].iloc[0])"""
+    return df.drop_duplicates('ID', keep='first').set_index('ID').to_dict('index')
+
+def load_csv_sources():
+    """Load all CSV files indexed by numeric student ID"""
+    frames = load_all_csv_data()
+    return {key: index_by_id(df) for key, df in zip(CSV_SOURCES, frames)}
+
+# ============================================================================
+# PER-STUDENT RECORDS
+# ============================================================================
+
+def collect_feature_inputs(students, sources):
+    """
+    Gather the raw inputs of every student's feature record
+
+    Args:
+        students: Student dicts from supabase_client (with nested tables)
+        sources: Output of load_csv_sources()
+
+    Returns:
+        List of (student_id, inputs) for students with an ESTnnn ID
+    """
+    collected = []
+
+    for student in students:
+        student_id = student.get('id', '')
+        if not student_id.startswith('EST'):
+            continue
+
+        try:
+            num_id = int(student_id.replace('EST', ''))
+        except:
+            continue
+
+        socio_list = student.get('socioeconomic_data', [])
+        socio = socio_list[0] if isinstance(socio_list, list) and len(socio_list) > 0 else {}
+
+        academic = [
+            [record.get('materia'), record.get('nota')]
+            for record in student.get('academic_performance', []) or []
+        ]
+
+        inputs = {
+            'student': {
+                'grado': student.get('grado', ''),
+                'edad': student.get('edad'),
+                'genero': student.get('genero', 'Masculino'),
+                'quintil': student.get('quintil', 3),
+                'indice_accesibilidad': socio.get('indice_accesibilidad_geografica'),
+                'academic': sorted(academic, key=lambda r: (str(r[0]), str(r[1]))),
+            }
+        }
+        for key in CSV_SOURCES:
+            inputs[key] = sources[key].get(num_id)
+
+        collected.append((student_id, inputs))
+
+    return collected
+
+# Feature order of the comprehensive record
+RECORD_FEATURES = [
+    'at_risk',
+    'nivel_educativo', 'age_grade_status', 'indice_accesibilidad',
+    'genero', 'quintil', 'grupo_socioeconomico', 'tiene_diagnostico', 'escuela_procedencia',
+    'tipo_vivienda', 'material_paredes', 'material_piso', 'cuartos_bano', 'tipo_sanitario',
+    'tiene_internet', 'tiene_computadora', 'tiene_laptop', 'num_celulares', 'tech_score',
+    'tiene_telefono', 'tiene_cocina', 'tiene_refrigeradora', 'tiene_lavadora', 'tiene_equipo_sonido',
+    'num_tv', 'num_vehiculos', 'asset_score',
+    'usa_internet', 'usa_correo', 'usa_redes', 'digital_score',
+    'compra_ropa_centros', 'lectura_libros',
+    'edad_representante', 'relacion', 'estado_civil', 'nivel_instruccion_num',
+    'tiene_seguro_salud', 'tiene_seguro_privado', 'ocupacion_jefe',
+    'num_subjects', 'high_risk_subject_count',
+    'takes_lengua', 'takes_matematicas', 'takes_ciencias', 'takes_sociales', 'takes_ingles', 'takes_fisica',
+]
+
+# Enrollment flags of the comprehensive record (column -> canonical subject)
+RECORD_TAKES_SUBJECTS = {
+    'takes_lengua': 'Lengua y Literatura',
+    'takes_matematicas': 'Matemáticas',
+    'takes_ciencias': 'Ciencias Naturales',
+    'takes_sociales': 'Estudios Sociales',
+    'takes_ingles': 'Inglés',
+    'takes_fisica': 'Física',
+}
+
+def build_student_records(inputs_list):
+    """
+    Build the comprehensive feature records of a batch of students column-wise
+
+    Args:
+        inputs_list: Entries produced by collect_feature_inputs()
+
+    Returns:
+        List aligned with inputs_list: dict with 'at_risk' + 47 features, or
+        None if the student is skipped (no graded academic records or unknown grade)
+    """
+    students = [inputs['student'] for inputs in inputs_list]
+    n = len(students)
+    if not n:
+        return []
+
+    # Graded academic records of all students in one table
+    grades = pd.DataFrame(
+        [
+            (row, normalize_subject(materia), float(nota))
+            for row, student in enumerate(students)
+            for materia, nota in student['academic']
+            if nota is not None
+        ],
+        columns=['row', 'materia', 'nota']
+    )
+    min_grade = grades.groupby('row')['nota'].min().reindex(range(n))
+
+    # Subject enrollment (NOT grades - they are the target!)
+    enrolled = grades[grades['materia'].notna()].drop_duplicates(['row', 'materia'])
+
+    def subject_count(mask):
+        return np.bincount(enrolled['row'][mask].to_numpy(dtype=np.int64), minlength=n)
+
+    # Education level and age-grade status
+    grado = [student['grado'] for student in students]
+    nivel_educativo = nivel_educativo_column(grado)
+    keep = min_grade.notna().to_numpy() & (nivel_educativo != 'Unknown')
+
+    fp, has_fp = rows_from_records([inputs['first_page'] for inputs in inputs_list])
+    house, has_house = rows_from_records([inputs['house'] for inputs in inputs_list])
+    habit, has_habit = rows_from_records([inputs['habit'] for inputs in inputs_list])
+    parent, has_parent = rows_from_records([inputs['parent'] for inputs in inputs_list])
+    economic, has_economic = rows_from_records([inputs['economic'] for inputs in inputs_list])
+
+    quintil = numeric_column(fp, has_fp, 'Quintil', [student['quintil'] for student in students])
+    edad_representante = numeric_column(parent, has_parent, 'Edad', 35)
+
+    columns = {
+        # TARGET: at_risk if ANY subject grade <= 7.5
+        'at_risk': (min_grade <= 7.5).to_numpy().astype(np.int64),
+
+        # Education structure
+        'nivel_educativo': nivel_educativo,
+        'age_grade_status': age_grade_status_column([student['edad'] for student in students], grado),
+
+        # Geographic (from database)
+        'indice_accesibilidad': [student['indice_accesibilidad'] or 'Moderado' for student in students],
+
+        # Demographics
+        'genero': [student['genero'] or 'Masculino' for student in students],
+        'quintil': np.where(pd.isna(quintil), 3, quintil).astype(float).astype(np.int64),
+        'grupo_socioeconomico': text_column(fp, has_fp, 'Grupo socioeconomico', 'Medio Tipico', 'Desconocido'),
+        'tiene_diagnostico': parsed_column(fp, has_fp, 'nombre_Diagnostico psicologico', 0, parse_diagnostico),
+        'escuela_procedencia': parsed_column(fp, has_fp, 'Escuela_Procedencia', 0, parse_escuela_procedencia),
+
+        # Housing
+        'tipo_vivienda': text_column(house, has_house, 'Tipo vivienda', 'Casa/Villa'),
+        'material_paredes': text_column(house, has_house, 'Material_Pared', 'Ladrillo'),
+        'material_piso': text_column(house, has_house, 'Material_Piso', 'Cerámica/Baldosa'),
+        'cuartos_bano': parsed_column(house, has_house, 'N_banos', 1, parse_bathrooms),
+        'tipo_sanitario': text_column(house, has_house, 'Servicio_Higienico', 'Conectado a red pública'),
+
+        # Technology
+        'tiene_internet': parsed_column(house, has_house, 'Internet', 0, parse_si_no),
+        'tiene_computadora': parsed_column(house, has_house, 'Computadora', 0, parse_si_no),
+        'tiene_laptop': parsed_column(house, has_house, 'Laptop', 0, parse_si_no),
+        'num_celulares': parsed_column(house, has_house, 'Celulares', 2, parse_count),
+
+        # Household assets
+        'tiene_telefono': parsed_column(habit, has_habit, 'Telefono_convencional', 0, parse_si_no),
+        'tiene_cocina': parsed_column(habit, has_habit, 'Cocina_horno', 1, parse_si_no),
+        'tiene_refrigeradora': parsed_column(habit, has_habit, 'Refrigeradora', 1, parse_si_no),
+        'tiene_lavadora': parsed_column(habit, has_habit, 'Lavadora', 1, parse_si_no),
+        'tiene_equipo_sonido': parsed_column(habit, has_habit, 'Equipo de sonido', 0, parse_si_no),
+        'num_tv': parsed_column(habit, has_habit, 'TV', 1, parse_count),
+        'num_vehiculos': parsed_column(habit, has_habit, 'Vehiculos', 0, parse_count),
+
+        # Digital habits
+        'usa_internet': parsed_column(habit, has_habit, 'Uso_Internet', 1, parse_si_no),
+        'usa_correo': parsed_column(habit, has_habit, 'Uso_correo', 1, parse_si_no),
+        'usa_redes': parsed_column(habit, has_habit, 'Red_social', 1, parse_si_no),
+
+        # Other habits
+        'compra_ropa_centros': parsed_column(habit, has_habit, 'Compra_Ropa_Centros', 0, parse_si_no),
+        'lectura_libros': parsed_column(habit, has_habit, 'Lectura_libros', 0, parse_si_no),
+
+        # Family
+        'edad_representante': np.where(pd.isna(edad_representante), 35, edad_representante)
+            .astype(float).astype(np.int64),
+        'relacion': text_column(parent, has_parent, 'Relacion', 'Madre'),
+        'estado_civil': text_column(parent, has_parent, 'Estado civil', 'Casado'),
+        'nivel_instruccion_num': education_level_column(
+            text_column(parent, has_parent, 'Nivel Instruccion', 'Secundaria completa')
+        ),
+
+        # Economic
+        'tiene_seguro_salud': parsed_column(economic, has_economic, 'Seguro_Salud', 1, parse_si_no),
+        'tiene_seguro_privado': parsed_column(economic, has_economic, 'Seguro_Privado', 0, parse_si_no),
+        'ocupacion_jefe': text_column(economic, has_economic, 'Ocupacion_Jefe', 'Servicios'),
+
+        # Academic - Subject enrollment (NOT grades!)
+        'num_subjects': subject_count(slice(None)),
+        'high_risk_subject_count': subject_count(enrolled['materia'].isin(HIGH_RISK_SUBJECTS)),
+    }
+    for col, materia in RECORD_TAKES_SUBJECTS.items():
+        columns[col] = (subject_count(enrolled['materia'] == materia) > 0).astype(np.int64)
+    columns.update(derived_scores(columns))
+
+    records = pd.DataFrame(columns)[RECORD_FEATURES]
+
+    # Same cleanup the DataFrame used to apply to categorical columns
+    for col in CATEGORICAL_FEATURES:
+        records[col] = map_column(records[col], lambda value: clean_category(value, 'Desconocido'))
+
+    built = iter(records[keep].to_dict('records'))
+    return [next(built) if kept else None for kept in keep]
+
+def build_student_record(inputs):
+    """
+    Build the comprehensive feature record for one student
+
+    Args:
+        inputs: One entry produced by collect_feature_inputs()
+
+    Returns:
+        dict with 'at_risk' + 47 features, or None if the student is skipped
+    """
+    return build_student_records([inputs])[0]
@@ -0,0 +1,234 @@
+"""
+Budgeted Hyperparameter Search
+==============================
+Hyperband over the tree models of the training scripts: each bracket samples
+configurations from SEARCH_SPACES, scores them by CV ROC-AUC with a small
+number of boosting rounds and keeps the best 1/eta of every model for the
+next rung, which gets eta times more rounds (successive halving). Brackets
+go from many cheap candidates to a few at the full round budget, so poor
+configurations are dropped after a fraction of the work.
+
+- Rungs run through compare_models: all (candidate, fold) tasks of a rung
+  share the process pool, across every model being tuned.
+- CatBoost, XGBoost and LightGBM early-stop each fold fit on an inner
+  split of the fold's training rows (never on the validation rows it is
+  scored on, nor on the test set); the final estimator gets the median
+  number of rounds its folds kept.
+- The search stops at a wall-clock budget: a rung is only started when its
+  estimated time (from the measured time per round of the previous rungs)
+  fits in what is left.
+
+Models whose estimator class has no entry in SEARCH_SPACES keep their fixed
+hyperparameters.
+"""
+
+import copy
+import math
+import time
+import numpy as np
+
+from analysis.model_comparison import compare_models
+
+# Sampled hyperparameters per estimator class (matched by class name prefix)
+SEARCH_SPACES = {
+    'CatBoost': {
+        'depth': [4, 5, 6, 7, 8],
+        'learning_rate': [0.02, 0.03, 0.05, 0.08, 0.12],
+        'l2_leaf_reg': [1, 3, 5, 7, 10],
+        'random_strength': [0.5, 1, 2],
+    },
+    'XGB': {
+        'max_depth': [3, 4, 5, 6, 8],
+        'learning_rate': [0.02, 0.03, 0.05, 0.08, 0.12],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'min_child_weight': [1, 3, 5],
+    },
+    'LGBM': {
+        'num_leaves': [15, 31, 63],
+        'max_depth': [-1, 4, 6, 8],
+        'learning_rate': [0.02, 0.03, 0.05, 0.08, 0.12],
+        'subsample': [0.6, 0.8, 1.0],
+        'subsample_freq': [1],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'min_child_samples': [10, 20, 40],
+    },
+    'GradientBoosting': {
+        'max_depth': [2, 3, 4, 6],
+        'learning_rate': [0.02, 0.05, 0.1],
+        'subsample': [0.6, 0.8, 1.0],
+        'min_samples_leaf': [1, 5, 10],
+    },
+    'RandomForest': {
+        'max_depth': [4, 6, 8, 12, None],
+        'min_samples_leaf': [1, 2, 5],
+        'max_features': ['sqrt', 'log2', 0.5],
+    },
+}
+
+# Parameter holding the number of rounds/trees (the Hyperband resource)
+RESOURCE_PARAMS = {
+    'CatBoost': 'iterations',
+    'XGB': 'n_estimators',
+    'LGBM': 'n_estimators',
+    'GradientBoosting': 'n_estimators',
+    'RandomForest': 'n_estimators',
+}
+
+# Families that early-stop during the CV fits (see fit_with_early_stopping)
+EARLY_STOPPING = ('CatBoost', 'XGB', 'LGBM')
+
+
+def model_family(model):
+    """SEARCH_SPACES key of an estimator (None if it is not searched)"""
+    kind = type(model).__name__
+    for family in SEARCH_SPACES:
+        if kind.startswith(family):
+            return family
+    return None
+
+
+def sample_configs(space, n, rng):
+    """n random configurations of a search space"""
+    return [{param: values[rng.integers(len(values))] for param, values in space.items()} for _ in range(n)]
+
+
+def hyperband_brackets(max_resource, min_resource, eta):
+    """
+    Successive halving schedule of every Hyperband bracket
+
+    Returns:
+        list of brackets, each a list of (n_candidates, rounds) rungs
+    """
+    s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+    brackets = []
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+        brackets.append([
+            (max(1, n // eta ** i), int(round(max_resource * eta ** (i - s))))
+            for i in range(s + 1)
+        ])
+    return brackets
+
+
+def hyperband_search(models, data, y_train, y_test, folds, budget_seconds,
+                     max_resource=1000, min_resource=40, eta=3, early_stopping_rounds=50,
+                     seed=42, n_workers=None):
+    """
+    Tune the searchable models within a wall-clock budget
+
+    Args:
+        models: dict name -> estimator with the fixed hyperparameters (the
+            base every sampled configuration is applied to)
+        data: dict name -> (X_train, X_test), as for compare_models
+        y_train, y_test: Targets
+        folds: Precomputed (train, validation) index pairs
+        budget_seconds: Wall-clock budget of the whole search
+        max_resource, min_resource: Largest and smallest round budget of a rung
+        eta: Fraction of candidates dropped per rung is 1 - 1/eta
+
+    Returns:
+        (tuned, trials): dict name -> unfitted estimator with the best
+        configuration found (only models that completed a rung), and the list
+        of every evaluated (model, params, rounds, cv score) trial
+    """
+    searched = {name: model for name, model in models.items() if model_family(model)}
+    if not searched:
+        return {}, []
+
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    seconds_per_round = None
+    trials = []
+
+    print(f"\n🔎 Hyperband search: {', '.join(searched)} | budget {budget_seconds:.0f}s")
+
+    for bracket_index, bracket in enumerate(hyperband_brackets(max_resource, min_resource, eta)):
+        n_first = bracket[0][0]
+        candidates = {
+            name: sample_configs(SEARCH_SPACES[model_family(model)], n_first, rng)
+            for name, model in searched.items()
+        }
+
+        for n_candidates, rounds in bracket:
+            tasks = {}
+            for name, configs in candidates.items():
+                model = searched[name]
+                family = model_family(model)
+                for i, params in enumerate(configs):
+                    candidate = copy.deepcopy(model).set_params(**params, **{RESOURCE_PARAMS[family]: rounds})
+                    tasks[(name, i)] = candidate
+            work = len(tasks) * rounds
+
+            elapsed = time.perf_counter() - start
+            if seconds_per_round is not None and elapsed + seconds_per_round * work > budget_seconds:
+                print(f"   Budget reached after {elapsed:.0f}s")
+                return _best_models(searched, trials), trials
+
+            rung_start = time.perf_counter()
+            labels = {f"{name}#{i}": (name, i) for name, i in tasks}
+            comparison = compare_models(
+                {label: tasks[key] for label, key in labels.items()},
+                {label: data[key[0]] for label, key in labels.items()},
+                y_train, y_test, folds,
+                n_workers=n_workers, holdout=False, verbose=False,
+                early_stopping_rounds=early_stopping_rounds
+            )
+            rung_wall = time.perf_counter() - rung_start
+            seconds_per_round = rung_wall / work
+
+            scored = {}
+            for label, (name, i) in labels.items():
+                run = comparison[label]
+                if run.error is not None or len(run.cv_scores) != len(folds):
+                    continue
+                trial = {
+                    'model': name,
+                    'params': candidates[name][i],
+                    'rounds': rounds,
+                    'kept_rounds': _kept_rounds(run.cv_rounds, searched[name], rounds),
+                    'cv_mean': float(np.mean(run.cv_scores)),
+                    'cv_std': float(np.std(run.cv_scores)),
+                    'bracket': bracket_index,
+                }
+                trials.append(trial)
+                scored.setdefault(name, []).append((trial['cv_mean'], i))
+
+            best = max((score for runs in scored.values() for score, _ in runs), default=float('nan'))
+            print(f"   Bracket {bracket_index} | {len(tasks)} candidates x {rounds} rounds | "
+                  f"best CV AUC {best:.4f} | {rung_wall:.1f}s")
+
+            # Keep the best 1/eta of each model for the next rung
+            keep = max(1, n_candidates // eta)
+            candidates = {
+                name: [candidates[name][i] for _, i in sorted(runs, key=lambda r: -r[0])[:keep]]
+                for name, runs in scored.items()
+            }
+
+    print(f"   Search finished in {time.perf_counter() - start:.0f}s ({len(trials)} trials)")
+    return _best_models(searched, trials), trials
+
+
+def _kept_rounds(cv_rounds, model, rounds):
+    """Median rounds kept by early stopping across the folds (the rung's rounds otherwise)"""
+    kept = [r for r in cv_rounds if r is not None]
+    if model_family(model) not in EARLY_STOPPING or not kept:
+        return rounds
+    return int(np.median(kept))
+
+
+def _best_models(searched, trials):
+    """Best configuration of each model among its trials at the most rounds it reached"""
+    tuned = {}
+    for name, model in searched.items():
+        model_trials = [t for t in trials if t['model'] == name]
+        if not model_trials:
+            continue
+        most_rounds = max(t['rounds'] for t in model_trials)
+        best = max((t for t in model_trials if t['rounds'] == most_rounds), key=lambda t: t['cv_mean'])
+        family = model_family(model)
+        tuned[name] = copy.deepcopy(model).set_params(
+            **best['params'], **{RESOURCE_PARAMS[family]: best['kept_rounds']}
+        )
+        print(f"   {name}: CV AUC {best['cv_mean']:.4f} with {best['kept_rounds']} rounds {best['params']}")
+    return tuned
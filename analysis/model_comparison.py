@@ -0,0 +1,272 @@
+"""
+Parallel Model Comparison
+=========================
+Runs the model comparison of the training scripts as independent
+(model, fold) tasks on a process pool instead of fitting every model and
+then its cross-validation folds one after another.
+
+Each model contributes one task per CV fold (fit on the fold's training
+rows, ROC-AUC on its validation rows, like cross_val_score) plus one
+holdout task (fit on the full training set, predict the test set). The
+training matrices are sent to each worker once, when the pool starts; tasks
+only carry the unfitted estimator and the fold indices.
+
+Threads: every task gets cpu_count // workers threads, set on the estimator
+itself (n_jobs / thread_count) and on the worker's BLAS/OpenMP pools when
+threadpoolctl is available, so CatBoost/XGBoost/LightGBM do not each try
+to use every core at once.
+
+Results are collected by (model, fold) in submission order, so the output
+does not depend on which task finishes first.
+
+With early_stopping_rounds, boosted models (CatBoost, XGBoost, LightGBM)
+stop each CV fit on an inner stratified split of the fold's training rows
+(EARLY_STOPPING_FRACTION of them) and report the number of rounds they
+kept; the fold's validation rows are only used for scoring, so the score
+is not biased by the stopping point. analysis/hyperparameter_search.py runs its successive
+halving rungs through the same pool this way.
+"""
+
+import copy
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import train_test_split
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # Optional: only limits BLAS/OpenMP pools
+    threadpool_limits = None
+
+HOLDOUT = 'holdout'
+
+# Share of a fold's training rows held out to early-stop on
+EARLY_STOPPING_FRACTION = 0.2
+
+# Data shared by the tasks of a worker (set by _init_worker)
+_worker_data = {}
+
+
+def limit_threads(model, n_threads):
+    """Set the estimator's own thread count (n_jobs or CatBoost's thread_count)"""
+    if type(model).__name__.startswith('CatBoost'):
+        model.set_params(thread_count=n_threads)
+    elif 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=n_threads)
+    return model
+
+
+def fit_with_early_stopping(model, X_train, y_train, X_val, y_val, rounds):
+    """Fit stopping after `rounds` rounds without improvement on (X_val, y_val) (plain fit if unsupported)"""
+    kind = type(model).__name__
+    if kind.startswith('CatBoost'):
+        model.fit(X_train, y_train, eval_set=(X_val, y_val), early_stopping_rounds=rounds, verbose=False)
+    elif kind.startswith('XGB'):
+        model.set_params(early_stopping_rounds=rounds)
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    elif kind.startswith('LGBM'):
+        import lightgbm
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)],
+                  callbacks=[lightgbm.early_stopping(rounds, verbose=False)])
+    else:
+        model.fit(X_train, y_train)
+    return model
+
+
+def fitted_rounds(model):
+    """Boosting rounds a fitted model kept (best iteration + 1), None for other models"""
+    kind = type(model).__name__
+    if kind.startswith('CatBoost'):
+        best = model.get_best_iteration()
+        return best + 1 if best is not None else model.tree_count_
+    if kind.startswith('XGB'):
+        best = getattr(model, 'best_iteration', None)
+        return best + 1 if best is not None else model.get_params()['n_estimators']
+    if kind.startswith('LGBM'):
+        return model.best_iteration_ or model.n_estimators_
+    if hasattr(model, 'n_estimators_'):
+        return int(model.n_estimators_)
+    return None
+
+
+def _take(values, index):
+    return values.iloc[index] if hasattr(values, 'iloc') else values[index]
+
+
+def _init_worker(datasets, y_train, y_test, n_threads):
+    _worker_data.update(datasets=datasets, y_train=y_train, y_test=y_test)
+    if threadpool_limits is not None:
+        _worker_data['thread_limits'] = threadpool_limits(n_threads)
+
+
+def _run_task(task):
+    """
+    Fit one (model, fold) task
+
+    Returns:
+        dict with the task key, wall time and either the fold ROC-AUC or the
+        holdout fit (fitted model, predictions, probabilities)
+    """
+    name, fold, model, dataset, index, use_eval_set, early_stopping_rounds = task
+    X_train, X_test = _worker_data['datasets'][dataset]
+    y_train, y_test = _worker_data['y_train'], _worker_data['y_test']
+
+    start = time.perf_counter()
+    if fold == HOLDOUT:
+        if use_eval_set:
+            model.fit(X_train, y_train, eval_set=(X_test, y_test), verbose=False)
+        else:
+            model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+        y_prob = model.predict_proba(X_test)[:, 1] if hasattr(model, 'predict_proba') else y_pred
+        result = {'model': model, 'y_pred': y_pred, 'y_prob': y_prob}
+    else:
+        train_index, val_index = index
+        X_val, y_val = _take(X_train, val_index), _take(y_train, val_index)
+        if early_stopping_rounds:
+            # Stop on an inner split of the fold's training rows; val_index is only scored
+            fit_index, stop_index = train_test_split(
+                train_index, test_size=EARLY_STOPPING_FRACTION, random_state=fold,
+                stratify=_take(y_train, train_index)
+            )
+            fit_with_early_stopping(
+                model, _take(X_train, fit_index), _take(y_train, fit_index),
+                _take(X_train, stop_index), _take(y_train, stop_index), early_stopping_rounds
+            )
+        else:
+            model.fit(_take(X_train, train_index), _take(y_train, train_index))
+        score = get_scorer('roc_auc')(model, X_val, y_val)
+        result = {'score': score, 'rounds': fitted_rounds(model) if early_stopping_rounds else None}
+
+    result.update(name=name, fold=fold, seconds=time.perf_counter() - start)
+    return result
+
+
+class ComparisonResult:
+    """
+    Holdout fit and CV scores of one model (or the error that stopped it)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.model = None
+        self.y_pred = None
+        self.y_prob = None
+        self.cv_scores = []
+        self.cv_rounds = []
+        self.timings = {}
+        self.error = None
+
+    @property
+    def seconds(self):
+        """Total fit time of the model's tasks"""
+        return sum(self.timings.values())
+
+
+def compare_models(models, data, y_train, y_test, cv, eval_set=(), n_workers=None,
+                   holdout=True, early_stopping_rounds=None, verbose=True):
+    """
+    Fit every model on the holdout split and on each CV fold in parallel
+
+    Args:
+        models: dict name -> unfitted estimator
+        data: dict name -> (X_train, X_test) the model trains on; models that
+            share matrices should pass the same objects (sent once per worker)
+        y_train, y_test: Targets
+        cv: CV splitter (e.g. StratifiedKFold) or precomputed (train, validation)
+            index pairs
+        eval_set: Names of models whose holdout fit gets eval_set=(X_test, y_test)
+        n_workers: Worker processes (default: one per core, capped at the
+            number of tasks); 1 runs the tasks in this process
+        holdout: Also fit each model on the full training set (False: CV only)
+        early_stopping_rounds: Early-stop the CV fits on an inner split of
+            each fold's training rows (see fit_with_early_stopping)
+        verbose: Print the task plan and wall times
+
+    Returns:
+        dict name -> ComparisonResult, in the order of models
+    """
+    datasets, dataset_of = [], {}
+    for name in models:
+        pair = data[name]
+        for i, known in enumerate(datasets):
+            if known[0] is pair[0] and known[1] is pair[1]:
+                dataset_of[name] = i
+                break
+        else:
+            dataset_of[name] = len(datasets)
+            datasets.append(pair)
+
+    if hasattr(cv, 'split'):
+        splits = list(cv.split(datasets[0][0], y_train)) if datasets else []
+    else:
+        splits = list(cv)
+    folds = ([(HOLDOUT, None)] if holdout else []) + list(enumerate(splits))
+
+    cores = os.cpu_count() or 1
+    n_tasks = len(models) * len(folds)
+    n_workers = max(1, min(n_workers or cores, n_tasks))
+    n_threads = max(1, cores // n_workers)
+
+    # Each task fits its own copy of the unfitted estimator (the caller's models are not modified)
+    tasks = [
+        (name, fold, limit_threads(copy.deepcopy(model), n_threads), dataset_of[name], index, name in eval_set,
+         early_stopping_rounds)
+        for name, model in models.items()
+        for fold, index in folds
+    ]
+
+    results = {name: ComparisonResult(name) for name in models}
+    if verbose:
+        print(f"Running {n_tasks} tasks ({len(models)} models x {len(folds)} fits) "
+              f"on {n_workers} workers x {n_threads} threads")
+
+    start = time.perf_counter()
+    if n_workers == 1:
+        _init_worker(datasets, y_train, y_test, n_threads)
+        outcomes = [_run_safely(_run_task, task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(datasets, y_train, y_test, n_threads)
+        ) as pool:
+            futures = [pool.submit(_run_task, task) for task in tasks]
+            outcomes = [_run_safely(future.result) for future in futures]
+    wall = time.perf_counter() - start
+
+    for task, outcome in zip(tasks, outcomes):
+        result = results[task[0]]
+        if isinstance(outcome, Exception):
+            result.error = result.error or outcome
+            continue
+        result.timings[outcome['fold']] = outcome['seconds']
+        if outcome['fold'] == HOLDOUT:
+            result.model, result.y_pred, result.y_prob = outcome['model'], outcome['y_pred'], outcome['y_prob']
+        else:
+            result.cv_scores.append(outcome['score'])
+            result.cv_rounds.append(outcome['rounds'])
+
+    if verbose:
+        print_timings(results, wall)
+    return results
+
+
+def _run_safely(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
+def print_timings(results, wall):
+    """Per-task wall time of a comparison run"""
+    print("\n⏱ Task wall times (s):")
+    for result in results.values():
+        folds = ' '.join(f"{result.timings[k]:.1f}" for k in sorted(k for k in result.timings if k != HOLDOUT))
+        holdout = result.timings.get(HOLDOUT)
+        holdout = f"{holdout:.1f}" if holdout is not None else '-'
+        print(f"   {result.name:<20} holdout={holdout:<6} folds=[{folds}] total={result.seconds:.1f}")
+    total = sum(result.seconds for result in results.values())
+    print(f"   Wall time: {wall:.1f}s for {total:.1f}s of fits ({total / wall if wall else 0:.1f}x)")
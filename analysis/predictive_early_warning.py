@@ -31,6 +31,7 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from services.supabase_client import supabase_client
 from services.risk_calculator import RiskCalculator
+from services.subject_taxonomy import subject_taxonomy
 
 # Output directory
 OUTPUT_DIR = Path(__file__).parent / "predictive_early_warning"
@@ -38,27 +39,6 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 
 plt.style.use('seaborn-v0_8-whitegrid')
 
-# Subject name normalization - combine variations
-SUBJECT_NAME_MAP = {
-    "Matemática": "Matemáticas",
-    "matemática": "Matemáticas",
-    "MATEMÁTICA": "Matemáticas",
-    "MATEMÁTICAS": "Matemáticas",
-    "Animación lectura": "Lengua y Literatura",
-    "Animación Lectura": "Lengua y Literatura",
-    "Estudios sociales": "Estudios Sociales",
-    "estudios sociales": "Estudios Sociales",
-    "Ciencias naturales": "Ciencias Naturales",
-    "ciencias naturales": "Ciencias Naturales",
-}
-
-# Non-academic subjects to filter out
-NON_ACADEMIC_SUBJECTS = {"Acompañamiento", "PPE", "acompañamiento", "ppe"}
-
-def normalize_subject_name(subject: str) -> str:
-    """Normalize subject names to consistent values"""
-    return SUBJECT_NAME_MAP.get(subject, subject)
-
 
 def fetch_historical_data():
     """
@@ -136,12 +116,11 @@ def fetch_historical_data():
         # Crear diccionario de notas por materia (para usar como features)
         notas_por_materia = {}
         for record in academic_records:
-            mat_nombre = record.get('materia', 'Unknown')
-            # Normalize subject name
-            mat_nombre = normalize_subject_name(mat_nombre)
+            mat_code = subject_taxonomy.code(record.get('materia', 'Unknown'))
             # Skip non-academic subjects
-            if mat_nombre in NON_ACADEMIC_SUBJECTS:
+            if not subject_taxonomy.is_academic(mat_code):
                 continue
+            mat_nombre = subject_taxonomy.name(mat_code)
             mat_nota = record.get('nota', 0)
             if mat_nota and mat_nota > 0:
                 # If same subject appears multiple times, keep the latest
@@ -149,12 +128,11 @@ def fetch_historical_data():
         
         # Para cada materia, crear una fila en el dataset
         for record in academic_records:
-            materia = record.get('materia', 'Unknown')
-            # Normalize subject name
-            materia = normalize_subject_name(materia)
+            materia_code = subject_taxonomy.code(record.get('materia', 'Unknown'))
             # Skip non-academic subjects
-            if materia in NON_ACADEMIC_SUBJECTS:
+            if not subject_taxonomy.is_academic(materia_code):
                 continue
+            materia = subject_taxonomy.name(materia_code)
             nota_final = record.get('nota', 0)
             
             if not nota_final or nota_final == 0:
@@ -41,7 +41,7 @@ from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, f1_score,
     roc_auc_score, confusion_matrix, balanced_accuracy_score,
@@ -54,532 +54,164 @@ import joblib
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.supabase_client import supabase_client
+from services.feature_store import FeatureStore
+from services.roster_snapshot import roster_version
+from services import feature_store, subject_taxonomy
+from analysis import features as feature_definitions
+from analysis.features import (
+    FEATURES_VERSION, CATEGORICAL_FEATURES, load_csv_sources,
+    collect_feature_inputs, build_student_records
+)
+from analysis.dataset_cache import TrainingCache, cache_key, code_digest, csv_digests
+from services.model_scorer import save_logistic_scorer
+from services.operating_points import save_operating_points, build_operating_points, OperatingPoints
+from analysis.model_comparison import compare_models
+from analysis.hyperparameter_search import hyperband_search
 
 # Output directory
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'comprehensive_model_output')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# ============================================================================
-# CONFIGURATION
-# ============================================================================
-
-# Expected age by grade level
-EXPECTED_AGE = {
-    '1': 6, '2': 7, '3': 8, '4': 9, '5': 10, 
-    '6': 11, '7': 12, '8': 13, '9': 14, '10': 15,
-    '1BGU': 16, '2BGU': 17, '3BGU': 18
-}
-
-# High-risk subjects (based on failure rate analysis)
-HIGH_RISK_SUBJECTS = [
-    'Lengua y Literatura', 'Matemáticas', 'Matemática',
-    'Física', 'Emprendimiento', 'Ciencias Naturales',
-    'Educación ciudadanía', 'Inglés'
-]
-
-# Core academic subjects (for individual grade tracking)
-CORE_SUBJECTS = [
-    'Lengua y Literatura', 'Matemáticas', 'Matemática',
-    'Ciencias Naturales', 'Estudios sociales', 'Inglés',
-    'Física', 'Biología', 'Historia'
-]
-
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def get_nivel_educativo(grado):
-    """Map grade to education level category"""
-    if str(grado) in ['1', '2', '3', '4']:
-        return 'Basica_Elemental'
-    elif str(grado) in ['5', '6', '7']:
-        return 'Basica_Media'
-    elif str(grado) in ['8', '9', '10']:
-        return 'Basica_Superior'
-    elif str(grado) in ['1BGU', '2BGU', '3BGU']:
-        return 'Bachillerato'
-    return 'Unknown'
+# Feature store shared with the API (see services/feature_store.py)
+FEATURE_STORE_DIR = os.path.join(os.path.dirname(__file__), 'feature_store')
 
-def get_age_grade_status(edad, grado):
-    """Determine if student is young/normal/old for their grade"""
-    if not edad or not grado or str(grado) not in EXPECTED_AGE:
-        return 'unknown'
-    
-    expected = EXPECTED_AGE[str(grado)]
-    diff = edad - expected
-    
-    if diff < -1:
-        return 'young'
-    elif diff > 1:
-        return 'old'
-    return 'normal'
+# Train/test split and CV folds (part of the training cache key)
+SPLIT_PARAMS = {'test_size': 0.2, 'random_state': 42, 'n_splits': 5}
 
-def parse_si_no(value):
-    """Convert Si/No to 1/0"""
-    if pd.isna(value) or value == '':
-        return 0
-    return 1 if str(value).strip().upper() == 'SI' else 0
+# Wall-clock budget of the hyperparameter search (run with --search)
+SEARCH_BUDGET_SECONDS = 15 * 60
 
-def parse_count(value):
-    """Parse count fields like TV, Vehiculos, Celulares"""
-    if pd.isna(value) or value == '':
-        return 0
-    val_str = str(value).strip()
-    if '3 o más' in val_str or '4 o más' in val_str or '4 o mas' in val_str:
-        return 4
-    try:
-        return int(val_str)
-    except:
-        return 0
+# Thresholds reported in threshold_optimization (the sweep itself covers every probability)
+REPORT_THRESHOLDS = [0.50, 0.45, 0.40, 0.35, 0.30, 0.25, 0.20, 0.15, 0.10]
 
-def parse_bathrooms(value):
-    """Parse N_banos text field"""
-    if pd.isna(value) or value == '':
-        return 1
-    val_str = str(value).strip()
-    if 'No tiene' in val_str:
-        return 0
-    elif '3 o más' in val_str:
-        return 3
-    elif '2' in val_str:
-        return 2
-    elif '1' in val_str:
-        return 1
-    return 1
-
-def parse_education_level(value):
-    """Convert education level to numeric"""
-    if pd.isna(value) or value == '':
-        return 2  # Default to secondary incomplete
-    
-    mapping = {
-        'sin estudios': 0, 'ninguno': 0,
-        'primaria': 1, 'primaria completa': 1, 'educación básica': 1,
-        'secundaria incompleta': 2,
-        'secundaria': 3, 'secundaria completa': 3, 'bachillerato': 3,
-        'superior': 4, 'educación superior': 4, 'tercer nivel': 4,
-        'postgrado': 5, 'cuarto nivel': 5
-    }
-    
-    val_lower = str(value).strip().lower()
-    return mapping.get(val_lower, 2)
-
-def normalize_subject(materia):
-    """Normalize subject names"""
-    if not materia:
-        return None
-    materia = str(materia).strip()
-    # Combine Matemáticas and Matemática
-    if materia.lower() in ['matemática', 'matematica']:
-        return 'Matemáticas'
-    return materia
+# Cost of a missed at-risk student, in false alarms (cost-weighted threshold)
+MISSED_AT_RISK_COST = 5
 
 # ============================================================================
-# DATA LOADING
+# DATASET BUILDING
 # ============================================================================
 
-def load_all_csv_data():
-    """Load all CSV files"""
-    base_path = os.path.dirname(os.path.dirname(__file__))
+def load_students():
+    """Load students from database (for academic performance)"""
+    print("\nLoading students from database...")
+    students = supabase_client.get_students(limit=2000)
+    print(f"  Database: {len(students)} students")
+    return students
+
+def build_comprehensive_dataset(students=None):
+    """Build dataset with ALL features from all sources (via the feature store)"""
+    print("\n" + "=" * 70)
+    print("BUILDING COMPREHENSIVE DATASET")
+    print("=" * 70)
     
-    print("Loading CSV files...")
+    # Load CSV data, indexed by student ID
+    sources = load_csv_sources()
     
-    # First Page - Basic student info
-    first_page_df = pd.read_csv(
-        os.path.join(base_path, 'First page of the students information.csv'),
-        sep=';', encoding='latin-1'
-    )
-    first_page_df.columns = first_page_df.columns.str.strip()
-    print(f"  First Page: {len(first_page_df)} records")
+    if students is None:
+        students = load_students()
     
-    # House - Housing information
-    house_df = pd.read_csv(
-        os.path.join(base_path, 'Information about the house of the student.csv'),
-        sep=';', encoding='latin-1'
+    # Refresh the feature store: only students whose inputs changed are rebuilt,
+    # all of them in one column-wise batch
+    store = FeatureStore(FEATURE_STORE_DIR)
+    stats = store.refresh(
+        collect_feature_inputs(students, sources),
+        build_student_records,
+        features_version=FEATURES_VERSION,
+        batch=True
     )
-    house_df.columns = house_df.columns.str.strip()
-    print(f"  House: {len(house_df)} records")
+    print(f"\nFeature store: {stats['rebuilt']} rebuilt, {stats['reused']} reused, "
+          f"{stats['removed']} removed")
+    print(f"Skipped: {stats['skipped']} (no academic records or unknown grade)")
     
-    # Habit - Habits and assets
-    habit_df = pd.read_csv(
-        os.path.join(base_path, 'Information about the habit of the student.csv'),
-        sep=';', encoding='latin-1'
-    )
-    habit_df.columns = habit_df.columns.str.strip()
-    print(f"  Habit: {len(habit_df)} records")
+    df = pd.DataFrame(store.columns(), columns=store.feature_order)
     
-    # Parent - Parent/guardian info
-    parent_df = pd.read_csv(
-        os.path.join(base_path, 'Information of the parent.orlegalrepresentative.csv'),
-        sep=';', encoding='latin-1'
-    )
-    parent_df.columns = parent_df.columns.str.strip()
-    print(f"  Parent: {len(parent_df)} records")
+    for col in CATEGORICAL_FEATURES:
+        df[col] = df[col].astype(str)
     
-    # Economic - Economic activity
-    economic_df = pd.read_csv(
-        os.path.join(base_path, 'Economic activity of the student.csv'),
-        sep=';', encoding='latin-1'
-    )
-    economic_df.columns = economic_df.columns.str.strip()
-    print(f"  Economic: {len(economic_df)} records")
+    print(f"\n✅ Dataset built: {len(df)} students with {len(df.columns)} features")
     
-    return first_page_df, house_df, habit_df, parent_df, economic_df
+    return df
 
 # ============================================================================
-# DATASET BUILDING
+# TRAINING DATA PREPARATION (CACHED)
 # ============================================================================
 
-def build_comprehensive_dataset():
-    """Build dataset with ALL features from all sources"""
-    print("\n" + "=" * 70)
-    print("BUILDING COMPREHENSIVE DATASET")
-    print("=" * 70)
-    
-    # Load CSV data
-    first_page_df, house_df, habit_df, parent_df, economic_df = load_all_csv_data()
-    
-    # Load students from database (for academic performance)
-    print("\nLoading students from database...")
-    students = supabase_client.get_students(limit=2000)
-    print(f"  Database: {len(students)} students")
-    
-    # Build records
-    records = []
-    skipped_no_academic = 0
-    skipped_unknown_grade = 0
+def encode_categoricals(X_train, X_test, cat_features):
+    """Label-encode categorical features for non-CatBoost models"""
+    X_train_encoded = X_train.copy()
+    X_test_encoded = X_test.copy()
+    encoders = {}
     
-    for student in students:
-        student_id = student.get('id', '')
-        if not student_id.startswith('EST'):
-            continue
-        
-        try:
-            num_id = int(student_id.replace('EST', ''))
-        except:
-            continue
-        
-        # Get academic performance for TARGET calculation
-        academic = student.get('academic_performance', [])
-        if not academic:
-            skipped_no_academic += 1
-            continue
-        
-        # Calculate grades by subject
-        grades = []
-        subject_grades = {}
-        for record in academic:
-            materia = normalize_subject(record.get('materia'))
-            nota = record.get('nota')
-            if nota is not None:
-                grades.append(float(nota))
-                if materia:
-                    if materia not in subject_grades:
-                        subject_grades[materia] = []
-                    subject_grades[materia].append(float(nota))
-        
-        if not grades:
-            skipped_no_academic += 1
-            continue
-        
-        # TARGET: at_risk if ANY subject grade <= 7.5
-        min_grade = min(grades)
-        at_risk = 1 if min_grade <= 7.5 else 0
-        
-        # ============================================================
-        # FEATURE: Education Level (from database grado)
-        # ============================================================
-        grado = student.get('grado', '')
-        nivel_educativo = get_nivel_educativo(grado)
-        if nivel_educativo == 'Unknown':
-            skipped_unknown_grade += 1
-            continue
-        
-        # ============================================================
-        # FEATURE: Age-Grade Status
-        # ============================================================
-        edad_db = student.get('edad')
-        age_grade_status = get_age_grade_status(edad_db, grado)
-        
-        # ============================================================
-        # FEATURE: Accessibility (from database)
-        # ============================================================
-        socio_list = student.get('socioeconomic_data', [])
-        socio = socio_list[0] if isinstance(socio_list, list) and len(socio_list) > 0 else {}
-        indice_accesibilidad = socio.get('indice_accesibilidad_geografica')
-        if not indice_accesibilidad:
-            indice_accesibilidad = 'Moderado'  # Default
-        
-        # ============================================================
-        # FEATURES FROM FIRST PAGE CSV
-        # ============================================================
-        fp_row = first_page_df[first_page_df['ID'] == num_id]
-        if len(fp_row) > 0:
-            fp = fp_row.iloc[0]
-            quintil = fp.get('Quintil') if pd.notna(fp.get('Quintil')) else student.get('quintil', 3)
-            grupo_socioeconomico = str(fp.get('Grupo socioeconomico', 'Medio Tipico'))
-            tiene_diagnostico = 1 if str(fp.get('nombre_Diagnostico psicologico', '')).upper() == 'SI' else 0
-            escuela_procedencia = 1 if str(fp.get('Escuela_Procedencia', '')).upper() in ['SI', 'SI '] else 0
-        else:
-            quintil = student.get('quintil', 3)
-            grupo_socioeconomico = 'Medio Tipico'
-            tiene_diagnostico = 0
-            escuela_procedencia = 0
-        
-        if pd.isna(quintil):
-            quintil = 3
-        
-        # ============================================================
-        # FEATURES FROM HOUSE CSV
-        # ============================================================
-        house_row = house_df[house_df['ID'] == num_id]
-        if len(house_row) > 0:
-            house = house_row.iloc[0]
-            tipo_vivienda = str(house.get('Tipo vivienda', 'Casa/Villa'))
-            material_paredes = str(house.get('Material_Pared', 'Ladrillo'))
-            material_piso = str(house.get('Material_Piso', 'Cerámica/Baldosa'))
-            cuartos_bano = parse_bathrooms(house.get('N_banos'))
-            tipo_sanitario = str(house.get('Servicio_Higienico', 'Conectado a red pública'))
-            tiene_internet = parse_si_no(house.get('Internet'))
-            tiene_computadora = parse_si_no(house.get('Computadora'))
-            tiene_laptop = parse_si_no(house.get('Laptop'))
-            num_celulares = parse_count(house.get('Celulares'))
-        else:
-            tipo_vivienda = 'Casa/Villa'
-            material_paredes = 'Ladrillo'
-            material_piso = 'Cerámica/Baldosa'
-            cuartos_bano = 1
-            tipo_sanitario = 'Conectado a red pública'
-            tiene_internet = 0
-            tiene_computadora = 0
-            tiene_laptop = 0
-            num_celulares = 2
-        
-        # Clean categorical values
-        if pd.isna(tipo_vivienda) or tipo_vivienda == 'nan':
-            tipo_vivienda = 'Casa/Villa'
-        if pd.isna(material_paredes) or material_paredes == 'nan':
-            material_paredes = 'Ladrillo'
-        if pd.isna(material_piso) or material_piso == 'nan':
-            material_piso = 'Cerámica/Baldosa'
-        if pd.isna(tipo_sanitario) or tipo_sanitario == 'nan':
-            tipo_sanitario = 'Conectado a red pública'
-        
-        # ============================================================
-        # FEATURES FROM HABIT CSV
-        # ============================================================
-        habit_row = habit_df[habit_df['ID'] == num_id]
-        if len(habit_row) > 0:
-            habit = habit_row.iloc[0]
-            tiene_telefono = parse_si_no(habit.get('Telefono_convencional'))
-            tiene_cocina = parse_si_no(habit.get('Cocina_horno'))
-            tiene_refrigeradora = parse_si_no(habit.get('Refrigeradora'))
-            tiene_lavadora = parse_si_no(habit.get('Lavadora'))
-            tiene_equipo_sonido = parse_si_no(habit.get('Equipo de sonido'))
-            num_tv = parse_count(habit.get('TV'))
-            num_vehiculos = parse_count(habit.get('Vehiculos'))
-            compra_ropa_centros = parse_si_no(habit.get('Compra_Ropa_Centros'))
-            usa_internet = parse_si_no(habit.get('Uso_Internet'))
-            usa_correo = parse_si_no(habit.get('Uso_correo'))
-            usa_redes = parse_si_no(habit.get('Red_social'))
-            lectura_libros = parse_si_no(habit.get('Lectura_libros'))
-        else:
-            tiene_telefono = 0
-            tiene_cocina = 1
-            tiene_refrigeradora = 1
-            tiene_lavadora = 1
-            tiene_equipo_sonido = 0
-            num_tv = 1
-            num_vehiculos = 0
-            compra_ropa_centros = 0
-            usa_internet = 1
-            usa_correo = 1
-            usa_redes = 1
-            lectura_libros = 0
-        
-        # ============================================================
-        # FEATURES FROM PARENT CSV
-        # ============================================================
-        parent_row = parent_df[parent_df['ID'] == num_id]
-        if len(parent_row) > 0:
-            parent = parent_row.iloc[0]
-            edad_representante = parent.get('Edad') if pd.notna(parent.get('Edad')) else 35
-            relacion = str(parent.get('Relacion', 'Madre'))
-            estado_civil = str(parent.get('Estado civil', 'Casado'))
-            nivel_instruccion = str(parent.get('Nivel Instruccion', 'Secundaria completa'))
-            ocupacion_rep = str(parent.get('Ocupacion', 'Desconocido'))
-        else:
-            edad_representante = 35
-            relacion = 'Madre'
-            estado_civil = 'Casado'
-            nivel_instruccion = 'Secundaria completa'
-            ocupacion_rep = 'Desconocido'
-        
-        if pd.isna(edad_representante):
-            edad_representante = 35
-        if pd.isna(relacion) or relacion == 'nan':
-            relacion = 'Madre'
-        if pd.isna(estado_civil) or estado_civil == 'nan':
-            estado_civil = 'Casado'
-        if pd.isna(nivel_instruccion) or nivel_instruccion == 'nan':
-            nivel_instruccion = 'Secundaria completa'
-        
-        nivel_instruccion_num = parse_education_level(nivel_instruccion)
-        
-        # ============================================================
-        # FEATURES FROM ECONOMIC CSV
-        # ============================================================
-        economic_row = economic_df[economic_df['ID'] == num_id]
-        if len(economic_row) > 0:
-            economic = economic_row.iloc[0]
-            tiene_seguro_salud = parse_si_no(economic.get('Seguro_Salud'))
-            tiene_seguro_privado = parse_si_no(economic.get('Seguro_Privado'))
-            ocupacion_jefe = str(economic.get('Ocupacion_Jefe', 'Servicios'))
-        else:
-            tiene_seguro_salud = 1
-            tiene_seguro_privado = 0
-            ocupacion_jefe = 'Servicios'
-        
-        if pd.isna(ocupacion_jefe) or ocupacion_jefe == 'nan':
-            ocupacion_jefe = 'Servicios'
-        
-        # ============================================================
-        # DERIVED FEATURES
-        # ============================================================
-        
-        # Asset score
-        asset_score = (tiene_telefono + tiene_cocina + tiene_refrigeradora + 
-                      tiene_lavadora + tiene_equipo_sonido + 
-                      (1 if num_vehiculos > 0 else 0))
-        
-        # Tech score
-        tech_score = tiene_internet + tiene_computadora + tiene_laptop
-        
-        # Digital literacy score
-        digital_score = usa_internet + usa_correo + usa_redes
-        
-        # ============================================================
-        # SUBJECT-SPECIFIC FEATURES (NO GRADES - THEY ARE THE TARGET!)
-        # ============================================================
-        # IMPORTANT: We only track WHICH subjects the student takes,
-        # NOT their grades (that would be data leakage)
-        
-        # Number of subjects enrolled
-        num_subjects = len(subject_grades)
-        
-        # Count of high-risk subjects student is taking
-        # These subjects have historically higher failure rates
-        high_risk_count = sum(1 for s in subject_grades.keys() if s in HIGH_RISK_SUBJECTS)
-        
-        # Subject enrollment indicators (not grades!)
-        takes_lengua = 1 if 'Lengua y Literatura' in subject_grades else 0
-        takes_matematicas = 1 if 'Matemáticas' in subject_grades else 0
-        takes_ciencias = 1 if 'Ciencias Naturales' in subject_grades else 0
-        takes_sociales = 1 if 'Estudios sociales' in subject_grades else 0
-        takes_ingles = 1 if 'Inglés' in subject_grades else 0
-        takes_fisica = 1 if 'Física' in subject_grades else 0
-        
-        # Gender
-        genero = student.get('genero', 'Masculino')
-        if not genero:
-            genero = 'Masculino'
-        
-        # ============================================================
-        # BUILD RECORD
-        # ============================================================
-        record = {
-            # Target
-            'at_risk': at_risk,
-            
-            # Education structure
-            'nivel_educativo': nivel_educativo,
-            'age_grade_status': age_grade_status,
-            
-            # Geographic
-            'indice_accesibilidad': indice_accesibilidad,
-            
-            # Demographics
-            'genero': genero,
-            'quintil': int(quintil),
-            'grupo_socioeconomico': grupo_socioeconomico,
-            'tiene_diagnostico': tiene_diagnostico,
-            'escuela_procedencia': escuela_procedencia,
-            
-            # Housing
-            'tipo_vivienda': tipo_vivienda,
-            'material_paredes': material_paredes,
-            'material_piso': material_piso,
-            'cuartos_bano': cuartos_bano,
-            'tipo_sanitario': tipo_sanitario,
-            
-            # Technology
-            'tiene_internet': tiene_internet,
-            'tiene_computadora': tiene_computadora,
-            'tiene_laptop': tiene_laptop,
-            'num_celulares': num_celulares,
-            'tech_score': tech_score,
-            
-            # Household assets
-            'tiene_telefono': tiene_telefono,
-            'tiene_cocina': tiene_cocina,
-            'tiene_refrigeradora': tiene_refrigeradora,
-            'tiene_lavadora': tiene_lavadora,
-            'tiene_equipo_sonido': tiene_equipo_sonido,
-            'num_tv': num_tv,
-            'num_vehiculos': num_vehiculos,
-            'asset_score': asset_score,
-            
-            # Digital habits
-            'usa_internet': usa_internet,
-            'usa_correo': usa_correo,
-            'usa_redes': usa_redes,
-            'digital_score': digital_score,
-            
-            # Other habits
-            'compra_ropa_centros': compra_ropa_centros,
-            'lectura_libros': lectura_libros,
-            
-            # Family
-            'edad_representante': int(edad_representante),
-            'relacion': relacion,
-            'estado_civil': estado_civil,
-            'nivel_instruccion_num': nivel_instruccion_num,
-            
-            # Economic
-            'tiene_seguro_salud': tiene_seguro_salud,
-            'tiene_seguro_privado': tiene_seguro_privado,
-            'ocupacion_jefe': ocupacion_jefe,
-            
-            # Academic - Subject enrollment (NOT grades!)
-            'num_subjects': num_subjects,
-            'high_risk_subject_count': high_risk_count,
-            'takes_lengua': takes_lengua,
-            'takes_matematicas': takes_matematicas,
-            'takes_ciencias': takes_ciencias,
-            'takes_sociales': takes_sociales,
-            'takes_ingles': takes_ingles,
-            'takes_fisica': takes_fisica,
-        }
-        
-        records.append(record)
+    for col in cat_features:
+        le = LabelEncoder()
+        # Fit on combined train+test to handle unseen labels
+        all_values = pd.concat([X_train[col], X_test[col]]).astype(str)
+        le.fit(all_values)
+        X_train_encoded[col] = le.transform(X_train[col].astype(str))
+        X_test_encoded[col] = le.transform(X_test[col].astype(str))
+        encoders[col] = le
     
-    print(f"\nSkipped: {skipped_no_academic} no academic, {skipped_unknown_grade} unknown grade")
+    return X_train_encoded, X_test_encoded, encoders
+
+def prepare_training_data(df):
+    """Split, encode and fold the dataset: everything done before model fitting"""
+    target = 'at_risk'
     
-    df = pd.DataFrame(records)
+    # Categorical features (CatBoost will handle these natively)
+    cat_features = CATEGORICAL_FEATURES
     
-    # Clean categorical columns
-    cat_cols = ['nivel_educativo', 'age_grade_status', 'indice_accesibilidad', 
-                'genero', 'grupo_socioeconomico', 'tipo_vivienda', 'material_paredes',
-                'material_piso', 'tipo_sanitario', 'relacion', 'estado_civil', 'ocupacion_jefe']
+    # All feature columns
+    feature_cols = [col for col in df.columns if col != target]
     
-    for col in cat_cols:
-        df[col] = df[col].fillna('Desconocido')
-        df[col] = df[col].replace('nan', 'Desconocido')
-        df[col] = df[col].astype(str)
+    X = df[feature_cols]
+    y = df[target]
     
-    print(f"\n✅ Dataset built: {len(df)} students with {len(df.columns)} features")
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=SPLIT_PARAMS['test_size'], random_state=SPLIT_PARAMS['random_state'], stratify=y
+    )
+    X_train_encoded, X_test_encoded, encoders = encode_categoricals(X_train, X_test, cat_features)
+    
+    cv = StratifiedKFold(n_splits=SPLIT_PARAMS['n_splits'], shuffle=True, random_state=SPLIT_PARAMS['random_state'])
+    
+    return {
+        'df': df,
+        'target': target,
+        'cat_features': cat_features,
+        'feature_cols': feature_cols,
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': y_train, 'y_test': y_test,
+        'X_train_encoded': X_train_encoded, 'X_test_encoded': X_test_encoded,
+        'encoders': encoders,
+        'folds': list(cv.split(X_train, y_train)),
+    }
+
+def load_training_data(rebuild=False):
+    """
+    Prepared training data, from the cache when its inputs did not change
+
+    The key covers the CSV file contents, the roster version, the builder
+    code and the split parameters (see analysis/dataset_cache.py).
+    """
+    students = load_students()
+    key = cache_key(
+        csv=csv_digests(),
+        roster=roster_version(students),
+        features_version=FEATURES_VERSION,
+        code=code_digest(
+            feature_definitions, subject_taxonomy, feature_store,
+            build_comprehensive_dataset, encode_categoricals, prepare_training_data
+        ),
+        split=SPLIT_PARAMS
+    )
     
-    return df
+    # The API reads the feature store, so it is rebuilt if it went missing
+    rebuild = rebuild or len(FeatureStore(FEATURE_STORE_DIR)) == 0
+    data, cached = TrainingCache().get_or_build(
+        key, lambda: prepare_training_data(build_comprehensive_dataset(students)), refresh=rebuild
+    )
+    if cached:
+        print(f"\n♻️ Training data loaded from cache ({key}): {len(data['df'])} students")
+    return data
 
 # ============================================================================
 # DATA QUALITY CHECK
@@ -650,30 +282,21 @@ def data_quality_check(df):
 # MODEL TRAINING
 # ============================================================================
 
-def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, feature_cols):
+def train_and_compare_models(data, search=False):
     """Train multiple models and compare performance"""
     print("\n" + "=" * 70)
     print("MODEL TRAINING AND COMPARISON")
     print("=" * 70)
     
+    X_train, X_test = data['X_train'], data['X_test']
+    y_train, y_test = data['y_train'], data['y_test']
+    X_train_encoded, X_test_encoded = data['X_train_encoded'], data['X_test_encoded']
+    cat_features = data['cat_features']
+    
     # Class ratio for weighting
     class_ratio = (y_train == 0).sum() / (y_train == 1).sum()
     print(f"Class ratio (neg/pos): {class_ratio:.2f}")
     
-    # Encode categorical features for non-CatBoost models
-    X_train_encoded = X_train.copy()
-    X_test_encoded = X_test.copy()
-    encoders = {}
-    
-    for col in cat_features:
-        le = LabelEncoder()
-        # Fit on combined train+test to handle unseen labels
-        all_values = pd.concat([X_train[col], X_test[col]]).astype(str)
-        le.fit(all_values)
-        X_train_encoded[col] = le.transform(X_train[col].astype(str))
-        X_test_encoded[col] = le.transform(X_test[col].astype(str))
-        encoders[col] = le
-    
     # Define models
     models = {
         # BASE MODEL - Simple Logistic Regression
@@ -749,23 +372,31 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
     best_model = None
     best_score = 0
     
-    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    model_data = {
+        name: (X_train, X_test) if 'CatBoost' in name else (X_train_encoded, X_test_encoded) for name in models
+    }
     
-    for name, model in models.items():
+    # Hyperband search with early stopping on the CV folds (--search):
+    # the tuned estimators replace the fixed configurations above
+    tuned = {}
+    if search:
+        tuned, _ = hyperband_search(models, model_data, y_train, y_test, data['folds'], SEARCH_BUDGET_SECONDS)
+        models.update(tuned)
+    
+    # Holdout fit + CV folds of every model as parallel (model, fold) tasks
+    comparison = compare_models(
+        models, model_data, y_train, y_test, data['folds'],
+        eval_set=[name for name in models if 'CatBoost' in name]
+    )
+    
+    for name, run in comparison.items():
         print(f"\nTraining {name}...")
         
         try:
-            # Use appropriate data
-            if 'CatBoost' in name:
-                model.fit(X_train, y_train, eval_set=(X_test, y_test), verbose=False)
-                y_pred = model.predict(X_test)
-                y_prob = model.predict_proba(X_test)[:, 1]
-                cv_data = X_train
-            else:
-                model.fit(X_train_encoded, y_train)
-                y_pred = model.predict(X_test_encoded)
-                y_prob = model.predict_proba(X_test_encoded)[:, 1]
-                cv_data = X_train_encoded
+            if run.error is not None:
+                raise run.error
+            model, y_pred, y_prob = run.model, run.y_pred, run.y_prob
+            cv_scores = np.array(run.cv_scores)
             
             # Metrics
             accuracy = accuracy_score(y_test, y_pred)
@@ -777,12 +408,6 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
             
             tn, fp, fn, tp = confusion_matrix(y_test, y_pred).ravel()
             
-            # Cross-validation
-            if 'CatBoost' in name:
-                cv_scores = cross_val_score(model, cv_data, y_train, cv=cv, scoring='roc_auc')
-            else:
-                cv_scores = cross_val_score(model, cv_data, y_train, cv=cv, scoring='roc_auc')
-            
             result = {
                 'model': name,
                 'accuracy': accuracy,
@@ -795,7 +420,9 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
                 'missed_at_risk': int(fn),
                 'false_alarms': int(fp),
                 'cv_mean': cv_scores.mean(),
-                'cv_std': cv_scores.std()
+                'cv_std': cv_scores.std(),
+                'fit_seconds': run.seconds,
+                'tuned': name in tuned
             }
             results.append(result)
             
@@ -814,44 +441,59 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
             print(f"  ERROR: {e}")
             continue
     
-    return results, best_model
+    return results, best_model, data['encoders']
 
 # ============================================================================
 # THRESHOLD OPTIMIZATION
 # ============================================================================
 
 def optimize_thresholds(model, X_test, y_test):
-    """Find optimal threshold for different use cases"""
+    """
+    Find optimal threshold for different use cases
+
+    One sort + cumulative sums give TP/FP/FN/TN at every distinct test
+    probability (services/operating_points.py); the reported grid and the
+    optimal thresholds are lookups on that table.
+    """
     print("\n" + "=" * 70)
     print("THRESHOLD OPTIMIZATION")
     print("=" * 70)
     
     y_prob = model.predict_proba(X_test)[:, 1]
+    table = OperatingPoints(build_operating_points(y_test, y_prob))
     
     thresholds_analysis = []
-    for threshold in [0.50, 0.45, 0.40, 0.35, 0.30, 0.25, 0.20, 0.15, 0.10]:
-        y_pred_t = (y_prob >= threshold).astype(int)
-        
-        recall = recall_score(y_test, y_pred_t, zero_division=0)
-        precision = precision_score(y_test, y_pred_t, zero_division=0)
-        f1 = f1_score(y_test, y_pred_t, zero_division=0)
-        
-        tn, fp, fn, tp = confusion_matrix(y_test, y_pred_t).ravel()
+    for threshold in REPORT_THRESHOLDS:
+        point = table.at_threshold(threshold)
         
         thresholds_analysis.append({
             'threshold': threshold,
-            'recall': recall,
-            'precision': precision,
-            'f1': f1,
-            'missed': int(fn),
-            'false_alarms': int(fp),
-            'tp': int(tp),
-            'tn': int(tn)
+            'recall': point['recall'],
+            'precision': point['precision'],
+            'f1': point['f1'],
+            'missed': point['fn'],
+            'false_alarms': point['fp'],
+            'tp': point['tp'],
+            'tn': point['tn']
         })
         
-        print(f"  Threshold {threshold:.2f}: Recall={recall:.1%}, Precision={precision:.1%}, Missed={fn}, FA={fp}")
+        print(f"  Threshold {threshold:.2f}: Recall={point['recall']:.1%}, Precision={point['precision']:.1%}, "
+              f"Missed={point['fn']}, FA={point['fp']}")
     
-    return thresholds_analysis
+    # Exact optima over every distinct probability
+    optimal = {
+        'max_f1': table.for_max_f1(),
+        'min_cost': table.for_min_cost(MISSED_AT_RISK_COST),
+        'recall_90': table.for_min_recall(0.90),
+    }
+    print(f"\n  Sweep over {len(table)} distinct thresholds:")
+    for name, point in optimal.items():
+        if point is not None:
+            print(f"  {name:<10} threshold={point['threshold']:.4f}: Recall={point['recall']:.1%}, "
+                  f"Precision={point['precision']:.1%}, Missed={point['fn']}, FA={point['fp']}")
+    optimal['missed_at_risk_cost'] = MISSED_AT_RISK_COST
+    
+    return thresholds_analysis, optimal
 
 # ============================================================================
 # FEATURE IMPORTANCE
@@ -884,61 +526,37 @@ def main():
     print("All Features | Base vs Advanced Models | CatBoost Optimized")
     print("=" * 70)
     
-    # Build dataset
-    df = build_comprehensive_dataset()
+    # Build (or load the cached) dataset, split, encoders and CV folds
+    data = load_training_data(rebuild='--rebuild' in sys.argv)
+    search = '--search' in sys.argv
+    df = data['df']
     
     # Data quality check
     df = data_quality_check(df)
     
-    # Define features
-    target = 'at_risk'
-    
-    # Categorical features (CatBoost will handle these natively)
-    cat_features = [
-        'nivel_educativo',
-        'age_grade_status',
-        'indice_accesibilidad',
-        'genero',
-        'grupo_socioeconomico',
-        'tipo_vivienda',
-        'material_paredes',
-        'material_piso',
-        'tipo_sanitario',
-        'relacion',
-        'estado_civil',
-        'ocupacion_jefe'
-    ]
-    
-    # All feature columns
-    feature_cols = [col for col in df.columns if col != target]
+    cat_features = data['cat_features']
+    feature_cols = data['feature_cols']
     
     print(f"\n📊 FEATURE SUMMARY:")
     print(f"   Total features: {len(feature_cols)}")
     print(f"   Categorical: {len(cat_features)}")
     print(f"   Numeric: {len(feature_cols) - len(cat_features)}")
     
-    # Prepare data
-    X = df[feature_cols]
-    y = df[target]
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    X_train, X_test = data['X_train'], data['X_test']
+    y_train, y_test = data['y_train'], data['y_test']
+    y = df[data['target']]
     
     print(f"\n📊 DATA SPLIT:")
     print(f"   Training: {len(X_train)} students ({y_train.mean()*100:.1f}% at-risk)")
     print(f"   Testing: {len(X_test)} students ({y_test.mean()*100:.1f}% at-risk)")
     
     # Train and compare models
-    results, (best_name, best_model, best_X_test) = train_and_compare_models(
-        X_train, X_test, y_train, y_test, cat_features, feature_cols
-    )
+    results, (best_name, best_model, best_X_test), encoders = train_and_compare_models(data, search=search)
     
     print(f"\n🏆 BEST MODEL: {best_name}")
     
     # Threshold optimization (use appropriate X_test data)
-    thresholds = optimize_thresholds(best_model, best_X_test, y_test)
+    thresholds, optimal_thresholds = optimize_thresholds(best_model, best_X_test, y_test)
     
     # Feature importance
     print("\n" + "=" * 70)
@@ -965,6 +583,32 @@ def main():
         joblib.dump(best_model, model_path)
     print(f"✓ Model saved: {model_path}")
     
+    # Export linear models as a NumPy-only scorer for the API
+    if isinstance(best_model, LogisticRegression):
+        scorer_path = os.path.join(OUTPUT_DIR, 'best_model_scorer.npz')
+        save_logistic_scorer(
+            scorer_path,
+            coef=best_model.coef_[0],
+            intercept=best_model.intercept_[0],
+            feature_order=feature_cols,
+            vocabularies={col: list(encoders[col].classes_) for col in cat_features},
+            metadata={
+                'model_name': best_name,
+                'trained_at': datetime.now().isoformat(),
+            }
+        )
+        print(f"✓ NumPy scorer saved: {scorer_path}")
+    
+    # Dense operating-point table (one row per distinct test probability)
+    operating_points_path = os.path.join(OUTPUT_DIR, 'operating_points.json')
+    operating_points = save_operating_points(
+        operating_points_path,
+        y_test,
+        best_model.predict_proba(best_X_test)[:, 1],
+        metadata={'model_name': best_name, 'test_size': len(y_test)}
+    )
+    print(f"✓ Operating points saved: {operating_points_path} ({len(operating_points)} thresholds)")
+    
     # Save feature importance
     if importance_df is not None:
         importance_path = os.path.join(OUTPUT_DIR, 'feature_importance.csv')
@@ -1010,6 +654,7 @@ def main():
         },
         'all_models': results,
         'threshold_optimization': thresholds,
+        'optimal_thresholds': optimal_thresholds,
         'top_features': importance_df.head(20).to_dict('records') if importance_df is not None else []
     }
     
@@ -1034,18 +679,14 @@ def main():
     print(f"   Precision: {best_result['precision']:.1%}")
     print(f"   CV Score: {best_result['cv_mean']:.3f} ± {best_result['cv_std']:.3f}")
     
-    # Find best threshold for 90%+ recall
-    high_recall_threshold = None
-    for t in thresholds:
-        if t['recall'] >= 0.90:
-            high_recall_threshold = t
-            break
+    # Highest threshold with 90%+ recall (exact, from the full sweep)
+    high_recall_threshold = optimal_thresholds['recall_90']
     
     if high_recall_threshold:
         print(f"\n🎯 Recommended Threshold: {high_recall_threshold['threshold']}")
         print(f"   Recall: {high_recall_threshold['recall']:.1%}")
-        print(f"   Missed students: {high_recall_threshold['missed']}")
-        print(f"   False alarms: {high_recall_threshold['false_alarms']}")
+        print(f"   Missed students: {high_recall_threshold['fn']}")
+        print(f"   False alarms: {high_recall_threshold['fp']}")
     
     print(f"\n📁 Outputs saved to: {OUTPUT_DIR}")
     print("\n✅ Comprehensive model training complete!")
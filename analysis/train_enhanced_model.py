@@ -29,7 +29,7 @@ from lightgbm import LGBMClassifier
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import SVC
-from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.metrics import (
     accuracy_score, precision_score, recall_score, f1_score,
     roc_auc_score, confusion_matrix, balanced_accuracy_score,
@@ -42,26 +42,43 @@ import joblib
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.supabase_client import supabase_client
+from services.roster_snapshot import roster_version
+from services.operating_points import build_operating_points, OperatingPoints
+from services import subject_taxonomy
+from analysis import features as feature_definitions
+from analysis.features import (
+    FEATURES_VERSION, parse_si_no, parse_count, parse_bathrooms, parse_diagnostico, parse_escuela_procedencia,
+    normalize_subject, load_all_csv_data, nivel_educativo_column, age_grade_status_column,
+    education_level_column, derived_scores, rows_by_id, parsed_column, text_column, numeric_column
+)
+from analysis.model_comparison import compare_models
+from analysis.hyperparameter_search import hyperband_search
+from analysis.dataset_cache import TrainingCache, cache_key, code_digest, csv_digests
 
 # Output directory
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'enhanced_model_output')
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Train/test split and CV folds (part of the training cache key)
+SPLIT_PARAMS = {'test_size': 0.2, 'random_state': 42, 'n_splits': 5}
+
+# Wall-clock budget of the hyperparameter search (run with --search)
+SEARCH_BUDGET_SECONDS = 15 * 60
+
+# Thresholds reported in threshold_optimization (the sweep itself covers every probability)
+REPORT_THRESHOLDS = [0.50, 0.45, 0.40, 0.35, 0.30, 0.25, 0.20, 0.15, 0.10]
+
+# Cost of a missed at-risk student, in false alarms (cost-weighted threshold)
+MISSED_AT_RISK_COST = 5
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Expected age by grade level
-EXPECTED_AGE = {
-    '1': 6, '2': 7, '3': 8, '4': 9, '5': 10, 
-    '6': 11, '7': 12, '8': 13, '9': 14, '10': 15,
-    '1BGU': 16, '2BGU': 17, '3BGU': 18
-}
-
 # All subjects for individual tracking
 ALL_SUBJECTS = [
-    'Lengua y Literatura', 'Matemáticas', 'Matemática',
-    'Ciencias Naturales', 'Estudios sociales', 'Inglés',
+    'Lengua y Literatura', 'Matemáticas',
+    'Ciencias Naturales', 'Estudios Sociales', 'Inglés',
     'Física', 'Biología', 'Historia', 'Química',
     'Educación ciudadanía', 'Emprendimiento', 'Filosofía',
     'Educación Física', 'Educación Cultural y Artística'
@@ -69,164 +86,60 @@ ALL_SUBJECTS = [
 
 # Mathematical/STEM subjects
 MATH_STEM_SUBJECTS = [
-    'Matemáticas', 'Matemática', 'Física', 'Química',
+    'Matemáticas', 'Física', 'Química',
     'Ciencias Naturales', 'Biología'
 ]
 
 # Language/Social subjects
 LANGUAGE_SOCIAL_SUBJECTS = [
-    'Lengua y Literatura', 'Estudios sociales', 'Inglés',
+    'Lengua y Literatura', 'Estudios Sociales', 'Inglés',
     'Historia', 'Educación ciudadanía', 'Filosofía'
 ]
 
 # ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def get_nivel_educativo(grado):
-    """Map grade to education level category"""
-    if str(grado) in ['1', '2', '3', '4']:
-        return 'Basica_Elemental'
-    elif str(grado) in ['5', '6', '7']:
-        return 'Basica_Media'
-    elif str(grado) in ['8', '9', '10']:
-        return 'Basica_Superior'
-    elif str(grado) in ['1BGU', '2BGU', '3BGU']:
-        return 'Bachillerato'
-    return 'Unknown'
-
-def get_age_grade_status(edad, grado):
-    """Determine if student is young/normal/old for their grade"""
-    if not edad or not grado or str(grado) not in EXPECTED_AGE:
-        return 'unknown'
-    
-    expected = EXPECTED_AGE[str(grado)]
-    diff = edad - expected
-    
-    if diff < -1:
-        return 'young'
-    elif diff > 1:
-        return 'old'
-    return 'normal'
-
-def parse_si_no(value):
-    """Convert Si/No to 1/0"""
-    if pd.isna(value) or value == '':
-        return 0
-    return 1 if str(value).strip().upper() == 'SI' else 0
-
-def parse_count(value):
-    """Parse count fields like TV, Vehiculos, Celulares"""
-    if pd.isna(value) or value == '':
-        return 0
-    val_str = str(value).strip()
-    if '3 o más' in val_str or '4 o más' in val_str or '4 o mas' in val_str:
-        return 4
-    try:
-        return int(val_str)
-    except:
-        return 0
-
-def parse_bathrooms(value):
-    """Parse N_banos text field"""
-    if pd.isna(value) or value == '':
-        return 1
-    val_str = str(value).strip()
-    if 'No tiene' in val_str:
-        return 0
-    elif '3 o más' in val_str:
-        return 3
-    elif '2' in val_str:
-        return 2
-    elif '1' in val_str:
-        return 1
-    return 1
-
-def parse_education_level(value):
-    """Convert education level to numeric"""
-    if pd.isna(value) or value == '':
-        return 2  # Default to secondary incomplete
-    
-    mapping = {
-        'sin estudios': 0, 'ninguno': 0,
-        'primaria': 1, 'primaria completa': 1, 'educación básica': 1,
-        'secundaria incompleta': 2,
-        'secundaria': 3, 'secundaria completa': 3, 'bachillerato': 3,
-        'superior': 4, 'educación superior': 4, 'tercer nivel': 4,
-        'postgrado': 5, 'cuarto nivel': 5
-    }
-    
-    val_lower = str(value).strip().lower()
-    return mapping.get(val_lower, 2)
-
-def normalize_subject(materia):
-    """Normalize subject names"""
-    if not materia:
-        return None
-    materia = str(materia).strip()
-    # Combine Matemáticas and Matemática
-    if materia.lower() in ['matemática', 'matematica']:
-        return 'Matemáticas'
-    return materia
-
-# ============================================================================
-# DATA LOADING
+# DATASET BUILDING
 # ============================================================================
 
-def load_all_csv_data():
-    """Load all CSV files"""
-    base_path = os.path.dirname(os.path.dirname(__file__))
-    
-    print("Loading CSV files...")
-    
-    # First Page - Basic student info
-    first_page_df = pd.read_csv(
-        os.path.join(base_path, 'First page of the students information.csv'),
-        sep=';', encoding='latin-1'
-    )
-    first_page_df.columns = first_page_df.columns.str.strip()
-    print(f"  First Page: {len(first_page_df)} records")
-    
-    # House - Housing information
-    house_df = pd.read_csv(
-        os.path.join(base_path, 'Information about the house of the student.csv'),
-        sep=';', encoding='latin-1'
-    )
-    house_df.columns = house_df.columns.str.strip()
-    print(f"  House: {len(house_df)} records")
-    
-    # Habit - Habits and assets
-    habit_df = pd.read_csv(
-        os.path.join(base_path, 'Information about the habit of the student.csv'),
-        sep=';', encoding='latin-1'
-    )
-    habit_df.columns = habit_df.columns.str.strip()
-    print(f"  Habit: {len(habit_df)} records")
-    
-    # Parent - Parent/guardian info
-    parent_df = pd.read_csv(
-        os.path.join(base_path, 'Information of the parent.orlegalrepresentative.csv'),
-        sep=';', encoding='latin-1'
-    )
-    parent_df.columns = parent_df.columns.str.strip()
-    print(f"  Parent: {len(parent_df)} records")
-    
-    # Economic - Economic activity
-    economic_df = pd.read_csv(
-        os.path.join(base_path, 'Economic activity of the student.csv'),
-        sep=';', encoding='latin-1'
-    )
-    economic_df.columns = economic_df.columns.str.strip()
-    print(f"  Economic: {len(economic_df)} records")
-    
-    return first_page_df, house_df, habit_df, parent_df, economic_df
+# Subjects tracked as binary enrollment features (column -> canonical name)
+TAKES_SUBJECTS = {
+    'takes_lengua': 'Lengua y Literatura',
+    'takes_matematicas': 'Matemáticas',
+    'takes_ciencias': 'Ciencias Naturales',
+    'takes_sociales': 'Estudios Sociales',
+    'takes_ingles': 'Inglés',
+    'takes_fisica': 'Física',
+    'takes_quimica': 'Química',
+    'takes_biologia': 'Biología',
+    'takes_historia': 'Historia',
+    'takes_ciudadania': 'Educación ciudadanía',
+    'takes_emprendimiento': 'Emprendimiento',
+}
 
-# ============================================================================
-# DATASET BUILDING
-# ============================================================================
+# Column order of the enhanced dataset
+RECORD_COLUMNS = [
+    'at_risk', 'avg_grade', 'nivel_educativo', 'age_grade_status', 'indice_accesibilidad',
+    'genero', 'quintil', 'grupo_socioeconomico', 'tiene_diagnostico', 'escuela_procedencia',
+    'tipo_vivienda', 'material_paredes', 'material_piso', 'cuartos_bano', 'tipo_sanitario',
+    'tipo_agua', 'tipo_electricidad', 'eliminacion_basura',
+    'tiene_internet', 'tiene_computadora', 'tiene_laptop', 'num_celulares', 'tech_score',
+    'tiene_telefono', 'tiene_cocina', 'tiene_refrigeradora', 'tiene_lavadora', 'tiene_equipo_sonido',
+    'num_tv', 'num_vehiculos', 'has_transportation', 'asset_score',
+    'usa_internet', 'usa_correo', 'usa_redes', 'digital_score', 'compra_ropa_centros', 'lectura_libros',
+    'edad_representante', 'sexo_representante', 'relacion', 'estado_civil', 'nivel_instruccion',
+    'nivel_instruccion_num', 'ocupacion_rep',
+    'tiene_seguro_salud', 'tiene_seguro_privado', 'ocupacion_jefe', 'situacion_laboral',
+    'num_subjects'
+] + list(TAKES_SUBJECTS) + ['stem_count', 'language_count']
+
+def load_students():
+    """Load students from database (for academic performance)"""
+    print("\nLoading students from database...")
+    students = supabase_client.get_students(limit=2000)
+    print(f"  Database: {len(students)} students")
+    return students
 
-def build_enhanced_dataset():
-    """Build dataset with ALL features from all sources"""
+def build_enhanced_dataset(students=None):
+    """Build dataset with ALL features from all sources (vectorized joins on ID)"""
     print("\n" + "=" * 70)
     print("BUILDING ENHANCED DATASET WITH ALL FEATURES")
     print("=" * 70)
@@ -234,17 +147,14 @@ def build_enhanced_dataset():
     # Load CSV data
     first_page_df, house_df, habit_df, parent_df, economic_df = load_all_csv_data()
     
-    # Load students from database (for academic performance)
-    print("\nLoading students from database...")
-    students = supabase_client.get_students(limit=2000)
-    print(f"  Database: {len(students)} students")
-    
-    # Build records
-    records = []
-    subject_stats = {}  # Track subject-level stats for analysis
-    skipped_no_academic = 0
-    skipped_unknown_grade = 0
+    if students is None:
+        students = load_students()
     
+    # ============================================================
+    # DATABASE FIELDS (one row per student with an ESTnnn ID)
+    # ============================================================
+    base_rows = []
+    grade_rows = []
     for student in students:
         student_id = student.get('id', '')
         if not student_id.startswith('EST'):
@@ -255,354 +165,146 @@ def build_enhanced_dataset():
         except:
             continue
         
-        # Get academic performance for TARGET calculation
-        academic = student.get('academic_performance', [])
-        if not academic:
-            skipped_no_academic += 1
-            continue
-        
-        # Calculate grades by subject
-        all_grades = []
-        subject_grades = {}
-        math_stem_grades = []
-        language_social_grades = []
-        
-        for record in academic:
-            materia = normalize_subject(record.get('materia'))
-            nota = record.get('nota')
-            if nota is not None:
-                all_grades.append(float(nota))
-                if materia:
-                    if materia not in subject_grades:
-                        subject_grades[materia] = []
-                    subject_grades[materia].append(float(nota))
-                    
-                    # Track stats by subject type
-                    if materia not in subject_stats:
-                        subject_stats[materia] = {'total': 0, 'at_risk': 0, 'grades': []}
-                    subject_stats[materia]['grades'].append(float(nota))
-                    
-                    # Categorize by subject type
-                    if materia in MATH_STEM_SUBJECTS:
-                        math_stem_grades.append(float(nota))
-                    if materia in LANGUAGE_SOCIAL_SUBJECTS:
-                        language_social_grades.append(float(nota))
-        
-        if not all_grades:
-            skipped_no_academic += 1
-            continue
-        
-        # ============================================================
-        # TARGET: AVERAGE SCORE <= 7.5 means AT RISK
-        # ============================================================
-        avg_grade = np.mean(all_grades)
-        at_risk = 1 if avg_grade <= 7.5 else 0
-        
-        # ============================================================
-        # FEATURE: Education Level (from database grado)
-        # ============================================================
-        grado = student.get('grado', '')
-        nivel_educativo = get_nivel_educativo(grado)
-        if nivel_educativo == 'Unknown':
-            skipped_unknown_grade += 1
-            continue
-        
-        # ============================================================
-        # FEATURE: Age-Grade Status
-        # ============================================================
-        edad_db = student.get('edad')
-        age_grade_status = get_age_grade_status(edad_db, grado)
-        
-        # ============================================================
-        # FEATURE: Accessibility (from database)
-        # ============================================================
         socio_list = student.get('socioeconomic_data', [])
         socio = socio_list[0] if isinstance(socio_list, list) and len(socio_list) > 0 else {}
-        indice_accesibilidad = socio.get('indice_accesibilidad_geografica')
-        if not indice_accesibilidad:
-            indice_accesibilidad = 'Moderado'
-        
-        # ============================================================
-        # FEATURES FROM FIRST PAGE CSV (including QUINTIL)
-        # ============================================================
-        fp_row = first_page_df[first_page_df['ID'] == num_id]
-        if len(fp_row) > 0:
-            fp = fp_row.iloc[0]
-            quintil = fp.get('Quintil') if pd.notna(fp.get('Quintil')) else student.get('quintil', 3)
-            grupo_socioeconomico = str(fp.get('Grupo socioeconomico', 'Medio Tipico'))
-            tiene_diagnostico = 1 if str(fp.get('nombre_Diagnostico psicologico', '')).upper() == 'SI' else 0
-            escuela_procedencia = 1 if str(fp.get('Escuela_Procedencia', '')).upper() in ['SI', 'SI '] else 0
-        else:
-            quintil = student.get('quintil', 3)
-            grupo_socioeconomico = 'Medio Tipico'
-            tiene_diagnostico = 0
-            escuela_procedencia = 0
-        
-        if pd.isna(quintil):
-            quintil = 3
-        quintil = int(quintil)
-        
-        # ============================================================
-        # FEATURES FROM HOUSE CSV
-        # ============================================================
-        house_row = house_df[house_df['ID'] == num_id]
-        if len(house_row) > 0:
-            house = house_row.iloc[0]
-            tipo_vivienda = str(house.get('Tipo vivienda', 'Casa/Villa'))
-            material_paredes = str(house.get('Material_Pared', 'Ladrillo'))
-            material_piso = str(house.get('Material_Piso', 'Cerámica/Baldosa'))
-            cuartos_bano = parse_bathrooms(house.get('N_banos'))
-            tipo_sanitario = str(house.get('Servicio_Higienico', 'Conectado a red pública'))
-            tiene_internet = parse_si_no(house.get('Internet'))
-            tiene_computadora = parse_si_no(house.get('Computadora'))
-            tiene_laptop = parse_si_no(house.get('Laptop'))
-            num_celulares = parse_count(house.get('Celulares'))
-            tipo_agua = str(house.get('Agua', 'Red pública'))
-            tipo_electricidad = str(house.get('Tipo_Luz', 'Medidor propio'))
-            eliminacion_basura = str(house.get('Eliminacion_basura', 'Servicio municipal'))
-        else:
-            tipo_vivienda = 'Casa/Villa'
-            material_paredes = 'Ladrillo'
-            material_piso = 'Cerámica/Baldosa'
-            cuartos_bano = 1
-            tipo_sanitario = 'Conectado a red pública'
-            tiene_internet = 0
-            tiene_computadora = 0
-            tiene_laptop = 0
-            num_celulares = 2
-            tipo_agua = 'Red pública'
-            tipo_electricidad = 'Medidor propio'
-            eliminacion_basura = 'Servicio municipal'
-        
-        # Clean categorical values
-        for var in ['tipo_vivienda', 'material_paredes', 'material_piso', 'tipo_sanitario', 
-                   'tipo_agua', 'tipo_electricidad', 'eliminacion_basura']:
-            if pd.isna(eval(var)) or eval(var) == 'nan':
-                exec(f"{var} = 'Desconocido'")
-        
-        # ============================================================
-        # FEATURES FROM HABIT CSV
-        # ============================================================
-        habit_row = habit_df[habit_df['ID'] == num_id]
-        if len(habit_row) > 0:
-            habit = habit_row.iloc[0]
-            tiene_telefono = parse_si_no(habit.get('Telefono_convencional'))
-            tiene_cocina = parse_si_no(habit.get('Cocina_horno'))
-            tiene_refrigeradora = parse_si_no(habit.get('Refrigeradora'))
-            tiene_lavadora = parse_si_no(habit.get('Lavadora'))
-            tiene_equipo_sonido = parse_si_no(habit.get('Equipo de sonido'))
-            num_tv = parse_count(habit.get('TV'))
-            num_vehiculos = parse_count(habit.get('Vehiculos'))
-            compra_ropa_centros = parse_si_no(habit.get('Compra_Ropa_Centros'))
-            usa_internet = parse_si_no(habit.get('Uso_Internet'))
-            usa_correo = parse_si_no(habit.get('Uso_correo'))
-            usa_redes = parse_si_no(habit.get('Red_social'))
-            lectura_libros = parse_si_no(habit.get('Lectura_libros'))
-        else:
-            tiene_telefono = 0
-            tiene_cocina = 1
-            tiene_refrigeradora = 1
-            tiene_lavadora = 1
-            tiene_equipo_sonido = 0
-            num_tv = 1
-            num_vehiculos = 0
-            compra_ropa_centros = 0
-            usa_internet = 1
-            usa_correo = 1
-            usa_redes = 1
-            lectura_libros = 0
-        
-        # ============================================================
-        # FEATURES FROM PARENT CSV
-        # ============================================================
-        parent_row = parent_df[parent_df['ID'] == num_id]
-        if len(parent_row) > 0:
-            parent = parent_row.iloc[0]
-            edad_representante = parent.get('Edad') if pd.notna(parent.get('Edad')) else 35
-            relacion = str(parent.get('Relacion', 'Madre'))
-            estado_civil = str(parent.get('Estado civil', 'Casado'))
-            nivel_instruccion = str(parent.get('Nivel Instruccion', 'Secundaria completa'))
-            ocupacion_rep = str(parent.get('Ocupacion', 'Desconocido'))
-            sexo_representante = str(parent.get('Sexo', 'Femenino'))
-        else:
-            edad_representante = 35
-            relacion = 'Madre'
-            estado_civil = 'Casado'
-            nivel_instruccion = 'Secundaria completa'
-            ocupacion_rep = 'Desconocido'
-            sexo_representante = 'Femenino'
-        
-        if pd.isna(edad_representante):
-            edad_representante = 35
-        for var in ['relacion', 'estado_civil', 'nivel_instruccion', 'ocupacion_rep', 'sexo_representante']:
-            if pd.isna(eval(var)) or eval(var) == 'nan':
-                exec(f"{var} = 'Desconocido'")
-        
-        nivel_instruccion_num = parse_education_level(nivel_instruccion)
-        
-        # ============================================================
-        # FEATURES FROM ECONOMIC CSV
-        # ============================================================
-        economic_row = economic_df[economic_df['ID'] == num_id]
-        if len(economic_row) > 0:
-            economic = economic_row.iloc[0]
-            tiene_seguro_salud = parse_si_no(economic.get('Seguro_Salud'))
-            tiene_seguro_privado = parse_si_no(economic.get('Seguro_Privado'))
-            ocupacion_jefe = str(economic.get('Ocupacion_Jefe', 'Servicios'))
-            situacion_laboral = str(economic.get('Situacion_laboral', 'Empleado'))
-        else:
-            tiene_seguro_salud = 1
-            tiene_seguro_privado = 0
-            ocupacion_jefe = 'Servicios'
-            situacion_laboral = 'Empleado'
-        
-        if pd.isna(ocupacion_jefe) or ocupacion_jefe == 'nan':
-            ocupacion_jefe = 'Servicios'
-        if pd.isna(situacion_laboral) or situacion_laboral == 'nan':
-            situacion_laboral = 'Empleado'
-        
-        # ============================================================
-        # DERIVED FEATURES
-        # ============================================================
-        
-        # Asset score
-        asset_score = (tiene_telefono + tiene_cocina + tiene_refrigeradora + 
-                      tiene_lavadora + tiene_equipo_sonido + 
-                      (1 if num_vehiculos > 0 else 0))
         
-        # Tech score
-        tech_score = tiene_internet + tiene_computadora + tiene_laptop
-        
-        # Digital literacy score
-        digital_score = usa_internet + usa_correo + usa_redes
-        
-        # Transportation indicator (has vehicle)
-        has_transportation = 1 if num_vehiculos > 0 else 0
-        
-        # ============================================================
-        # SUBJECT ENROLLMENT FEATURES
-        # ============================================================
-        num_subjects = len(subject_grades)
-        
-        # Subject-specific enrollment (binary - takes this subject or not)
-        takes_lengua = 1 if 'Lengua y Literatura' in subject_grades else 0
-        takes_matematicas = 1 if 'Matemáticas' in subject_grades else 0
-        takes_ciencias = 1 if 'Ciencias Naturales' in subject_grades else 0
-        takes_sociales = 1 if 'Estudios sociales' in subject_grades else 0
-        takes_ingles = 1 if 'Inglés' in subject_grades else 0
-        takes_fisica = 1 if 'Física' in subject_grades else 0
-        takes_quimica = 1 if 'Química' in subject_grades else 0
-        takes_biologia = 1 if 'Biología' in subject_grades else 0
-        takes_historia = 1 if 'Historia' in subject_grades else 0
-        takes_ciudadania = 1 if 'Educación ciudadanía' in subject_grades else 0
-        takes_emprendimiento = 1 if 'Emprendimiento' in subject_grades else 0
-        
-        # Count of STEM vs Language subjects
-        stem_count = sum([takes_matematicas, takes_fisica, takes_quimica, takes_ciencias, takes_biologia])
-        language_count = sum([takes_lengua, takes_sociales, takes_ingles, takes_historia, takes_ciudadania])
-        
-        # Gender
-        genero = student.get('genero', 'Masculino')
-        if not genero:
-            genero = 'Masculino'
-        
-        # ============================================================
-        # BUILD RECORD
-        # ============================================================
-        record = {
-            # Target
-            'at_risk': at_risk,
-            'avg_grade': round(avg_grade, 2),  # For analysis
-            
-            # Education structure
-            'nivel_educativo': nivel_educativo,
-            'age_grade_status': age_grade_status,
-            
-            # Geographic
-            'indice_accesibilidad': indice_accesibilidad,
-            
-            # Demographics - QUINTIL IS NOW A KEY FEATURE
-            'genero': genero,
-            'quintil': quintil,  # KEY FEATURE
-            'grupo_socioeconomico': grupo_socioeconomico,
-            'tiene_diagnostico': tiene_diagnostico,
-            'escuela_procedencia': escuela_procedencia,
-            
-            # Housing - Full details
-            'tipo_vivienda': tipo_vivienda,
-            'material_paredes': material_paredes,
-            'material_piso': material_piso,
-            'cuartos_bano': cuartos_bano,
-            'tipo_sanitario': tipo_sanitario,
-            'tipo_agua': tipo_agua,
-            'tipo_electricidad': tipo_electricidad,
-            'eliminacion_basura': eliminacion_basura,
-            
-            # Technology
-            'tiene_internet': tiene_internet,
-            'tiene_computadora': tiene_computadora,
-            'tiene_laptop': tiene_laptop,
-            'num_celulares': num_celulares,
-            'tech_score': tech_score,
-            
-            # Household assets
-            'tiene_telefono': tiene_telefono,
-            'tiene_cocina': tiene_cocina,
-            'tiene_refrigeradora': tiene_refrigeradora,
-            'tiene_lavadora': tiene_lavadora,
-            'tiene_equipo_sonido': tiene_equipo_sonido,
-            'num_tv': num_tv,
-            'num_vehiculos': num_vehiculos,
-            'has_transportation': has_transportation,
-            'asset_score': asset_score,
-            
-            # Digital habits
-            'usa_internet': usa_internet,
-            'usa_correo': usa_correo,
-            'usa_redes': usa_redes,
-            'digital_score': digital_score,
-            
-            # Other habits
-            'compra_ropa_centros': compra_ropa_centros,
-            'lectura_libros': lectura_libros,
-            
-            # Family - Parent info
-            'edad_representante': int(edad_representante),
-            'sexo_representante': sexo_representante,
-            'relacion': relacion,
-            'estado_civil': estado_civil,
-            'nivel_instruccion': nivel_instruccion,
-            'nivel_instruccion_num': nivel_instruccion_num,
-            'ocupacion_rep': ocupacion_rep,
-            
-            # Economic
-            'tiene_seguro_salud': tiene_seguro_salud,
-            'tiene_seguro_privado': tiene_seguro_privado,
-            'ocupacion_jefe': ocupacion_jefe,
-            'situacion_laboral': situacion_laboral,
-            
-            # Academic - Subject enrollment
-            'num_subjects': num_subjects,
-            'takes_lengua': takes_lengua,
-            'takes_matematicas': takes_matematicas,
-            'takes_ciencias': takes_ciencias,
-            'takes_sociales': takes_sociales,
-            'takes_ingles': takes_ingles,
-            'takes_fisica': takes_fisica,
-            'takes_quimica': takes_quimica,
-            'takes_biologia': takes_biologia,
-            'takes_historia': takes_historia,
-            'takes_ciudadania': takes_ciudadania,
-            'takes_emprendimiento': takes_emprendimiento,
-            'stem_count': stem_count,
-            'language_count': language_count,
-        }
-        
-        records.append(record)
+        row = len(base_rows)
+        base_rows.append({
+            'ID': num_id,
+            'grado': student.get('grado', ''),
+            'edad': student.get('edad'),
+            'genero': student.get('genero', 'Masculino') or 'Masculino',
+            'quintil_db': student.get('quintil', 3),
+            'indice_accesibilidad': socio.get('indice_accesibilidad_geografica') or 'Moderado',
+        })
+        grade_rows.extend(
+            (row, normalize_subject(record.get('materia')), float(record['nota']))
+            for record in student.get('academic_performance', []) or []
+            if record.get('nota') is not None
+        )
     
-    print(f"\nSkipped: {skipped_no_academic} no academic, {skipped_unknown_grade} unknown grade")
+    base = pd.DataFrame(base_rows, columns=['ID', 'grado', 'edad', 'genero', 'quintil_db', 'indice_accesibilidad'])
+    grades = pd.DataFrame(grade_rows, columns=['row', 'materia', 'nota'])
+    
+    # ============================================================
+    # GRADES: TARGET (AVERAGE SCORE <= 7.5 means AT RISK) + ENROLLMENT
+    # ============================================================
+    # np.mean per student keeps the target identical at the 7.5 boundary
+    avg_grade = grades.groupby('row')['nota'].agg(lambda notas: np.mean(notas.to_numpy())).reindex(range(len(base)))
+    has_grades = avg_grade.notna().to_numpy()
     
-    df = pd.DataFrame(records)
+    enrolled = grades[grades['materia'].notna() & (grades['materia'] != '')]
+    num_subjects = enrolled.groupby('row')['materia'].nunique().reindex(range(len(base)), fill_value=0)
+    takes = (pd.crosstab(enrolled['row'], enrolled['materia']) > 0).reindex(index=range(len(base)), fill_value=False)
+    
+    # Subject-level stats (every graded record, before grade-level filtering)
+    subject_stats = {
+        materia: {'total': 0, 'at_risk': 0, 'grades': notas}
+        for materia, notas in enrolled.groupby('materia', sort=False)['nota'].agg(list).items()
+    }
+    
+    # Education level and age-grade status
+    nivel_educativo = nivel_educativo_column(base['grado'])
+    age_grade_status = age_grade_status_column(base['edad'], base['grado'])
+    
+    skipped_no_academic = int((~has_grades).sum())
+    skipped_unknown_grade = int((has_grades & (nivel_educativo == 'Unknown')).sum())
+    
+    # ============================================================
+    # CSV FEATURES (first matching row per ID, defaults column-wise)
+    # ============================================================
+    ids = base['ID'].to_numpy()
+    
+    fp, has_fp = rows_by_id(first_page_df, ids)
+    house, has_house = rows_by_id(house_df, ids)
+    habit, has_habit = rows_by_id(habit_df, ids)
+    parent, has_parent = rows_by_id(parent_df, ids)
+    economic, has_economic = rows_by_id(economic_df, ids)
+    
+    quintil = numeric_column(fp, has_fp, 'Quintil', base['quintil_db'])
+    quintil = np.where(pd.isna(quintil), 3, quintil).astype(float).astype(int)
+    edad_representante = numeric_column(parent, has_parent, 'Edad', 35).astype(float).astype(int)
+    nivel_instruccion = text_column(
+        parent, has_parent, 'Nivel Instruccion', 'Secundaria completa', 'Desconocido'
+    )
+    
+    df = pd.DataFrame({
+        'nivel_educativo': nivel_educativo,
+        'age_grade_status': age_grade_status,
+        'indice_accesibilidad': base['indice_accesibilidad'],
+        'genero': base['genero'],
+        'quintil': quintil,
+        
+        # First page
+        'grupo_socioeconomico': text_column(fp, has_fp, 'Grupo socioeconomico', 'Medio Tipico', 'Desconocido'),
+        'tiene_diagnostico': parsed_column(fp, has_fp, 'nombre_Diagnostico psicologico', 0, parse_diagnostico),
+        'escuela_procedencia': parsed_column(fp, has_fp, 'Escuela_Procedencia', 0, parse_escuela_procedencia),
+        
+        # House
+        'tipo_vivienda': text_column(house, has_house, 'Tipo vivienda', 'Casa/Villa', 'Desconocido'),
+        'material_paredes': text_column(house, has_house, 'Material_Pared', 'Ladrillo', 'Desconocido'),
+        'material_piso': text_column(house, has_house, 'Material_Piso', 'Cerámica/Baldosa', 'Desconocido'),
+        'cuartos_bano': parsed_column(house, has_house, 'N_banos', 1, parse_bathrooms),
+        'tipo_sanitario': text_column(house, has_house, 'Servicio_Higienico', 'Conectado a red pública', 'Desconocido'),
+        'tipo_agua': text_column(house, has_house, 'Agua', 'Red pública', 'Desconocido'),
+        'tipo_electricidad': text_column(house, has_house, 'Tipo_Luz', 'Medidor propio', 'Desconocido'),
+        'eliminacion_basura': text_column(house, has_house, 'Eliminacion_basura', 'Servicio municipal', 'Desconocido'),
+        'tiene_internet': parsed_column(house, has_house, 'Internet', 0, parse_si_no),
+        'tiene_computadora': parsed_column(house, has_house, 'Computadora', 0, parse_si_no),
+        'tiene_laptop': parsed_column(house, has_house, 'Laptop', 0, parse_si_no),
+        'num_celulares': parsed_column(house, has_house, 'Celulares', 2, parse_count),
+        
+        # Habit
+        'tiene_telefono': parsed_column(habit, has_habit, 'Telefono_convencional', 0, parse_si_no),
+        'tiene_cocina': parsed_column(habit, has_habit, 'Cocina_horno', 1, parse_si_no),
+        'tiene_refrigeradora': parsed_column(habit, has_habit, 'Refrigeradora', 1, parse_si_no),
+        'tiene_lavadora': parsed_column(habit, has_habit, 'Lavadora', 1, parse_si_no),
+        'tiene_equipo_sonido': parsed_column(habit, has_habit, 'Equipo de sonido', 0, parse_si_no),
+        'num_tv': parsed_column(habit, has_habit, 'TV', 1, parse_count),
+        'num_vehiculos': parsed_column(habit, has_habit, 'Vehiculos', 0, parse_count),
+        'compra_ropa_centros': parsed_column(habit, has_habit, 'Compra_Ropa_Centros', 0, parse_si_no),
+        'usa_internet': parsed_column(habit, has_habit, 'Uso_Internet', 1, parse_si_no),
+        'usa_correo': parsed_column(habit, has_habit, 'Uso_correo', 1, parse_si_no),
+        'usa_redes': parsed_column(habit, has_habit, 'Red_social', 1, parse_si_no),
+        'lectura_libros': parsed_column(habit, has_habit, 'Lectura_libros', 0, parse_si_no),
+        
+        # Parent
+        'edad_representante': edad_representante,
+        'sexo_representante': text_column(parent, has_parent, 'Sexo', 'Femenino', 'Desconocido'),
+        'relacion': text_column(parent, has_parent, 'Relacion', 'Madre', 'Desconocido'),
+        'estado_civil': text_column(parent, has_parent, 'Estado civil', 'Casado', 'Desconocido'),
+        'nivel_instruccion': nivel_instruccion,
+        'nivel_instruccion_num': education_level_column(nivel_instruccion),
+        'ocupacion_rep': text_column(parent, has_parent, 'Ocupacion', 'Desconocido', 'Desconocido'),
+        
+        # Economic
+        'tiene_seguro_salud': parsed_column(economic, has_economic, 'Seguro_Salud', 1, parse_si_no),
+        'tiene_seguro_privado': parsed_column(economic, has_economic, 'Seguro_Privado', 0, parse_si_no),
+        'ocupacion_jefe': text_column(economic, has_economic, 'Ocupacion_Jefe', 'Servicios'),
+        'situacion_laboral': text_column(economic, has_economic, 'Situacion_laboral', 'Empleado'),
+    })
+    
+    # ============================================================
+    # DERIVED FEATURES
+    # ============================================================
+    df = df.assign(**derived_scores(df))
+    df['has_transportation'] = (df['num_vehiculos'] > 0).astype(int)
+    
+    # Subject enrollment (binary - takes this subject or not)
+    df['num_subjects'] = num_subjects.to_numpy()
+    for col, materia in TAKES_SUBJECTS.items():
+        df[col] = (takes[materia] if materia in takes.columns else pd.Series(False, index=takes.index)).to_numpy().astype(int)
+    df['stem_count'] = df[['takes_matematicas', 'takes_fisica', 'takes_quimica', 'takes_ciencias', 'takes_biologia']].sum(axis=1)
+    df['language_count'] = df[['takes_lengua', 'takes_sociales', 'takes_ingles', 'takes_historia', 'takes_ciudadania']].sum(axis=1)
+    
+    df.insert(0, 'at_risk', (avg_grade <= 7.5).astype(int).to_numpy())
+    df.insert(1, 'avg_grade', avg_grade.round(2).to_numpy())  # For analysis
+    
+    # Students without graded records or with an unknown grade are skipped
+    df = df[has_grades & (nivel_educativo != 'Unknown')].reset_index(drop=True)
+    df = df[RECORD_COLUMNS]
+    
+    print(f"\nSkipped: {skipped_no_academic} no academic, {skipped_unknown_grade} unknown grade")
     
     # Clean categorical columns
     cat_cols = ['nivel_educativo', 'age_grade_status', 'indice_accesibilidad', 
@@ -619,7 +321,10 @@ def build_enhanced_dataset():
     
     print(f"\n✅ Dataset built: {len(df)} students with {len(df.columns)} features")
     
-    # Print subject statistics
+    return df, subject_stats
+
+def print_subject_stats(subject_stats):
+    """Print subject statistics (also on a training cache hit)"""
     print("\n" + "=" * 70)
     print("SUBJECT-LEVEL ANALYSIS")
     print("=" * 70)
@@ -629,8 +334,92 @@ def build_enhanced_dataset():
             avg = np.mean(stats['grades'])
             fail_rate = sum(1 for g in stats['grades'] if g <= 7.0) / len(stats['grades']) * 100
             print(f"  {subj}: n={len(stats['grades'])}, avg={avg:.2f}, fail_rate={fail_rate:.1f}%")
+
+# ============================================================================
+# TRAINING DATA PREPARATION (CACHED)
+# ============================================================================
+
+def encode_categoricals(X_train, X_test, cat_features):
+    """Label-encode categorical features for non-CatBoost models"""
+    X_train_encoded = X_train.copy()
+    X_test_encoded = X_test.copy()
+    encoders = {}
     
-    return df, subject_stats
+    for col in cat_features:
+        le = LabelEncoder()
+        all_values = pd.concat([X_train[col], X_test[col]]).astype(str)
+        le.fit(all_values)
+        X_train_encoded[col] = le.transform(X_train[col].astype(str))
+        X_test_encoded[col] = le.transform(X_test[col].astype(str))
+        encoders[col] = le
+    
+    return X_train_encoded, X_test_encoded, encoders
+
+def prepare_training_data(df, subject_stats):
+    """Split, encode, scale and fold the dataset: everything done before model fitting"""
+    target_col = 'at_risk'
+    exclude_cols = ['at_risk', 'avg_grade']  # avg_grade is for analysis only
+    
+    feature_cols = [c for c in df.columns if c not in exclude_cols]
+    
+    # Identify categorical features
+    cat_features = [c for c in feature_cols if df[c].dtype == 'object']
+    
+    X = df[feature_cols]
+    y = df[target_col]
+    
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=SPLIT_PARAMS['test_size'], random_state=SPLIT_PARAMS['random_state'], stratify=y
+    )
+    X_train_encoded, X_test_encoded, encoders = encode_categoricals(X_train, X_test, cat_features)
+    
+    # Scale for SVM
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train_encoded)
+    X_test_scaled = scaler.transform(X_test_encoded)
+    
+    cv = StratifiedKFold(n_splits=SPLIT_PARAMS['n_splits'], shuffle=True, random_state=SPLIT_PARAMS['random_state'])
+    
+    return {
+        'df': df,
+        'subject_stats': subject_stats,
+        'target': target_col,
+        'cat_features': cat_features,
+        'feature_cols': feature_cols,
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': y_train, 'y_test': y_test,
+        'X_train_encoded': X_train_encoded, 'X_test_encoded': X_test_encoded,
+        'X_train_scaled': X_train_scaled, 'X_test_scaled': X_test_scaled,
+        'encoders': encoders,
+        'scaler': scaler,
+        'folds': list(cv.split(X_train, y_train)),
+    }
+
+def load_training_data(rebuild=False):
+    """
+    Prepared training data, from the cache when its inputs did not change
+
+    The key covers the CSV file contents, the roster version, the features
+    version, the builder code and the split parameters (see
+    analysis/dataset_cache.py).
+    """
+    students = load_students()
+    key = cache_key(
+        csv=csv_digests(),
+        roster=roster_version(students),
+        features_version=FEATURES_VERSION,
+        code=code_digest(
+            feature_definitions, subject_taxonomy,
+            build_enhanced_dataset, encode_categoricals, prepare_training_data
+        ),
+        split=SPLIT_PARAMS
+    )
+    data, cached = TrainingCache().get_or_build(
+        key, lambda: prepare_training_data(*build_enhanced_dataset(students)), refresh=rebuild
+    )
+    if cached:
+        print(f"\n♻️ Training data loaded from cache ({key}): {len(data['df'])} students")
+    return data
 
 # ============================================================================
 # DATA QUALITY CHECK
@@ -690,34 +479,19 @@ def data_quality_check(df):
 # MODEL TRAINING
 # ============================================================================
 
-def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, feature_cols):
+def train_and_compare_models(data, search=False):
     """Train multiple models and compare performance"""
     print("\n" + "=" * 70)
     print("MODEL TRAINING AND COMPARISON")
     print("=" * 70)
     
+    y_train, y_test = data['y_train'], data['y_test']
+    cat_features = data['cat_features']
+    
     # Class ratio for weighting
     class_ratio = (y_train == 0).sum() / (y_train == 1).sum()
     print(f"Class ratio (neg/pos): {class_ratio:.2f}")
     
-    # Encode categorical features for non-CatBoost models
-    X_train_encoded = X_train.copy()
-    X_test_encoded = X_test.copy()
-    encoders = {}
-    
-    for col in cat_features:
-        le = LabelEncoder()
-        all_values = pd.concat([X_train[col], X_test[col]]).astype(str)
-        le.fit(all_values)
-        X_train_encoded[col] = le.transform(X_train[col].astype(str))
-        X_test_encoded[col] = le.transform(X_test[col].astype(str))
-        encoders[col] = le
-    
-    # Scale for SVM
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train_encoded)
-    X_test_scaled = scaler.transform(X_test_encoded)
-    
     # Define models
     models = {
         'Logistic_Regression': LogisticRegression(
@@ -784,32 +558,34 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
     best_model = None
     best_score = 0
     
-    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    # Select appropriate data format per model
+    model_data = {}
+    for name in models:
+        if name == 'CatBoost':
+            model_data[name] = (data['X_train'], data['X_test'])
+        elif name == 'SVM_RBF':
+            model_data[name] = (data['X_train_scaled'], data['X_test_scaled'])
+        else:
+            model_data[name] = (data['X_train_encoded'], data['X_test_encoded'])
+    
+    # Hyperband search with early stopping on the CV folds (--search):
+    # the tuned estimators replace the fixed configurations above
+    tuned = {}
+    if search:
+        tuned, _ = hyperband_search(models, model_data, y_train, y_test, data['folds'], SEARCH_BUDGET_SECONDS)
+        models.update(tuned)
     
-    for name, model in models.items():
+    # Cross-validation + full training set fit as parallel (model, fold) tasks
+    comparison = compare_models(models, model_data, y_train, y_test, data['folds'])
+    
+    for name, run in comparison.items():
         print(f"\n🔄 Training {name}...")
         
         try:
-            # Select appropriate data format
-            if name == 'CatBoost':
-                X_tr, X_te = X_train, X_test
-            elif name == 'SVM_RBF':
-                X_tr, X_te = X_train_scaled, X_test_scaled
-            else:
-                X_tr, X_te = X_train_encoded, X_test_encoded
-            
-            # Cross-validation
-            if name == 'SVM_RBF':
-                cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=cv, scoring='roc_auc')
-            else:
-                cv_scores = cross_val_score(model, X_tr, y_train, cv=cv, scoring='roc_auc')
-            
-            # Train on full training set
-            model.fit(X_tr, y_train)
-            
-            # Predict
-            y_pred = model.predict(X_te)
-            y_prob = model.predict_proba(X_te)[:, 1] if hasattr(model, 'predict_proba') else y_pred
+            if run.error is not None:
+                raise run.error
+            model, y_pred, y_prob = run.model, run.y_pred, run.y_prob
+            cv_scores = np.array(run.cv_scores)
             
             # Calculate metrics
             metrics = {
@@ -822,6 +598,8 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
                 'balanced_accuracy': balanced_accuracy_score(y_test, y_pred),
                 'cv_mean': cv_scores.mean(),
                 'cv_std': cv_scores.std(),
+                'fit_seconds': run.seconds,
+                'tuned': name in tuned,
             }
             
             # Confusion matrix details
@@ -846,48 +624,63 @@ def train_and_compare_models(X_train, X_test, y_train, y_test, cat_features, fea
         except Exception as e:
             print(f"   ❌ Error: {str(e)}")
     
-    return results, best_model, encoders, scaler
+    return results, best_model
 
 # ============================================================================
 # THRESHOLD OPTIMIZATION
 # ============================================================================
 
 def optimize_threshold(model, X_test, y_test, model_name):
-    """Find optimal threshold for maximizing recall"""
+    """
+    Find optimal threshold for maximizing recall
+
+    The confusion matrix at every distinct test probability comes from one
+    sort + cumulative sums (services/operating_points.py); the reported
+    thresholds and the optimal ones are lookups on that table.
+    """
     print("\n" + "=" * 70)
     print("THRESHOLD OPTIMIZATION FOR MAXIMUM RECALL")
     print("=" * 70)
     
     y_prob = model.predict_proba(X_test)[:, 1]
+    table = OperatingPoints(build_operating_points(y_test, y_prob))
     
     threshold_results = []
-    for threshold in [0.5, 0.45, 0.4, 0.35, 0.3, 0.25, 0.2, 0.15, 0.1]:
-        y_pred = (y_prob >= threshold).astype(int)
-        
-        tn, fp, fn, tp = confusion_matrix(y_test, y_pred).ravel()
-        
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    for threshold in REPORT_THRESHOLDS:
+        point = table.at_threshold(threshold)
+        tp, fp, fn, tn = point['tp'], point['fp'], point['fn'], point['tn']
         
         result = {
             'threshold': threshold,
-            'recall': recall,
-            'precision': precision,
-            'f1': f1,
-            'tp': int(tp),
-            'fp': int(fp),
-            'fn': int(fn),
-            'tn': int(tn),
-            'missed': int(fn),
-            'false_alarms': int(fp)
+            'recall': point['recall'],
+            'precision': point['precision'],
+            'f1': point['f1'],
+            'tp': tp,
+            'fp': fp,
+            'fn': fn,
+            'tn': tn,
+            'missed': fn,
+            'false_alarms': fp
         }
         threshold_results.append(result)
         
-        print(f"   Threshold {threshold:.2f}: Recall={recall:.1%}, Precision={precision:.1%}, "
+        print(f"   Threshold {threshold:.2f}: Recall={result['recall']:.1%}, Precision={result['precision']:.1%}, "
               f"Missed={fn}, False Alarms={fp}")
     
-    return threshold_results
+    # Exact optima over every distinct probability
+    optimal = {
+        'max_f1': table.for_max_f1(),
+        'min_cost': table.for_min_cost(MISSED_AT_RISK_COST),
+        'recall_90': table.for_min_recall(0.90),
+    }
+    print(f"\n   Sweep over {len(table)} distinct thresholds (missed at-risk = {MISSED_AT_RISK_COST} false alarms):")
+    for name, point in optimal.items():
+        if point is not None:
+            print(f"   {name:<10} threshold={point['threshold']:.4f}: Recall={point['recall']:.1%}, "
+                  f"Precision={point['precision']:.1%}, Missed={point['fn']}, False Alarms={point['fp']}")
+    optimal['missed_at_risk_cost'] = MISSED_AT_RISK_COST
+    
+    return threshold_results, optimal
 
 # ============================================================================
 # FEATURE IMPORTANCE
@@ -944,43 +737,33 @@ def main():
     print("Target: Average Score <= 7.5 means AT RISK")
     print("=" * 70)
     
-    # Build dataset
-    df, subject_stats = build_enhanced_dataset()
+    # Build (or load the cached) dataset, split, encoders, scaler and CV folds
+    data = load_training_data(rebuild='--rebuild' in sys.argv)
+    search = '--search' in sys.argv
+    df, subject_stats = data['df'], data['subject_stats']
+    print_subject_stats(subject_stats)
     
     # Data quality check
     df = data_quality_check(df)
     
-    # Prepare features
-    target_col = 'at_risk'
-    exclude_cols = ['at_risk', 'avg_grade']  # avg_grade is for analysis only
-    
-    feature_cols = [c for c in df.columns if c not in exclude_cols]
-    
-    # Identify categorical features
-    cat_features = [c for c in feature_cols if df[c].dtype == 'object']
+    feature_cols = data['feature_cols']
+    cat_features = data['cat_features']
     
     print(f"\n📋 FEATURE SUMMARY:")
     print(f"   Total features: {len(feature_cols)}")
     print(f"   Categorical: {len(cat_features)}")
     print(f"   Numeric: {len(feature_cols) - len(cat_features)}")
     
-    # Prepare X and y
-    X = df[feature_cols]
-    y = df[target_col]
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    X_train, X_test = data['X_train'], data['X_test']
+    y_train, y_test = data['y_train'], data['y_test']
+    encoders = data['encoders']
     
     print(f"\n📊 DATA SPLIT:")
     print(f"   Training: {len(X_train)} ({y_train.sum()} at-risk, {y_train.sum()/len(y_train)*100:.1f}%)")
     print(f"   Testing: {len(X_test)} ({y_test.sum()} at-risk, {y_test.sum()/len(y_test)*100:.1f}%)")
     
     # Train models
-    results, best_model, encoders, scaler = train_and_compare_models(
-        X_train, X_test, y_train, y_test, cat_features, feature_cols
-    )
+    results, best_model = train_and_compare_models(data, search=search)
     
     if best_model is None:
         print("\n❌ No models trained successfully!")
@@ -992,19 +775,13 @@ def main():
     
     # Optimize threshold
     if best_name == 'SVM_RBF':
-        X_test_for_threshold = scaler.transform(
-            X_test.copy().apply(lambda x: encoders[x.name].transform(x.astype(str)) 
-                               if x.name in encoders else x)
-        )
+        X_test_for_threshold = data['X_test_scaled']
     elif best_name == 'CatBoost':
         X_test_for_threshold = X_test
     else:
-        X_test_encoded = X_test.copy()
-        for col in cat_features:
-            X_test_encoded[col] = encoders[col].transform(X_test[col].astype(str))
-        X_test_for_threshold = X_test_encoded
+        X_test_for_threshold = data['X_test_encoded']
     
-    threshold_results = optimize_threshold(model, X_test_for_threshold, y_test, best_name)
+    threshold_results, optimal_thresholds = optimize_threshold(model, X_test_for_threshold, y_test, best_name)
     
     # Get feature importance
     if best_name == 'CatBoost':
@@ -1042,6 +819,7 @@ def main():
         },
         'all_models': results,
         'threshold_optimization': threshold_results,
+        'optimal_thresholds': optimal_thresholds,
         'top_features': importance_data[:20] if importance_data else []
     }
     
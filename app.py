@@ -15,6 +15,7 @@ import logging
 from routes.students import students_bp
 from routes.predictions import predictions_bp
 from routes.institutional import institutional_bp
+from routes.cohorts import cohorts_bp
 
 
 def create_app():
@@ -43,6 +44,7 @@ def create_app():
     app.register_blueprint(students_bp, url_prefix="/api")
     app.register_blueprint(predictions_bp, url_prefix="/api")
     app.register_blueprint(institutional_bp, url_prefix="/api")
+    app.register_blueprint(cohorts_bp, url_prefix="/api")
 
     # Ruta de health check
     @app.route("/")
@@ -30,6 +30,65 @@ class Config:
     # Model
     MODEL_PATH = os.getenv("MODEL_PATH", "./models/trained/catboost_model.pkl")
     MODEL_VERSION = os.getenv("MODEL_VERSION", "1.0.0")
+    MODEL_SCORER_PATH = os.getenv(
+        "MODEL_SCORER_PATH",
+        "./analysis/comprehensive_model_output/best_model_scorer.npz",
+    )
+    MODEL_REPORT_PATH = os.getenv(
+        "MODEL_REPORT_PATH",
+        "./analysis/comprehensive_model_output/comprehensive_model_report.json",
+    )
+    FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH", "./analysis/feature_store")
+
+    # Umbral de alerta del tablero institucional (modificable en /api/alert-threshold).
+    # Solo define la matriz de confusión y las métricas esperadas del tablero;
+    # /predict, /batch-predict y el pipeline de scoring no lo aplican.
+    OPERATING_POINTS_PATH = os.getenv(
+        "OPERATING_POINTS_PATH",
+        "./analysis/comprehensive_model_output/operating_points.json",
+    )
+    ALERT_THRESHOLD = float(os.getenv("ALERT_THRESHOLD", 0.5))
+
+    # Micro-batching de /predict
+    PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", 32))
+    PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", 5))
+    PREDICT_TIMEOUT_SECONDS = float(os.getenv("PREDICT_TIMEOUT_SECONDS", 10))
+
+    # Trabajos asíncronos de /batch-predict/jobs
+    BATCH_JOB_WORKERS = int(os.getenv("BATCH_JOB_WORKERS", 2))
+    BATCH_JOB_CHUNK_SIZE = int(os.getenv("BATCH_JOB_CHUNK_SIZE", 100))
+    BATCH_JOB_MAX_RETAINED = int(os.getenv("BATCH_JOB_MAX_RETAINED", 50))
+
+    # Coalescencia de escrituras en risk_predictions
+    PREDICTION_WRITE_COALESCING = (
+        os.getenv("PREDICTION_WRITE_COALESCING", "True") == "True"
+    )
+    PREDICTION_HEARTBEAT = os.getenv("PREDICTION_HEARTBEAT", "False") == "True"
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 10000))
+    # Vigencia (s) de la última predicción en caché; 0 = releerla en cada escritura
+    # (desactiva la caché). Con otros procesos escribiendo risk_predictions una
+    # entrada puede quedar desactualizada hasta por este tiempo
+    PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", 30))
+
+    # Scoring en sombra de un modelo candidato (vacío = desactivado)
+    SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+    SHADOW_LOG_PATH = os.getenv("SHADOW_LOG_PATH", "./logs/shadow_scoring.jsonl")
+    SHADOW_LATENCY_BUDGET_MS = float(os.getenv("SHADOW_LATENCY_BUDGET_MS", 50))
+    SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", 1000))
+    SHADOW_AGREEMENT_THRESHOLD = float(os.getenv("SHADOW_AGREEMENT_THRESHOLD", 0.5))
+
+    # Snapshot del padrón para los gráficos institucionales
+    ROSTER_SNAPSHOT_TTL_SECONDS = float(os.getenv("ROSTER_SNAPSHOT_TTL_SECONDS", 300))
+    ROSTER_SNAPSHOT_LIMIT = int(os.getenv("ROSTER_SNAPSHOT_LIMIT", 1000))
+
+    # Caché de payloads de gráficos (stale-while-revalidate)
+    PAYLOAD_CACHE_TTL_SECONDS = float(os.getenv("PAYLOAD_CACHE_TTL_SECONDS", 60))
+    PAYLOAD_CACHE_MAX_STALE_SECONDS = float(os.getenv("PAYLOAD_CACHE_MAX_STALE_SECONDS", 3600))
+
+    # Intervalos de confianza bootstrap de los gráficos (?ci=true)
+    BOOTSTRAP_RESAMPLES = int(os.getenv("BOOTSTRAP_RESAMPLES", 2000))
+    BOOTSTRAP_CONFIDENCE = float(os.getenv("BOOTSTRAP_CONFIDENCE", 0.95))
+    BOOTSTRAP_SEED = int(os.getenv("BOOTSTRAP_SEED", 2025))
 
     # Application
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -10,7 +10,9 @@ export interface DistributionStats {
   q1: number;
   q3: number;
   count: number;
-  values: number[];
+  // Raw values (summary=values) or fixed-size density (summary=histogram)
+  values?: number[];
+  density?: { binEdges: number[]; counts: number[] };
 }
 
 export interface HistogramData {
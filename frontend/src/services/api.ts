@@ -51,24 +51,86 @@ export const getStudentProfile = (studentId: string) => {
   return api.get(`/student/${studentId}`);
 };
 
-export const getInstitutionalStats = () => {
-  return api.get('/institutional-stats');
+export const getInstitutionalStats = (ci?: boolean) => {
+  return api.get(ci ? '/institutional-stats?ci=true' : '/institutional-stats');
 };
 
 export const getBarriersAnalysis = () => {
   return api.get('/barriers-analysis');
 };
 
-export const getScoreDistributions = () => {
-  return api.get('/score-distributions');
+export const getScoreDistributions = (summary?: 'values' | 'histogram', bins?: number) => {
+  const params = new URLSearchParams();
+  if (summary) params.append('summary', summary);
+  if (bins) params.append('bins', bins.toString());
+  const query = params.toString();
+  return api.get(query ? `/score-distributions?${query}` : '/score-distributions');
+};
+
+export const getAcademicInsights = (ci?: boolean) => {
+  return api.get(ci ? '/academic-insights?ci=true' : '/academic-insights');
 };
 
-export const getAcademicInsights = () => {
-  return api.get('/academic-insights');
+export const getCorrelations = (features?: string[], method?: 'pearson' | 'spearman') => {
+  const params = new URLSearchParams();
+  if (features && features.length) params.append('features', features.join(','));
+  if (method) params.append('method', method);
+  const query = params.toString();
+  return api.get(query ? `/correlations?${query}` : '/correlations');
 };
 
 export const predictRisk = (studentId: string) => {
   return api.post('/predict', { student_id: studentId });
 };
 
+// Whole-school scoring runs as a background job; poll it instead of waiting
+export const createBatchPredictionJob = (studentIds?: string[]) => {
+  return api.post(
+    '/batch-predict/jobs',
+    studentIds ? { student_ids: studentIds } : { all_students: true },
+  );
+};
+
+export const getBatchPredictionJob = (jobId: string, offset = 0) => {
+  return api.get(`/batch-predict/jobs/${jobId}?offset=${offset}`);
+};
+
+export type AlertThresholdPolicy =
+  | { threshold: number }
+  | { min_recall: number }
+  | { min_precision: number };
+
+export const getCohorts = (groupBy: string[], filters: Record<string, string[]> = {}) => {
+  const params = new URLSearchParams();
+  if (groupBy.length) params.append('group_by', groupBy.join(','));
+  Object.entries(filters).forEach(([dimension, values]) => {
+    params.append('filter', `${dimension}:${values.join('|')}`);
+  });
+  return api.get(`/cohorts?${params.toString()}`);
+};
+
+export const getBarrierCohort = (query: { all?: string[]; any?: string[]; none?: string[] }) => {
+  const params = new URLSearchParams();
+  Object.entries(query).forEach(([key, names]) => {
+    if (names && names.length) params.append(key, names.join(','));
+  });
+  return api.get(`/cohorts/barriers?${params.toString()}`);
+};
+
+export const getBarrierCooccurrence = () => {
+  return api.get('/cohorts/barriers/co-occurrence');
+};
+
+export const getAlertThreshold = () => {
+  return api.get('/alert-threshold');
+};
+
+export const updateAlertThreshold = (policy: AlertThresholdPolicy) => {
+  return api.put('/alert-threshold', policy);
+};
+
+export const getOperatingPoints = () => {
+  return api.get('/operating-points');
+};
+
 export default api;
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Text,
     DateTime,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -119,6 +120,30 @@ class RiskPrediction(Base):
     predicted_quintil = Column(Integer)
     prediction_date = Column(DateTime, default=datetime.utcnow)
     model_version = Column(String)
+    model_probability = Column(Float)  # Probabilidad del modelo ML (0-1)
 
     # Relación
     student = relationship("Student", back_populates="risk_predictions")
+
+    # Índices compuestos para el historial paginado (keyset sobre prediction_date, id)
+    __table_args__ = (
+        Index(
+            "idx_predictions_student_date_id",
+            student_id,
+            prediction_date.desc(),
+            id.desc(),
+        ),
+        Index("idx_predictions_date_id", prediction_date.desc(), id.desc()),
+        Index(
+            "idx_predictions_level_date_id",
+            risk_level,
+            prediction_date.desc(),
+            id.desc(),
+        ),
+        Index(
+            "idx_predictions_version_date_id",
+            model_version,
+            prediction_date.desc(),
+            id.desc(),
+        ),
+    )
@@ -117,17 +117,20 @@ CREATE TABLE risk_predictions (
   predicted_quintil INTEGER CHECK (predicted_quintil BETWEEN 1 AND 5),
   prediction_date TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   model_version TEXT,
+  model_probability NUMERIC(5,4) CHECK (model_probability >= 0 AND model_probability <= 1),
   CONSTRAINT unique_prediction_per_date UNIQUE (student_id, prediction_date)
 );
 
--- Índices
-CREATE INDEX idx_predictions_student_id ON risk_predictions(student_id);
-CREATE INDEX idx_predictions_risk_level ON risk_predictions(risk_level);
-CREATE INDEX idx_predictions_date ON risk_predictions(prediction_date DESC);
+-- Índices compuestos para el historial paginado (keyset sobre prediction_date, id)
+CREATE INDEX idx_predictions_student_date_id ON risk_predictions(student_id, prediction_date DESC, id DESC);
+CREATE INDEX idx_predictions_date_id ON risk_predictions(prediction_date DESC, id DESC);
+CREATE INDEX idx_predictions_level_date_id ON risk_predictions(risk_level, prediction_date DESC, id DESC);
+CREATE INDEX idx_predictions_version_date_id ON risk_predictions(model_version, prediction_date DESC, id DESC);
 
 -- Comentarios
 COMMENT ON TABLE risk_predictions IS 'Predicciones de riesgo académico generadas por el modelo ML';
 COMMENT ON COLUMN risk_predictions.risk_score IS 'Score de riesgo (0-100, mayor = más riesgo)';
+COMMENT ON COLUMN risk_predictions.model_probability IS 'Probabilidad de riesgo del modelo ML (pipeline de scoring)';
 
 
 -- =====================================================
@@ -168,6 +171,13 @@ LEFT JOIN LATERAL (
     LIMIT 1
 ) rp ON true;
 
+-- Vista: Última predicción de cada estudiante
+-- (usada por la capa de persistencia para no reinsertar predicciones sin cambios)
+CREATE OR REPLACE VIEW latest_risk_predictions AS
+SELECT DISTINCT ON (student_id) *
+FROM risk_predictions
+ORDER BY student_id, prediction_date DESC, id DESC;
+
 -- Vista: Estudiantes con materias en riesgo
 CREATE OR REPLACE VIEW students_at_academic_risk AS
 SELECT 
@@ -0,0 +1,167 @@
+"""
+Rutas de consulta de cohortes
+
+Endpoints:
+- GET /api/cohorts: Estudiantes, riesgo y promedio por combinación de dimensiones
+- GET /api/cohorts/barriers: Tamaño de una cohorte definida por barreras (AND/OR/NOT)
+- GET /api/cohorts/barriers/co-occurrence: Matriz de co-ocurrencia de barreras
+"""
+from flask import Blueprint, jsonify, request
+from services.barrier_index import BARRIER_LABELS, HAS_SOCIO, SETS, get_barrier_index
+from services.cohort_cube import DIMENSIONS, get_cohort_cube
+from services.roster_frame import BARRIERS
+from services.roster_snapshot import get_roster_snapshot
+import logging
+
+logger = logging.getLogger(__name__)
+
+cohorts_bp = Blueprint("cohorts", __name__)
+
+
+@cohorts_bp.route("/cohorts", methods=["GET"])
+def get_cohorts():
+    """
+    Obtiene medidas de cohortes agrupadas y filtradas por cualquier combinación
+    de dimensiones (quintil, grado, nivel_educativo, genero, laptop, internet,
+    parent_education)
+
+    Query params:
+        - group_by: Dimensiones separadas por coma (ej: quintil,genero)
+        - filter: dimension:valor1|valor2 (repetible, ej: filter=laptop:No&filter=grado:8|9);
+          laptop e internet aceptan también true/false, 1/0, si/no
+
+    Returns:
+        JSON con una celda por combinación no vacía (estudiantes, en riesgo,
+        tasa de riesgo y promedio)
+    """
+    try:
+        group_by = [dim.strip() for dim in request.args.get("group_by", "").split(",") if dim.strip()]
+        filters, error = _parse_cohort_filters(request.args.getlist("filter"))
+        if error:
+            return jsonify({"error": error}), 400
+
+        snapshot = get_roster_snapshot()
+        if snapshot is None:
+            return jsonify({"error": "No se encontraron estudiantes"}), 404
+
+        cube = get_cohort_cube(snapshot)
+        try:
+            cells = cube.query(group_by, filters)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        response = {
+            "groupBy": group_by,
+            "filters": filters,
+            "cells": cells,
+            "total": len(cells),
+            "dataVersion": snapshot.version,
+        }
+
+        logger.info(f"Cohorts retrieved: group_by={group_by}, {len(cells)} cells")
+        return jsonify(response), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_cohorts: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error al obtener cohortes"}), 500
+
+
+@cohorts_bp.route("/cohorts/barriers", methods=["GET"])
+def get_barrier_cohort():
+    """
+    Cuenta los estudiantes que cumplen una combinación de barreras/categorías
+
+    Query params:
+        - all: Conjuntos que deben cumplirse todos (ej: sin_laptop,sin_internet)
+        - any: Conjuntos de los que basta uno
+        - none: Conjuntos que no deben cumplirse (ej: riesgo_bajo)
+
+    Returns:
+        JSON con el tamaño de la cohorte y su porcentaje sobre el padrón
+    """
+    try:
+        query = {key: _split_sets(request.args.get(key, "")) for key in ("all", "any", "none")}
+        unknown = [name for names in query.values() for name in names if name not in SETS]
+        if unknown:
+            return jsonify({"error": f"Conjuntos desconocidos: {', '.join(unknown)}. Conjuntos válidos: {', '.join(SETS)}"}), 400
+
+        snapshot = get_roster_snapshot()
+        if snapshot is None:
+            return jsonify({"error": "No se encontraron estudiantes"}), 404
+
+        index = get_barrier_index(snapshot)
+        count = index.count(all_of=query["all"], any_of=query["any"], none_of=query["none"])
+        population = index.population
+
+        return jsonify({
+            "query": query,
+            "count": count,
+            "population": population,
+            "percentage": round(count / population * 100, 1) if population else 0,
+            "dataVersion": snapshot.version,
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_barrier_cohort: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error al obtener cohorte de barreras"}), 500
+
+
+@cohorts_bp.route("/cohorts/barriers/co-occurrence", methods=["GET"])
+def get_barrier_cooccurrence():
+    """
+    Obtiene la co-ocurrencia de barreras entre estudiantes con datos socioeconómicos
+
+    Returns:
+        JSON con el total por barrera, la matriz de co-ocurrencia y los
+        estudiantes con al menos k barreras
+    """
+    try:
+        snapshot = get_roster_snapshot()
+        if snapshot is None:
+            return jsonify({"error": "No se encontraron estudiantes"}), 404
+
+        index = get_barrier_index(snapshot)
+        with_socio = index.bitset(HAS_SOCIO)
+        matrix = index.cooccurrence(within=with_socio)
+
+        return jsonify({
+            "barriers": [
+                {"key": name, "label": BARRIER_LABELS[name], "count": matrix[i][i]}
+                for i, name in enumerate(BARRIERS)
+            ],
+            "matrix": matrix,
+            "atLeast": {
+                str(k): index.at_least(k, within=with_socio).bit_count()
+                for k in range(1, len(BARRIERS) + 1)
+            },
+            "population": with_socio.bit_count(),
+            "dataVersion": snapshot.version,
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_barrier_cooccurrence: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error al obtener co-ocurrencia de barreras"}), 500
+
+
+def _split_sets(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _parse_cohort_filters(raw_filters):
+    """
+    Convierte filtros "dimension:valor1|valor2" en un dict
+
+    Returns:
+        tuple: (dict dimensión -> valores, mensaje de error o None)
+    """
+    filters = {}
+    for raw in raw_filters:
+        dim, sep, values = raw.partition(":")
+        dim = dim.strip()
+        if not sep or not dim or not values:
+            return None, f"Filtro inválido '{raw}', use dimension:valor1|valor2"
+        if dim not in DIMENSIONS:
+            return None, f"Dimensión desconocida '{dim}'. Dimensiones válidas: {', '.join(DIMENSIONS)}"
+        filters.setdefault(dim, []).extend(v.strip() for v in values.split("|") if v.strip())
+
+    return filters, None
@@ -2,56 +2,89 @@
 Rutas relacionadas con estadísticas institucionales
 
 Endpoints:
-- GET /api/institutional-stats: Estadísticas globales para la vista institucional
-- GET /api/score-distributions: Distribuciones de notas para gráficos avanzados
+- GET /api/institutional-stats: Estadísticas globales para la vista institucional (?ci=true)
+- GET /api/score-distributions: Distribuciones de notas para gráficos avanzados (?summary=histogram)
 - GET /api/barriers-analysis: Análisis detallado de barreras
 - GET /api/model-comparison: Comparación de modelos ML (nuevo)
 - GET /api/feature-importance: Importancia de características del modelo
 - GET /api/education-level-analysis: Análisis por nivel educativo
+- GET /api/correlations: Matriz de correlación de features y notas por materia (?features=&method=)
+- GET /api/operating-points: Tabla de puntos de operación del modelo
+- GET /api/alert-threshold: Umbral de alerta vigente
+- PUT /api/alert-threshold: Cambia el umbral de alerta (threshold, min_recall, min_precision o cost_ratio)
+- GET /api/admin/payload-cache: Entradas y contadores de la caché de payloads
+- DELETE /api/admin/payload-cache: Purga la caché de payloads (?endpoint= opcional)
 """
-from flask import Blueprint, jsonify
-from services.supabase_client import supabase_client
-from services.risk_calculator import risk_calculator
+from flask import Blueprint, jsonify, request
+from config import get_config
+from services.model_scorer import get_model_scorer
+from services.operating_points import AlertThreshold
+from services.model_report import get_model_report_registry
+from services.payload_cache import get_payload_cache
+from services.roster_snapshot import get_roster_snapshot
+from services.roster_aggregates import get_roster_aggregates, model_barriers, EDUCATION_LEVEL_LABELS
+from services.distribution_sketch import HistogramSketch
+from services.bootstrap import get_roster_intervals
+from services.correlations import METHODS, SUBJECT_PREFIX, get_correlation_frame
+from services.barrier_index import HAS_PROMEDIO, get_barrier_index
+from services.roster_frame import RISK_LEVELS, get_roster_frame, group_mean, group_values
+from utils.validators import validate_probability, validate_positive_number
 import logging
 import numpy as np
-import json
-import os
 
 logger = logging.getLogger(__name__)
 
 institutional_bp = Blueprint("institutional", __name__)
 
-# Path to model outputs
-MODEL_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                                'analysis', 'comprehensive_model_output')
-
-# Subject name normalization mapping
-SUBJECT_NAME_MAP = {
-    "Animación lectura": "Lengua y Literatura",
-    "Animación Lectura": "Lengua y Literatura",
-    "ANIMACIÓN LECTURA": "Lengua y Literatura",
-    "animación lectura": "Lengua y Literatura",
-    # Normalize Math variations
-    "Matemática": "Matemáticas",
-    "matemática": "Matemáticas",
-    "MATEMÁTICA": "Matemáticas",
-    "MATEMÁTICAS": "Matemáticas",
-    # Normalize other subjects
-    "Ciencias Naturales": "Ciencias Naturales",
-    "ciencias naturales": "Ciencias Naturales",
-    "Estudios sociales": "Estudios Sociales",
-    "estudios sociales": "Estudios Sociales",
+# Umbral de alerta vigente, resuelto sobre la tabla de puntos de operación
+_config = get_config()
+_alert_threshold = AlertThreshold(_config.OPERATING_POINTS_PATH, _config.ALERT_THRESHOLD)
+
+# Reporte del modelo y payloads precalculados (se recargan si cambia el archivo)
+_model_reports = get_model_report_registry()
+
+# Payloads de gráficos del padrón (stale-while-revalidate por versión de datos)
+_payload_cache = get_payload_cache()
+
+# Materias del gráfico de apoyo familiar (nombre normalizado -> etiqueta)
+FAMILY_SUPPORT_SUBJECTS = {
+    "Matemáticas": "Matemáticas",
+    "Lengua y Literatura": "Lengua y Literatura",
+    "Biología": "Biología",
+    "Física": "Física",
+    "Estudios Sociales": "E. Sociales",
 }
 
-# Non-academic subjects to filter out (these are support classes, not core academics)
-NON_ACADEMIC_SUBJECTS = {
-    "Acompañamiento", "PPE", "acompañamiento", "ppe",
-    "Animación lectura", "Animación Lectura"  # Already mapped to Lengua
+# Etiquetas cortas del nivel de instrucción del representante
+PARENT_EDUCATION_LABELS = {
+    "Educación superior": "Ed. Superior",
+    "Secundaria completa": "Sec. Completa",
+    "Primaria completa": "Primaria",
+    "Secundaria incompleta": "Sec. Incompleta",
 }
 
-def normalize_subject_name(subject: str) -> str:
-    """Normalize subject names to consistent values"""
-    return SUBJECT_NAME_MAP.get(subject, subject)
+# Barreras del modelo Logistic Regression (diciembre 2025), usadas si no hay scorer exportado
+DEFAULT_MODEL_BARRIERS = {
+    "top": [
+        {"feature": "takes_lengua", "label": "Toma Lengua y Lit. (-)", "coefficient": -1.511},
+        {"feature": "nivel_educativo", "label": "Nivel Educativo (+)", "coefficient": 1.305},
+        {"feature": "escuela_procedencia", "label": "Escuela Procedencia (+)", "coefficient": 0.740},
+        {"feature": "compra_ropa_centros", "label": "Compra en Centros (-)", "coefficient": -0.682},
+        {"feature": "num_subjects", "label": "Núm. Materias (+)", "coefficient": 0.601},
+        {"feature": "takes_fisica", "label": "Toma Física (+)", "coefficient": 0.589},
+        {"feature": "takes_sociales", "label": "Toma Sociales (-)", "coefficient": -0.587},
+        {"feature": "takes_ciencias", "label": "Toma Ciencias (-)", "coefficient": -0.587},
+        {"feature": "tiene_seguro_privado", "label": "Seguro Privado (-)", "coefficient": -0.585},
+        {"feature": "tiene_telefono", "label": "Tiene Teléfono (-)", "coefficient": -0.517},
+    ],
+    "categories": {
+        "Salud": 12.20,
+        "Tecnología": 11.17,
+        "Educ. Familiar": 8.39,
+        "Cultural": 6.17,
+        "Socioeconómico": 10.63,
+    },
+}
 
 
 @institutional_bp.route("/model-comparison", methods=["GET"])
@@ -63,131 +96,12 @@ def get_model_comparison():
         JSON con comparación de modelos entrenados
     """
     try:
-        # Load model comparison results
-        report_path = os.path.join(MODEL_OUTPUT_DIR, 'comprehensive_model_report.json')
+        # Payload precalculado; el reporte solo se vuelve a leer si cambia en disco
+        response = _model_reports.model_comparison()
         
-        if not os.path.exists(report_path):
+        if response is None:
             return jsonify({"error": "Model report not found"}), 404
         
-        with open(report_path, 'r') as f:
-            report = json.load(f)
-        
-        models = report.get('all_models', [])
-        
-        # Prepare Chart.js data for model comparison
-        model_names = [m['model'] for m in models]
-        
-        response = {
-            # ROC-AUC comparison (bar chart)
-            "rocAucComparison": {
-                "labels": model_names,
-                "datasets": [{
-                    "label": "ROC-AUC",
-                    "data": [round(m['roc_auc'], 3) for m in models],
-                    "backgroundColor": [
-                        "rgba(75, 192, 192, 0.6)" if m['model'] == report['best_model']['name'] 
-                        else "rgba(54, 162, 235, 0.6)" 
-                        for m in models
-                    ],
-                    "borderColor": [
-                        "rgba(75, 192, 192, 1)" if m['model'] == report['best_model']['name'] 
-                        else "rgba(54, 162, 235, 1)" 
-                        for m in models
-                    ],
-                    "borderWidth": 1
-                }]
-            },
-            
-            # CV Score comparison (bar chart with error bars)
-            "cvScoreComparison": {
-                "labels": model_names,
-                "datasets": [{
-                    "label": "CV Score (Mean)",
-                    "data": [round(m['cv_mean'], 3) for m in models],
-                    "error": [round(m['cv_std'], 3) for m in models],
-                    "backgroundColor": "rgba(153, 102, 255, 0.6)",
-                    "borderColor": "rgba(153, 102, 255, 1)",
-                    "borderWidth": 1
-                }]
-            },
-            
-            # Recall vs Precision (scatter plot)
-            "recallVsPrecision": {
-                "datasets": [{
-                    "label": "Models",
-                    "data": [
-                        {"x": round(m['recall'] * 100, 1), "y": round(m['precision'] * 100, 1), "label": m['model']}
-                        for m in models
-                    ],
-                    "backgroundColor": [
-                        "rgba(255, 99, 132, 0.8)" if m['model'] == report['best_model']['name'] 
-                        else "rgba(54, 162, 235, 0.6)" 
-                        for m in models
-                    ],
-                    "pointRadius": 10
-                }]
-            },
-            
-            # Missed students comparison (bar chart - lower is better)
-            "missedStudentsComparison": {
-                "labels": model_names,
-                "datasets": [{
-                    "label": "Estudiantes En Riesgo No Detectados",
-                    "data": [m['missed_at_risk'] for m in models],
-                    "backgroundColor": "rgba(255, 99, 132, 0.6)",
-                    "borderColor": "rgba(255, 99, 132, 1)",
-                    "borderWidth": 1
-                }]
-            },
-            
-            # Best model summary
-            "bestModel": {
-                "name": report['best_model']['name'],
-                "metrics": {
-                    "rocAuc": round(report['best_model']['roc_auc'], 3),
-                    "recall": round(report['best_model']['recall'] * 100, 1),
-                    "precision": round(report['best_model']['precision'] * 100, 1),
-                    "cvMean": round(report['best_model']['cv_mean'], 3),
-                    "cvStd": round(report['best_model']['cv_std'], 3),
-                    "missedAtRisk": report['best_model']['missed_at_risk'],
-                    "falseAlarms": report['best_model']['false_alarms']
-                }
-            },
-            
-            # Threshold optimization data
-            "thresholdOptimization": {
-                "labels": [f"{t['threshold']:.2f}" for t in report.get('threshold_optimization', [])],
-                "datasets": [
-                    {
-                        "label": "Recall (%)",
-                        "data": [round(t['recall'] * 100, 1) for t in report.get('threshold_optimization', [])],
-                        "borderColor": "rgba(75, 192, 192, 1)",
-                        "backgroundColor": "rgba(75, 192, 192, 0.2)",
-                        "fill": False,
-                        "yAxisID": "y"
-                    },
-                    {
-                        "label": "Estudiantes Perdidos",
-                        "data": [t['missed'] for t in report.get('threshold_optimization', [])],
-                        "borderColor": "rgba(255, 99, 132, 1)",
-                        "backgroundColor": "rgba(255, 99, 132, 0.2)",
-                        "fill": False,
-                        "yAxisID": "y1"
-                    }
-                ]
-            },
-            
-            # Dataset info
-            "datasetInfo": {
-                "totalStudents": report['dataset']['total_students'],
-                "atRiskCount": report['dataset']['at_risk_count'],
-                "atRiskPercentage": round(report['dataset']['at_risk_percentage'], 1),
-                "totalFeatures": report['features']['total'],
-                "categoricalFeatures": report['features']['categorical'],
-                "numericFeatures": report['features']['numeric']
-            }
-        }
-        
         logger.info("Model comparison data retrieved successfully")
         return jsonify(response), 200
         
@@ -205,91 +119,13 @@ def get_feature_importance():
         JSON con coeficientes y ranking de características
     """
     try:
-        import joblib
+        # Coefficients from the exported NumPy scorer (no sklearn needed),
+        # otherwise from best_model.joblib + the training report
+        response = _model_reports.feature_importance(get_model_scorer())
         
-        # Load model
-        model_path = os.path.join(MODEL_OUTPUT_DIR, 'best_model.joblib')
-        report_path = os.path.join(MODEL_OUTPUT_DIR, 'comprehensive_model_report.json')
-        
-        if not os.path.exists(model_path) or not os.path.exists(report_path):
+        if response is None:
             return jsonify({"error": "Model files not found"}), 404
         
-        model = joblib.load(model_path)
-        with open(report_path, 'r') as f:
-            report = json.load(f)
-        
-        features = report['features']['all_features']
-        coefficients = model.coef_[0]
-        
-        # Sort by absolute importance
-        feature_data = sorted(
-            zip(features, coefficients),
-            key=lambda x: abs(x[1]),
-            reverse=True
-        )
-        
-        # Top 20 features for chart
-        top_20 = feature_data[:20]
-        
-        response = {
-            # Bar chart of top 20 features
-            "topFeatures": {
-                "labels": [f[0] for f in top_20],
-                "datasets": [{
-                    "label": "Coeficiente (+ aumenta riesgo, - reduce riesgo)",
-                    "data": [round(f[1], 3) for f in top_20],
-                    "backgroundColor": [
-                        "rgba(255, 99, 132, 0.6)" if f[1] > 0 else "rgba(75, 192, 192, 0.6)"
-                        for f in top_20
-                    ],
-                    "borderColor": [
-                        "rgba(255, 99, 132, 1)" if f[1] > 0 else "rgba(75, 192, 192, 1)"
-                        for f in top_20
-                    ],
-                    "borderWidth": 1
-                }]
-            },
-            
-            # All features with details
-            "allFeatures": [
-                {
-                    "rank": i + 1,
-                    "feature": f[0],
-                    "coefficient": round(f[1], 4),
-                    "impact": "Aumenta riesgo" if f[1] > 0 else "Reduce riesgo",
-                    "absImportance": round(abs(f[1]), 4)
-                }
-                for i, f in enumerate(feature_data)
-            ],
-            
-            # Feature categories
-            "featuresByCategory": {
-                "education": {
-                    "features": ["nivel_educativo", "age_grade_status"],
-                    "avgImportance": round(np.mean([abs(c) for f, c in feature_data if f in ["nivel_educativo", "age_grade_status"]]), 3)
-                },
-                "technology": {
-                    "features": ["tiene_laptop", "tiene_computadora", "tiene_internet", "tech_score"],
-                    "avgImportance": round(np.mean([abs(c) for f, c in feature_data if "laptop" in f or "comput" in f or "internet" in f or "tech" in f]), 3)
-                },
-                "family": {
-                    "features": ["relacion", "estado_civil", "edad_representante", "nivel_instruccion_num"],
-                    "avgImportance": round(np.mean([abs(c) for f, c in feature_data if f in ["relacion", "estado_civil", "edad_representante", "nivel_instruccion_num"]]), 3)
-                },
-                "economic": {
-                    "features": ["quintil", "asset_score", "num_vehiculos"],
-                    "avgImportance": round(np.mean([abs(c) for f, c in feature_data if f in ["quintil", "asset_score", "num_vehiculos"]]), 3)
-                }
-            },
-            
-            # Laptop specific analysis
-            "laptopAnalysis": {
-                "coefficient": round(dict(feature_data).get("tiene_laptop", 0), 4),
-                "rank": next((i+1 for i, f in enumerate(feature_data) if f[0] == "tiene_laptop"), None),
-                "interpretation": "Coeficiente positivo indica que tener laptop se asocia con MAYOR riesgo académico. Esto es probablemente porque estudiantes en niveles educativos superiores (que tienen curricula más difícil) tienden a tener más laptops."
-            }
-        }
-        
         logger.info("Feature importance retrieved successfully")
         return jsonify(response), 200
         
@@ -298,6 +134,115 @@ def get_feature_importance():
         return jsonify({"error": f"Error al obtener importancia de características: {str(e)}"}), 500
 
 
+@institutional_bp.route("/operating-points", methods=["GET"])
+def get_operating_points():
+    """
+    Obtiene la tabla densa de puntos de operación del modelo
+    
+    Query params (opcional, exactamente uno para previsualizar una política):
+        threshold, min_recall, min_precision, cost_ratio
+    
+    Returns:
+        JSON con la tabla (formato columnar) y, si se pidió, el punto seleccionado
+    """
+    try:
+        table = _alert_threshold.table()
+        if table is None:
+            return jsonify({"error": "Tabla de puntos de operación no disponible"}), 404
+
+        response = table.to_dict()
+
+        policy, error = _parse_threshold_policy(request.args)
+        if error:
+            return jsonify({"error": error}), 400
+        if policy:
+            response["selected"] = table.select(**policy)
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_operating_points: {str(e)}")
+        return jsonify({"error": "Error al obtener puntos de operación"}), 500
+
+
+@institutional_bp.route("/alert-threshold", methods=["GET"])
+def get_alert_threshold():
+    """
+    Obtiene el umbral de alerta vigente y su punto de operación
+
+    El umbral solo afecta al tablero institucional (matriz de confusión y
+    métricas esperadas); no se aplica en /predict, /batch-predict ni en el
+    pipeline de scoring.
+    
+    Returns:
+        JSON con threshold, política y métricas esperadas (recall, precision, FN, FP)
+    """
+    try:
+        return jsonify(_alert_threshold.current()), 200
+    except Exception as e:
+        logger.error(f"Error in get_alert_threshold: {str(e)}")
+        return jsonify({"error": "Error al obtener el umbral de alerta"}), 500
+
+
+@institutional_bp.route("/alert-threshold", methods=["PUT"])
+def update_alert_threshold():
+    """
+    Cambia el umbral de alerta del tablero en tiempo de ejecución
+    (no cambia las predicciones)
+    
+    Body (JSON), exactamente uno de:
+        {"threshold": 0.3}
+        {"min_recall": 0.9}
+        {"min_precision": 0.5}
+        {"cost_ratio": 5}  (costo mínimo: un estudiante en riesgo no detectado = 5 falsas alarmas)
+    
+    Returns:
+        JSON con el nuevo umbral y su punto de operación
+    """
+    try:
+        policy, error = _parse_threshold_policy(request.get_json() or {})
+        if error:
+            return jsonify({"error": error}), 400
+        if not policy:
+            return jsonify({"error": "threshold, min_recall, min_precision o cost_ratio es requerido"}), 400
+
+        return jsonify(_alert_threshold.update(**policy)), 200
+
+    except LookupError:
+        return jsonify({"error": "Tabla de puntos de operación no disponible"}), 404
+    except ValueError:
+        return jsonify({"error": "Ningún umbral cumple la política solicitada"}), 422
+    except Exception as e:
+        logger.error(f"Error in update_alert_threshold: {str(e)}")
+        return jsonify({"error": "Error al actualizar el umbral de alerta"}), 500
+
+
+def _parse_threshold_policy(params):
+    """
+    Extrae una política de umbral (threshold, min_recall, min_precision o cost_ratio)
+    
+    Returns:
+        tuple: (dict con la política o {}, mensaje de error o None)
+    """
+    policy = {
+        key: params.get(key)
+        for key in ("threshold", "min_recall", "min_precision", "cost_ratio")
+        if params.get(key) is not None
+    }
+    if len(policy) > 1:
+        return None, "Especifique solo uno de threshold, min_recall, min_precision o cost_ratio"
+
+    for key, value in policy.items():
+        if key == "cost_ratio":
+            if not validate_positive_number(value):
+                return None, "cost_ratio debe ser un número positivo"
+        elif not validate_probability(value):
+            return None, f"{key} debe estar entre 0 y 1"
+        policy[key] = float(value)
+
+    return policy, None
+
+
 @institutional_bp.route("/education-level-analysis", methods=["GET"])
 def get_education_level_analysis():
     """
@@ -307,106 +252,144 @@ def get_education_level_analysis():
         JSON con análisis de riesgo por nivel educativo
     """
     try:
-        # Data from comprehensive model training
-        # Based on: Basica_Elemental: 8.2%, Basica_Media: 35.6%, Basica_Superior: 45.1%, Bachillerato: 42.4%
+        response = _payload_cache.get("education-level-analysis", {}, _education_level_payload)
+        
+        logger.info("Education level analysis retrieved successfully")
+        return jsonify(response), 200
         
-        education_levels = {
-            "Basica_Elemental": {"students": 98, "at_risk": 8, "grades": "1-4", "avg_age": "6-9"},
-            "Basica_Media": {"students": 149, "at_risk": 53, "grades": "5-7", "avg_age": "10-12"},
-            "Basica_Superior": {"students": 235, "at_risk": 106, "grades": "8-10", "avg_age": "13-15"},
-            "Bachillerato": {"students": 205, "at_risk": 87, "grades": "11-12", "avg_age": "16-18"}
+    except LookupError:
+        return jsonify({"error": "No se pudieron obtener estadísticas"}), 500
+    except Exception as e:
+        logger.error(f"Error in get_education_level_analysis: {str(e)}")
+        return jsonify({"error": f"Error al obtener análisis por nivel educativo: {str(e)}"}), 500
+
+
+def _education_level_payload():
+    """Payload de /education-level-analysis y versión de los datos"""
+    snapshot = get_roster_snapshot()
+    if snapshot is None or not len(snapshot):
+        raise LookupError("Roster snapshot not available")
+
+    # En riesgo = alguna nota <= 7.5 (objetivo del modelo comprehensivo)
+    aggregates = get_roster_aggregates(snapshot)
+    education_levels = {
+        level: {
+            **data,
+            "grades": EDUCATION_LEVEL_LABELS[level],
+            "avg_age": f"{data['age_range'][0]}-{data['age_range'][1]}" if data["age_range"] else None,
+            "rate": round(data["at_risk"] / data["students"] * 100, 1) if data["students"] else 0.0,
         }
+        for level, data in aggregates["education_levels"].items()
+    }
+    
+    response = {
+        # Risk rate by education level (bar chart)
+        "riskByLevel": {
+            "labels": list(education_levels.keys()),
+            "datasets": [{
+                "label": "% Estudiantes en Riesgo",
+                "data": [ed["rate"] for ed in education_levels.values()],
+                "backgroundColor": [
+                    "rgba(75, 192, 192, 0.6)",   # Low risk - green
+                    "rgba(255, 205, 86, 0.6)",  # Medium - yellow
+                    "rgba(255, 99, 132, 0.6)",  # High - red
+                    "rgba(255, 99, 132, 0.6)",  # High - red
+                ],
+                "borderColor": [
+                    "rgba(75, 192, 192, 1)",
+                    "rgba(255, 205, 86, 1)",
+                    "rgba(255, 99, 132, 1)",
+                    "rgba(255, 99, 132, 1)",
+                ],
+                "borderWidth": 1
+            }]
+        },
         
-        response = {
-            # Risk rate by education level (bar chart)
-            "riskByLevel": {
-                "labels": list(education_levels.keys()),
-                "datasets": [{
-                    "label": "% Estudiantes en Riesgo",
-                    "data": [
-                        round(ed["at_risk"] / ed["students"] * 100, 1)
-                        for ed in education_levels.values()
-                    ],
-                    "backgroundColor": [
-                        "rgba(75, 192, 192, 0.6)",   # Low risk - green
-                        "rgba(255, 205, 86, 0.6)",  # Medium - yellow
-                        "rgba(255, 99, 132, 0.6)",  # High - red
-                        "rgba(255, 99, 132, 0.6)",  # High - red
-                    ],
-                    "borderColor": [
-                        "rgba(75, 192, 192, 1)",
-                        "rgba(255, 205, 86, 1)",
-                        "rgba(255, 99, 132, 1)",
-                        "rgba(255, 99, 132, 1)",
-                    ],
-                    "borderWidth": 1
-                }]
-            },
-            
-            # Student distribution (pie chart)
-            "studentDistribution": {
-                "labels": list(education_levels.keys()),
-                "datasets": [{
-                    "label": "Estudiantes",
-                    "data": [ed["students"] for ed in education_levels.values()],
-                    "backgroundColor": [
-                        "rgba(54, 162, 235, 0.6)",
-                        "rgba(255, 205, 86, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                        "rgba(153, 102, 255, 0.6)",
-                    ],
+        # Student distribution (pie chart)
+        "studentDistribution": {
+            "labels": list(education_levels.keys()),
+            "datasets": [{
+                "label": "Estudiantes",
+                "data": [ed["students"] for ed in education_levels.values()],
+                "backgroundColor": [
+                    "rgba(54, 162, 235, 0.6)",
+                    "rgba(255, 205, 86, 0.6)",
+                    "rgba(75, 192, 192, 0.6)",
+                    "rgba(153, 102, 255, 0.6)",
+                ],
+                "borderWidth": 1
+            }]
+        },
+        
+        # At-risk vs Not at-risk by level (stacked bar)
+        "riskComposition": {
+            "labels": list(education_levels.keys()),
+            "datasets": [
+                {
+                    "label": "En Riesgo",
+                    "data": [ed["at_risk"] for ed in education_levels.values()],
+                    "backgroundColor": "rgba(255, 99, 132, 0.6)",
+                    "borderColor": "rgba(255, 99, 132, 1)",
                     "borderWidth": 1
-                }]
-            },
-            
-            # At-risk vs Not at-risk by level (stacked bar)
-            "riskComposition": {
-                "labels": list(education_levels.keys()),
-                "datasets": [
-                    {
-                        "label": "En Riesgo",
-                        "data": [ed["at_risk"] for ed in education_levels.values()],
-                        "backgroundColor": "rgba(255, 99, 132, 0.6)",
-                        "borderColor": "rgba(255, 99, 132, 1)",
-                        "borderWidth": 1
-                    },
-                    {
-                        "label": "Sin Riesgo",
-                        "data": [ed["students"] - ed["at_risk"] for ed in education_levels.values()],
-                        "backgroundColor": "rgba(75, 192, 192, 0.6)",
-                        "borderColor": "rgba(75, 192, 192, 1)",
-                        "borderWidth": 1
-                    }
-                ]
-            },
-            
-            # Detailed statistics
-            "details": [
+                },
                 {
-                    "level": level,
-                    "students": data["students"],
-                    "atRisk": data["at_risk"],
-                    "riskPercentage": round(data["at_risk"] / data["students"] * 100, 1),
-                    "grades": data["grades"],
-                    "avgAge": data["avg_age"]
+                    "label": "Sin Riesgo",
+                    "data": [ed["students"] - ed["at_risk"] for ed in education_levels.values()],
+                    "backgroundColor": "rgba(75, 192, 192, 0.6)",
+                    "borderColor": "rgba(75, 192, 192, 1)",
+                    "borderWidth": 1
                 }
-                for level, data in education_levels.items()
-            ],
-            
-            # Key insight
-            "insight": {
-                "title": "Nivel Educativo es el 2do predictor más importante",
-                "description": "El riesgo académico aumenta significativamente con el nivel educativo. Basica_Elemental tiene solo 8.2% en riesgo, mientras que Basica_Superior alcanza 45.1%. Esto refleja la dificultad creciente del currículo.",
-                "recommendation": "Enfocar intervenciones en estudiantes de Basica_Superior y Bachillerato, donde el riesgo es 5x mayor que en Basica_Elemental."
-            }
-        }
+            ]
+        },
         
-        logger.info("Education level analysis retrieved successfully")
-        return jsonify(response), 200
+        # Detailed statistics
+        "details": [
+            {
+                "level": level,
+                "students": data["students"],
+                "atRisk": data["at_risk"],
+                "riskPercentage": data["rate"],
+                "grades": data["grades"],
+                "avgAge": data["avg_age"]
+            }
+            for level, data in education_levels.items()
+        ],
         
-    except Exception as e:
-        logger.error(f"Error in get_education_level_analysis: {str(e)}")
-        return jsonify({"error": f"Error al obtener análisis por nivel educativo: {str(e)}"}), 500
+        # Key insight
+        "insight": _education_level_insight(education_levels),
+        "dataVersion": snapshot.version,
+    }
+
+    return response, snapshot.version
+
+
+def _education_level_insight(education_levels):
+    """Texto del insight a partir de las tasas de riesgo por nivel"""
+    levels = {level: data for level, data in education_levels.items() if data["students"]}
+    if not levels:
+        return {
+            "title": "Nivel Educativo es el 2do predictor más importante",
+            "description": "No hay datos académicos suficientes para calcular el riesgo por nivel educativo.",
+            "recommendation": None,
+        }
+
+    lowest = min(levels, key=lambda level: levels[level]["rate"])
+    highest = max(levels, key=lambda level: levels[level]["rate"])
+    low_rate = levels[lowest]["rate"]
+    high_rate = levels[highest]["rate"]
+    ratio = f"{high_rate / low_rate:.1f}x" if low_rate else "muy"
+
+    return {
+        "title": "Nivel Educativo es el 2do predictor más importante",
+        "description": (
+            f"El riesgo académico varía significativamente con el nivel educativo. {lowest} tiene "
+            f"{low_rate}% en riesgo, mientras que {highest} alcanza {high_rate}%."
+        ),
+        "recommendation": (
+            f"Enfocar intervenciones en estudiantes de {highest}, donde el riesgo es {ratio} "
+            f"mayor que en {lowest}."
+        ),
+    }
 
 
 @institutional_bp.route("/institutional-stats", methods=["GET"])
@@ -414,212 +397,254 @@ def get_institutional_stats():
     """
     Obtiene estadísticas institucionales para el dashboard
     
+    Query params:
+        ci: "true" agrega intervalos de confianza bootstrap a las comparaciones
+    
     Returns:
         JSON con gráficos y estadísticas agregadas
     """
     try:
-        # Obtener datos base de Supabase
-        base_stats = supabase_client.get_institutional_stats()
-
-        if not base_stats:
-            return jsonify({"error": "No se pudieron obtener estadísticas"}), 500
-
-        # Preparar datos en formato Chart.js para el frontend
-
-        # 1. Top 10 Barreras Predictivas (Importancia del Modelo %)
-        # Based on Comprehensive Model (Logistic Regression) - December 2025
-        # ACTUAL coefficients from trained model (verified from best_model.joblib)
-        # Positive coefficients = increases risk, Negative = decreases risk
-        top_barriers = {
-            "labels": [
-                "Toma Lengua y Lit. (-)",    # -1.511 (protective - strongest)
-                "Nivel Educativo (+)",        # +1.305 (higher grades = harder curriculum)
-                "Escuela Procedencia (+)",    # +0.740 (from other school = risk)
-                "Compra en Centros (-)",      # -0.682 (economic indicator - protective)
-                "Núm. Materias (+)",          # +0.601 (more subjects = more risk)
-                "Toma Física (+)",            # +0.589 (advanced physics = harder)
-                "Toma Sociales (-)",          # -0.587 (protective)
-                "Toma Ciencias (-)",          # -0.587 (protective)
-                "Seguro Privado (-)",         # -0.585 (has resources - protective)
-                "Tiene Teléfono (-)",         # -0.517 (has resources - protective)
-            ],
-            "datasets": [
-                {
-                    "label": "Coeficiente (Impacto en Riesgo)",
-                    "data": [-1.511, 1.305, 0.740, -0.682, 0.601, 0.589, -0.587, -0.587, -0.585, -0.517],
-                    "backgroundColor": [
-                        "rgba(75, 192, 192, 0.6)",   # Negative = protective (green)
-                        "rgba(255, 99, 132, 0.6)",  # Positive = risk (red)
-                        "rgba(255, 99, 132, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                        "rgba(255, 99, 132, 0.6)",
-                        "rgba(255, 99, 132, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                    ],
-                    "borderColor": "rgba(0, 0, 0, 0.8)",
-                    "borderWidth": 1,
-                }
-            ],
-        }
+        ci = _parse_ci(request.args)
+        # Payload en caché por versión de datos; la matriz de confusión depende del umbral vigente
+        response = _payload_cache.get(
+            "institutional-stats",
+            {"threshold": _alert_threshold.threshold, "ci": ci},
+            lambda: _institutional_stats_payload(ci),
+        )
+        
+        logger.info("Institutional stats retrieved successfully")
+        return jsonify(response), 200
+        
+    except LookupError:
+        return jsonify({"error": "No se pudieron obtener estadísticas"}), 500
+    except Exception as e:
+        logger.error(f"Error in get_institutional_stats: {str(e)}")
+        return jsonify({"error": "Error al obtener estadísticas institucionales"}), 500
 
-        # 2. Impacto de Laptop - ACTUALIZADO con datos reales
-        # DATOS REALES DE LA BASE DE DATOS (verificados):
-        # - Con laptop: 521 estudiantes, GPA promedio = 8.97
-        # - Sin laptop: 166 estudiantes, GPA promedio = 8.85
-        # - Diferencia: +0.12 puntos (con laptop tienen GPA ligeramente mayor)
-        # NOTA: El coeficiente del modelo es +0.124 (aumenta riesgo) debido a confounding
-        # con nivel educativo (estudiantes de grados superiores tienen más laptops Y más riesgo)
-        laptop_impact = {
-            "labels": ["Con Laptop", "Sin Laptop"],
-            "datasets": [
-                {
-                    "label": "GPA Promedio",
-                    "data": [8.97, 8.85],  # Datos reales de la base de datos
-                    "backgroundColor": [
-                        "rgba(54, 162, 235, 0.6)",  # Blue
-                        "rgba(255, 159, 64, 0.6)",  # Orange
-                    ],
-                    "borderColor": [
-                        "rgba(54, 162, 235, 1)",
-                        "rgba(255, 159, 64, 1)",
-                    ],
-                    "borderWidth": 1,
-                }
-            ],
-            "statistics": {
-                "withLaptop": {"count": 521, "mean": 8.97, "median": 9.07},
-                "withoutLaptop": {"count": 166, "mean": 8.85, "median": 8.94},
-                "difference": 0.12
-            },
-            "note": "Diferencia de +0.12 puntos a favor de estudiantes con laptop. Sin embargo, el modelo muestra coef. +0.124 (riesgo) debido a que estudiantes de niveles superiores (curricula más difícil) tienen más laptops."
-        }
 
-        # 3. Impacto de Nivel Educativo del Representante
-        # DATOS REALES DE LA BASE DE DATOS (verificados):
-        # - Postgrado: 78 estudiantes, GPA = 9.07
-        # - Educación superior: 339 estudiantes, GPA = 9.00
-        # - Secundaria completa: 217 estudiantes, GPA = 8.83
-        # - Primaria completa: 9 estudiantes, GPA = 8.76
-        # - Secundaria incompleta: 6 estudiantes, GPA = 8.72
-        parent_education_impact = {
-            "labels": ["Postgrado", "Ed. Superior", "Sec. Completa", "Primaria", "Sec. Incompleta"],
-            "datasets": [
-                {
-                    "label": "GPA Promedio",
-                    "data": [9.07, 9.00, 8.83, 8.76, 8.72],
-                    "backgroundColor": "rgba(153, 102, 255, 0.6)",
-                    "borderColor": "rgba(153, 102, 255, 1)",
-                    "borderWidth": 1,
-                }
-            ],
-            "statistics": {
-                "Postgrado": {"count": 78, "mean": 9.07},
-                "Educación superior": {"count": 339, "mean": 9.00},
-                "Secundaria completa": {"count": 217, "mean": 8.83},
-                "Primaria completa": {"count": 9, "mean": 8.76},
-                "Secundaria incompleta": {"count": 6, "mean": 8.72}
-            },
-            "insight": "Existe una correlación positiva entre el nivel educativo del representante y el GPA del estudiante. Estudiantes con padres con postgrado tienen +0.35 puntos más que aquellos con padres con secundaria incompleta."
-        }
+def _institutional_stats_payload(ci=False):
+    """Payload de /institutional-stats (con intervalos si ci) y versión de los datos"""
+    snapshot = get_roster_snapshot()
+    if snapshot is None or not len(snapshot):
+        raise LookupError("Roster snapshot not available")
 
-        # 4. Distribución por Quintil (de base_stats)
-        quintil_distribution = {
-            "labels": ["Q1-Q2 (Vulnerables)", "Q3 (Medio)", "Q4-Q5 (Alto)"],
-            "datasets": [
-                {
-                    "label": "Número de Estudiantes",
-                    "data": [
-                        base_stats["quintil_distribution"].get("Q1-Q2", 0),
-                        base_stats["quintil_distribution"].get("Q3", 0),
-                        base_stats["quintil_distribution"].get("Q4-Q5", 0),
-                    ],
-                    "backgroundColor": [
-                        "rgba(255, 99, 132, 0.6)",
-                        "rgba(255, 205, 86, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                    ],
-                    "borderColor": [
-                        "rgba(255, 99, 132, 1)",
-                        "rgba(255, 205, 86, 1)",
-                        "rgba(75, 192, 192, 1)",
-                    ],
-                    "borderWidth": 1,
-                }
-            ],
-        }
+    # Padrón vigente: las agregaciones se calculan una vez por versión de los datos
+    base_stats = get_roster_aggregates(snapshot)
+    barriers = _model_barriers()
 
-        # 5. Distribución por Nivel de Riesgo (de base_stats)
-        risk_distribution = {
-            "labels": ["Riesgo Alto", "Riesgo Medio", "Riesgo Bajo"],
-            "datasets": [
-                {
-                    "label": "Número de Estudiantes",
-                    "data": [
-                        base_stats["risk_distribution"].get("Alto", 0),
-                        base_stats["risk_distribution"].get("Medio", 0),
-                        base_stats["risk_distribution"].get("Bajo", 0),
-                    ],
-                    "backgroundColor": [
-                        "rgba(255, 99, 132, 0.6)",
-                        "rgba(255, 205, 86, 0.6)",
-                        "rgba(75, 192, 192, 0.6)",
-                    ],
-                    "borderColor": [
-                        "rgba(255, 99, 132, 1)",
-                        "rgba(255, 205, 86, 1)",
-                        "rgba(75, 192, 192, 1)",
-                    ],
-                    "borderWidth": 1,
-                }
-            ],
-        }
+    # Preparar datos en formato Chart.js para el frontend
 
-        # 6. Impacto de Apoyo Familiar en Materias Clave (Fase 2)
-        # Matemáticas (ρ=+0.18), Lengua y Literatura (ρ=+0.18), Biología (ρ=+0.15), Física (ρ=+0.14)
-        family_support_impact = {
-            "labels": ["Matemáticas", "Lengua y Literatura", "Biología", "Física", "E. Sociales"],
-            "datasets": [
-                {
-                    "label": "Correlación con Apoyo Familiar",
-                    "data": [0.18, 0.18, 0.15, 0.14, 0.14],
-                    "backgroundColor": "rgba(54, 162, 235, 0.6)",
-                    "borderColor": "rgba(54, 162, 235, 1)",
-                    "borderWidth": 1,
-                }
-            ],
-        }
+    # 1. Top 10 Barreras Predictivas (coeficientes del modelo)
+    # Positive coefficients = increases risk, Negative = decreases risk
+    top_barriers = {
+        "labels": [b["label"] for b in barriers["top"]],
+        "datasets": [
+            {
+                "label": "Coeficiente (Impacto en Riesgo)",
+                "data": [b["coefficient"] for b in barriers["top"]],
+                "backgroundColor": [
+                    "rgba(255, 99, 132, 0.6)" if b["coefficient"] > 0 else "rgba(75, 192, 192, 0.6)"
+                    for b in barriers["top"]
+                ],
+                "borderColor": "rgba(0, 0, 0, 0.8)",
+                "borderWidth": 1,
+            }
+        ],
+    }
 
-        # 7. Rendimiento Académico por Quintil (Datos REALES de la base de datos)
-        # VERIFICADO: Datos extraídos directamente de Supabase
-        # Q1: 1 estudiante (muestra muy pequeña)
-        # Q2: 52 estudiantes
-        # Q3: 281 estudiantes  
-        # Q4: 296 estudiantes
-        # Q5: 44 estudiantes
-        performance_by_quintile = {
-            "labels": ["Q1 (Vulnerable)", "Q2", "Q3 (Medio)", "Q4", "Q5 (Alto)"],
-            "datasets": [
-                {
-                    "label": "Distribución de Notas",
-                    "data": [
-                        {"min": 9.02, "q1": 9.02, "median": 9.02, "q3": 9.02, "max": 9.02, "count": 1},  # Q1 - solo 1 estudiante
-                        {"min": 7.27, "q1": 8.41, "median": 8.90, "q3": 9.43, "max": 9.91, "count": 52},  # Q2
-                        {"min": 5.32, "q1": 8.48, "median": 8.99, "q3": 9.40, "max": 9.96, "count": 281},  # Q3
-                        {"min": 6.85, "q1": 8.66, "median": 9.11, "q3": 9.43, "max": 9.98, "count": 296},  # Q4
-                        {"min": 7.69, "q1": 8.72, "median": 9.12, "q3": 9.55, "max": 9.95, "count": 44},   # Q5
-                    ],
-                }
+    # 2. Impacto de Laptop (GPA con y sin laptop)
+    with_laptop = base_stats["laptop"]["withLaptop"]
+    without_laptop = base_stats["laptop"]["withoutLaptop"]
+    laptop_difference = (
+        round(with_laptop["mean"] - without_laptop["mean"], 2)
+        if with_laptop and without_laptop else None
+    )
+    laptop_impact = {
+        "labels": ["Con Laptop", "Sin Laptop"],
+        "datasets": [
+            {
+                "label": "GPA Promedio",
+                "data": [
+                    with_laptop["mean"] if with_laptop else None,
+                    without_laptop["mean"] if without_laptop else None,
+                ],
+                "backgroundColor": [
+                    "rgba(54, 162, 235, 0.6)",  # Blue
+                    "rgba(255, 159, 64, 0.6)",  # Orange
+                ],
+                "borderColor": [
+                    "rgba(54, 162, 235, 1)",
+                    "rgba(255, 159, 64, 1)",
+                ],
+                "borderWidth": 1,
+            }
+        ],
+        "statistics": {
+            "withLaptop": _mean_summary(with_laptop, median=True),
+            "withoutLaptop": _mean_summary(without_laptop, median=True),
+            "difference": laptop_difference
+        },
+        "note": (
+            f"Diferencia de {laptop_difference:+.2f} puntos entre estudiantes con y sin laptop. "
+            "El coeficiente del modelo puede tener otro signo porque los estudiantes de niveles "
+            "superiores (curricula más difícil) tienen más laptops."
+            if laptop_difference is not None else None
+        )
+    }
+
+    # 3. Impacto de Nivel Educativo del Representante (ordenado por GPA)
+    parent_education = sorted(
+        base_stats["parent_education"].items(), key=lambda item: item[1]["mean"], reverse=True
+    )
+    parent_education_impact = {
+        "labels": [PARENT_EDUCATION_LABELS.get(nivel, nivel) for nivel, _ in parent_education],
+        "datasets": [
+            {
+                "label": "GPA Promedio",
+                "data": [stats["mean"] for _, stats in parent_education],
+                "backgroundColor": "rgba(153, 102, 255, 0.6)",
+                "borderColor": "rgba(153, 102, 255, 1)",
+                "borderWidth": 1,
+            }
+        ],
+        "statistics": {nivel: _mean_summary(stats) for nivel, stats in parent_education},
+        "insight": (
+            f"Estudiantes cuyo representante tiene {parent_education[0][0].lower()} promedian "
+            f"{parent_education[0][1]['mean']:.2f}, "
+            f"{parent_education[0][1]['mean'] - parent_education[-1][1]['mean']:+.2f} puntos frente a "
+            f"{parent_education[-1][0].lower()} ({parent_education[-1][1]['mean']:.2f})."
+            if len(parent_education) > 1 else None
+        )
+    }
+
+    # 4. Distribución por Quintil (de base_stats)
+    quintil_distribution = {
+        "labels": ["Q1-Q2 (Vulnerables)", "Q3 (Medio)", "Q4-Q5 (Alto)"],
+        "datasets": [
+            {
+                "label": "Número de Estudiantes",
+                "data": [
+                    base_stats["quintil_distribution"].get("Q1-Q2", 0),
+                    base_stats["quintil_distribution"].get("Q3", 0),
+                    base_stats["quintil_distribution"].get("Q4-Q5", 0),
+                ],
+                "backgroundColor": [
+                    "rgba(255, 99, 132, 0.6)",
+                    "rgba(255, 205, 86, 0.6)",
+                    "rgba(75, 192, 192, 0.6)",
+                ],
+                "borderColor": [
+                    "rgba(255, 99, 132, 1)",
+                    "rgba(255, 205, 86, 1)",
+                    "rgba(75, 192, 192, 1)",
+                ],
+                "borderWidth": 1,
+            }
+        ],
+    }
+
+    # 5. Distribución por Nivel de Riesgo (de base_stats)
+    risk_distribution = {
+        "labels": ["Riesgo Alto", "Riesgo Medio", "Riesgo Bajo"],
+        "datasets": [
+            {
+                "label": "Número de Estudiantes",
+                "data": [
+                    base_stats["risk_distribution"].get("Alto", 0),
+                    base_stats["risk_distribution"].get("Medio", 0),
+                    base_stats["risk_distribution"].get("Bajo", 0),
+                ],
+                "backgroundColor": [
+                    "rgba(255, 99, 132, 0.6)",
+                    "rgba(255, 205, 86, 0.6)",
+                    "rgba(75, 192, 192, 0.6)",
+                ],
+                "borderColor": [
+                    "rgba(255, 99, 132, 1)",
+                    "rgba(255, 205, 86, 1)",
+                    "rgba(75, 192, 192, 1)",
+                ],
+                "borderWidth": 1,
+            }
+        ],
+    }
+
+    # 6. Impacto de Apoyo Familiar en Materias Clave (Spearman sobre el padrón vigente)
+    # Sin ningún coeficiente calculable se usan los valores de la Fase 2 (source="fase2"):
+    # Matemáticas (ρ=+0.18), Lengua y Literatura (ρ=+0.18), Biología (ρ=+0.15), Física (ρ=+0.14)
+    correlations = get_correlation_frame(snapshot)
+    family_support = {
+        label: correlations.coefficient("apoyo_familiar", SUBJECT_PREFIX + subject, "spearman")
+        for subject, label in FAMILY_SUPPORT_SUBJECTS.items()
+    }
+    family_support_source = "live"
+    if all(rho is None for rho in family_support.values()):
+        family_support = dict(zip(FAMILY_SUPPORT_SUBJECTS.values(), [0.18, 0.18, 0.15, 0.14, 0.14]))
+        family_support_source = "fase2"
+    # Materias sin coeficiente calculable quedan en null (no se omiten)
+    family_support = {label: round(rho, 2) if rho is not None else None for label, rho in family_support.items()}
+    family_support_impact = {
+        "source": family_support_source,
+        "labels": list(family_support),
+        "datasets": [
+            {
+                "label": "Correlación con Apoyo Familiar",
+                "data": list(family_support.values()),
+                "backgroundColor": "rgba(54, 162, 235, 0.6)",
+                "borderColor": "rgba(54, 162, 235, 1)",
+                "borderWidth": 1,
+            }
+        ],
+    }
+
+    # 7. Rendimiento Académico por Quintil (box plot de promedio_general)
+    quintil_grades = base_stats["quintil_grades"]
+    performance_by_quintile = {
+        "labels": ["Q1 (Vulnerable)", "Q2", "Q3 (Medio)", "Q4", "Q5 (Alto)"],
+        "datasets": [
+            {
+                "label": "Distribución de Notas",
+                "data": [
+                    {key: stats[key] for key in ("min", "q1", "median", "q3", "max", "count")}
+                    if stats else None
+                    for stats in (quintil_grades[q] for q in range(1, 6))
+                ],
+            }
+        ],
+        "insight": _quintile_insight(quintil_grades)
+    }
+
+    # 8. Matriz de Confusión del Modelo de Riesgo Binario
+    # Con la tabla de puntos de operación se usa el umbral de alerta vigente;
+    # si no existe, los valores del modelo Logistic Regression (threshold 0.5)
+    # sobre el test set de 138 estudiantes: TP=29, FP=37, FN=22, TN=50
+    alert = _alert_threshold.current()
+    point = alert["operatingPoint"]
+    if point is not None:
+        table = _alert_threshold.table()
+        high_recall = table.for_min_recall(0.9)
+        confusion_matrix = {
+            "labels": ["Predicho: En Riesgo", "Predicho: Sin Riesgo"],
+            "rows": ["Real: En Riesgo", "Real: Sin Riesgo"],
+            "data": [
+                [point["tp"], point["fn"]],
+                [point["fp"], point["tn"]],
             ],
-            "insight": "Los quintiles superiores muestran GPAs ligeramente más altos. Q5 (alto) tiene mediana de 9.12, mientras Q2 tiene 8.90. La diferencia es de ~0.22 puntos."
+            "metrics": {
+                "accuracy": point["accuracy"],
+                "precision": point["precision"],
+                "recall": point["recall"],
+                "f1": point["f1"],
+                "rocAuc": round(table.metadata["roc_auc"], 3) if table.metadata.get("roc_auc") else None
+            },
+            "threshold": alert["threshold"],
+            "thresholdNote": (
+                f"Con threshold={high_recall['threshold']:.2f}, recall sube a "
+                f"{high_recall['recall'] * 100:.1f}% (solo {high_recall['fn']} estudiantes en riesgo perdidos)"
+                if high_recall else None
+            )
         }
-
-        # 8. Matriz de Confusión del Modelo de Riesgo Binario
-        # DATOS REALES del modelo Logistic Regression (threshold 0.5)
-        # Basado en test set de 138 estudiantes
-        # TP=29, FP=37, FN=22, TN=50
+    else:
         confusion_matrix = {
             "labels": ["Predicho: En Riesgo", "Predicho: Sin Riesgo"],
             "rows": ["Real: En Riesgo", "Real: Sin Riesgo"],
@@ -634,59 +659,106 @@ def get_institutional_stats():
                 "f1": 0.496,
                 "rocAuc": 0.610
             },
+            "threshold": 0.5,
             "thresholdNote": "Con threshold=0.25, recall sube a 92.2% (solo 4 estudiantes en riesgo perdidos)"
         }
 
-        # 9. Análisis de Categorías de Barreras (Para Radar Chart)
-        barriers_categories = {
-            "labels": ["Salud", "Tecnología", "Educ. Familiar", "Cultural", "Socioeconómico"],
-            "datasets": [
-                {
-                    "label": "Importancia Total (%)",
-                    "data": [12.20, 11.17, 8.39, 6.17, 10.63],
-                    "backgroundColor": "rgba(54, 162, 235, 0.2)",
-                    "borderColor": "rgba(54, 162, 235, 1)",
-                    "pointBackgroundColor": "rgba(54, 162, 235, 1)",
-                }
-            ]
-        }
+    # 9. Análisis de Categorías de Barreras (Para Radar Chart)
+    barriers_categories = {
+        "labels": list(barriers["categories"].keys()),
+        "datasets": [
+            {
+                "label": "Importancia Total (%)",
+                "data": list(barriers["categories"].values()),
+                "backgroundColor": "rgba(54, 162, 235, 0.2)",
+                "borderColor": "rgba(54, 162, 235, 1)",
+                "pointBackgroundColor": "rgba(54, 162, 235, 1)",
+            }
+        ]
+    }
 
-        # 10. Estadísticas generales
-        summary_stats = {
-            "total_students": base_stats.get("total_students", 0),
-            "average_grade": base_stats.get("average_grade", 0.0),
-            "students_at_risk": base_stats["risk_distribution"].get("Alto", 0)
-            + base_stats["risk_distribution"].get("Medio", 0),
-            "percentage_vulnerable": round(
-                (
-                    base_stats["quintil_distribution"].get("Q1-Q2", 0)
-                    / base_stats.get("total_students", 1)
-                )
-                * 100,
-                1,
-            ),
-        }
+    # 10. Estadísticas generales
+    summary_stats = {
+        "total_students": base_stats.get("total_students", 0),
+        "average_grade": base_stats.get("average_grade", 0.0),
+        "students_at_risk": base_stats["risk_distribution"].get("Alto", 0)
+        + base_stats["risk_distribution"].get("Medio", 0),
+        "percentage_vulnerable": round(
+            (
+                base_stats["quintil_distribution"].get("Q1-Q2", 0)
+                / (base_stats.get("total_students") or 1)
+            )
+            * 100,
+            1,
+        ),
+    }
 
-        # Respuesta final
-        response = {
-            "topBarriers": top_barriers,
-            "laptopImpact": laptop_impact,
-            "parentEducationImpact": parent_education_impact,
-            "quintilDistribution": quintil_distribution,
-            "riskDistribution": risk_distribution,
-            "familySupportImpact": family_support_impact,
-            "performanceByQuintile": performance_by_quintile,
-            "confusionMatrix": confusion_matrix,
-            "barriersCategories": barriers_categories,
-            "summaryStats": summary_stats,
-        }
+    # Respuesta final
+    response = {
+        "topBarriers": top_barriers,
+        "laptopImpact": laptop_impact,
+        "parentEducationImpact": parent_education_impact,
+        "quintilDistribution": quintil_distribution,
+        "riskDistribution": risk_distribution,
+        "familySupportImpact": family_support_impact,
+        "performanceByQuintile": performance_by_quintile,
+        "confusionMatrix": confusion_matrix,
+        "barriersCategories": barriers_categories,
+        "summaryStats": summary_stats,
+        "dataVersion": snapshot.version,
+    }
 
-        logger.info("Institutional stats retrieved successfully")
-        return jsonify(response), 200
+    if ci:
+        intervals = get_roster_intervals(snapshot)
+        for key in ("withLaptop", "withoutLaptop"):
+            if laptop_impact["statistics"][key]:
+                laptop_impact["statistics"][key]["ci"] = intervals["laptop"][key]
+        laptop_impact["statistics"]["differenceCi"] = intervals["laptop"]["difference"]
+        for nivel, stats in parent_education_impact["statistics"].items():
+            if stats:
+                stats["ci"] = intervals["parent_education"].get(nivel)
+        performance_by_quintile["medianCi"] = [intervals["quintil_medians"][q] for q in range(1, 6)]
+        response["confidenceIntervals"] = intervals["metadata"]
+
+    return response, snapshot.version
 
-    except Exception as e:
-        logger.error(f"Error in get_institutional_stats: {str(e)}")
-        return jsonify({"error": "Error al obtener estadísticas institucionales"}), 500
+
+def _parse_ci(params):
+    """?ci=true|1 activa los intervalos de confianza"""
+    return params.get("ci", "false").lower() in ("true", "1")
+
+
+def _model_barriers():
+    """Barreras del modelo en producción (valores del reporte de diciembre 2025 si no hay scorer)"""
+    scorer = get_model_scorer()
+    if scorer is None:
+        return DEFAULT_MODEL_BARRIERS
+    return model_barriers(scorer.feature_order, scorer.coef)
+
+
+def _mean_summary(stats, median=False):
+    """count/mean (y mediana) de unas estadísticas de resumen"""
+    if not stats:
+        return None
+    summary = {"count": stats["count"], "mean": stats["mean"]}
+    if median:
+        summary["median"] = stats["median"]
+    return summary
+
+
+def _quintile_insight(quintil_grades):
+    """Texto comparando la mediana del quintil más alto y el más bajo con datos"""
+    available = [q for q in range(1, 6) if quintil_grades[q]]
+    if len(available) < 2:
+        return None
+
+    low, high = available[0], available[-1]
+    low_median = quintil_grades[low]["median"]
+    high_median = quintil_grades[high]["median"]
+    return (
+        f"Q{high} tiene mediana de {high_median:.2f}, mientras Q{low} tiene {low_median:.2f}. "
+        f"La diferencia es de {high_median - low_median:+.2f} puntos."
+    )
 
 
 @institutional_bp.route("/barriers-analysis", methods=["GET"])
@@ -817,176 +889,174 @@ def get_score_distributions():
     """
     Obtiene distribuciones detalladas de notas para gráficos avanzados (violin, histograma, etc.)
     
+    Query params:
+        summary: "values" (valores individuales, por defecto) o "histogram"
+                 (densidad de tamaño fijo y cuantiles desde un sketch)
+        bins: Resolución del histograma con summary=histogram (5-200, default 40)
+    
     Returns:
         JSON con distribuciones de notas por quintil, riesgo, etc.
     """
     try:
-        # Obtener todos los estudiantes
-        students = supabase_client.get_students(limit=1000)
+        summary_mode = request.args.get("summary", "values")
+        if summary_mode not in ("values", "histogram"):
+            return jsonify({"error": "summary debe ser 'values' o 'histogram'"}), 400
         
-        if not students:
-            return jsonify({"error": "No se encontraron estudiantes"}), 404
-        
-        # Calcular distribuciones de scores
-        
-        # 1. Distribución de promedios por quintil (para violin plot)
-        grades_by_quintile = {"Q1": [], "Q2": [], "Q3": [], "Q4": [], "Q5": []}
+        # bins solo aplica al histograma: con summary=values se ignora y no
+        # fragmenta la caché
+        params = {"summary": summary_mode}
+        bins = None
+        if summary_mode == "histogram":
+            bins = request.args.get("bins", "40")
+            try:
+                bins = int(bins)
+            except ValueError:
+                bins = None
+            if bins is None or not 5 <= bins <= 200:
+                return jsonify({"error": "bins debe ser un entero entre 5 y 200"}), 400
+            params["bins"] = bins
         
-        # 2. Distribución de promedios por nivel de riesgo
-        grades_by_risk = {"Alto": [], "Medio": [], "Bajo": []}
+        response = _payload_cache.get(
+            "score-distributions",
+            params,
+            lambda: _score_distributions_payload(summary_mode, bins),
+        )
         
-        # 3. Distribución de promedios por materia
-        grades_by_subject = {}
+        logger.info("Score distributions retrieved successfully")
+        return jsonify(response), 200
         
-        # 4. Distribución de scores de riesgo
-        risk_scores = []
+    except LookupError:
+        return jsonify({"error": "No se encontraron estudiantes"}), 404
+    except Exception as e:
+        logger.error(f"Error in get_score_distributions: {str(e)}", exc_info=True)
+        return jsonify({"error": f"Error al obtener distribuciones: {str(e)}"}), 500
+
+
+def _score_distributions_payload(summary_mode, bins):
+    """Payload de /score-distributions y versión de los datos"""
+    snapshot = get_roster_snapshot()
+    if snapshot is None or not len(snapshot):
+        raise LookupError("Roster snapshot not available")
+    
+    # Padrón columnar compartido con /academic-insights (una versión = un aplanado)
+    frame = get_roster_frame(snapshot)
+    has_promedio = frame.has_promedio
+    promedio = frame.promedio
+    
+    # 1. Distribución de promedios por quintil (para violin plot)
+    quintil_codes = np.where(has_promedio & (frame.quintil >= 1) & (frame.quintil <= 5), frame.quintil - 1, -1)
+    grades_by_quintile = dict(zip(
+        ["Q1", "Q2", "Q3", "Q4", "Q5"], group_values(quintil_codes, promedio, 5)
+    ))
+    
+    # 2. Distribución de promedios por nivel de riesgo
+    risk_codes = np.where(has_promedio, frame.risk_level, -1)
+    grades_by_risk = dict(zip(RISK_LEVELS, group_values(risk_codes, promedio, len(RISK_LEVELS))))
+    
+    # 3. Distribución de promedios por materia
+    subject_labels, subject_codes = frame.subject_codes()
+    grades_by_subject = dict(zip(
+        subject_labels, group_values(subject_codes, frame.record_nota, len(subject_labels))
+    ))
+    
+    # 4. Distribución de scores de riesgo
+    risk_scores = frame.risk_score[has_promedio & (frame.risk_level >= 0)]
+    
+    # 5. Distribución por laptop
+    with_socio = has_promedio & frame.has_socio
+    grades_with_laptop = promedio[with_socio & frame.laptop]
+    grades_without_laptop = promedio[with_socio & ~frame.laptop]
+    
+    # 6. Distribución por nivel educativo del representante
+    education_codes = np.where(with_socio, frame.parent_education, -1)
+    grades_by_education = dict(zip(
+        frame.parent_education_labels,
+        group_values(education_codes, promedio, len(frame.parent_education_labels)),
+    ))
+    
+    def calculate_distribution_stats(data, lo=0.0, hi=10.0):
+        """Calcula estadísticas de distribución para violin/box plots"""
+        arr = np.asarray(data, dtype=np.float64)
+        if not len(arr):
+            return None
+        if summary_mode == "histogram":
+            # Tamaño fijo: no crece con la matrícula
+            return HistogramSketch.of(arr, lo, hi, bins).summary()
+        q1, median, q3 = np.percentile(arr, [25, 50, 75])
+        return {
+            "min": float(arr.min()),
+            "max": float(arr.max()),
+            "mean": float(arr.mean()),
+            "median": float(median),
+            "std": float(arr.std()),
+            "q1": float(q1),
+            "q3": float(q3),
+            "count": int(len(arr)),
+            "values": np.sort(np.round(arr, 2)).tolist()  # Raw values for violin
+        }
+    
+    # Construir respuesta
+    response = {
+        # Distribución por Quintil (para violin plot)
+        "gradesByQuintile": {
+            k: calculate_distribution_stats(v) 
+            for k, v in grades_by_quintile.items() 
+            if len(v)
+        },
         
-        # 5. Distribución por laptop
-        grades_with_laptop = []
-        grades_without_laptop = []
+        # Distribución por Nivel de Riesgo
+        "gradesByRisk": {
+            k: calculate_distribution_stats(v) 
+            for k, v in grades_by_risk.items() 
+            if len(v)
+        },
         
-        # 6. Distribución por nivel educativo del representante
-        grades_by_education = {}
+        # Distribución de Risk Scores
+        "riskScoreDistribution": calculate_distribution_stats(risk_scores, 0.0, 100.0),
         
-        for student in students:
-            promedio = student.get("promedio_general")
-            quintil = student.get("quintil")
-            
-            if promedio:
-                promedio = float(promedio)
-                
-                # Por quintil
-                if quintil:
-                    quintil_key = f"Q{quintil}"
-                    if quintil_key in grades_by_quintile:
-                        grades_by_quintile[quintil_key].append(promedio)
-                
-                # Por riesgo
-                try:
-                    risk_score, risk_level, _ = risk_calculator.calculate_risk_score(student)
-                    if risk_level in grades_by_risk:
-                        grades_by_risk[risk_level].append(promedio)
-                    risk_scores.append(risk_score)
-                except:
-                    pass
-                
-                # Por laptop
-                socio = student.get("socioeconomic_data")
-                if socio:
-                    if isinstance(socio, list) and len(socio) > 0:
-                        socio = socio[0]
-                    if socio.get("laptop"):
-                        grades_with_laptop.append(promedio)
-                    else:
-                        grades_without_laptop.append(promedio)
-                    
-                    # Por nivel educativo
-                    nivel_instruccion = socio.get("nivel_instruccion_rep", "Desconocido")
-                    if nivel_instruccion:
-                        if nivel_instruccion not in grades_by_education:
-                            grades_by_education[nivel_instruccion] = []
-                        grades_by_education[nivel_instruccion].append(promedio)
-            
-            # Por materia
-            academic = student.get("academic_performance", [])
-            if academic:
-                for record in academic:
-                    materia = record.get("materia")
-                    nota = record.get("nota")
-                    if materia and nota:
-                        # Normalizar nombre de materia
-                        materia = normalize_subject_name(materia)
-                        # Filtrar materias no académicas
-                        if materia in NON_ACADEMIC_SUBJECTS:
-                            continue
-                        if materia not in grades_by_subject:
-                            grades_by_subject[materia] = []
-                        grades_by_subject[materia].append(float(nota))
+        # Comparación Laptop vs No Laptop
+        "laptopComparison": {
+            "withLaptop": calculate_distribution_stats(grades_with_laptop),
+            "withoutLaptop": calculate_distribution_stats(grades_without_laptop),
+        },
         
-        def calculate_distribution_stats(data):
-            """Calcula estadísticas de distribución para violin/box plots"""
-            if not data or len(data) == 0:
-                return None
-            arr = np.array(data)
-            return {
-                "min": float(np.min(arr)),
-                "max": float(np.max(arr)),
-                "mean": float(np.mean(arr)),
-                "median": float(np.median(arr)),
-                "std": float(np.std(arr)),
-                "q1": float(np.percentile(arr, 25)),
-                "q3": float(np.percentile(arr, 75)),
-                "count": len(data),
-                "values": sorted([round(v, 2) for v in data])  # Raw values for violin
-            }
+        # Por Nivel Educativo del Representante
+        "gradesByEducation": {
+            k: calculate_distribution_stats(v) 
+            for k, v in grades_by_education.items() 
+            if len(v)
+        },
         
-        # Construir respuesta
-        response = {
-            # Distribución por Quintil (para violin plot)
-            "gradesByQuintile": {
-                k: calculate_distribution_stats(v) 
-                for k, v in grades_by_quintile.items() 
-                if v
-            },
-            
-            # Distribución por Nivel de Riesgo
-            "gradesByRisk": {
-                k: calculate_distribution_stats(v) 
-                for k, v in grades_by_risk.items() 
-                if v
-            },
-            
-            # Distribución de Risk Scores
-            "riskScoreDistribution": calculate_distribution_stats(risk_scores),
-            
-            # Comparación Laptop vs No Laptop
-            "laptopComparison": {
-                "withLaptop": calculate_distribution_stats(grades_with_laptop),
-                "withoutLaptop": calculate_distribution_stats(grades_without_laptop),
-            },
-            
-            # Por Nivel Educativo del Representante
-            "gradesByEducation": {
-                k: calculate_distribution_stats(v) 
-                for k, v in grades_by_education.items() 
-                if v
-            },
-            
-            # Top materias (más datos)
-            "gradesBySubject": {
-                k: calculate_distribution_stats(v) 
-                for k, v in sorted(grades_by_subject.items(), key=lambda x: len(x[1]), reverse=True)[:10]
-                if v
-            },
-            
-            # Histograma de promedios generales
-            "overallGradeHistogram": _create_histogram([s.get("promedio_general") for s in students if s.get("promedio_general")]),
-            
-            # Histograma de scores de riesgo
-            "riskScoreHistogram": _create_histogram(risk_scores, bins=10, range_min=0, range_max=100),
-        }
+        # Top materias (más datos)
+        "gradesBySubject": {
+            k: calculate_distribution_stats(v) 
+            for k, v in sorted(grades_by_subject.items(), key=lambda x: len(x[1]), reverse=True)[:10]
+            if len(v)
+        },
         
-        logger.info("Score distributions retrieved successfully")
-        return jsonify(response), 200
+        # Histograma de promedios generales
+        "overallGradeHistogram": _create_histogram(promedio[has_promedio]),
         
-    except Exception as e:
-        logger.error(f"Error in get_score_distributions: {str(e)}", exc_info=True)
-        return jsonify({"error": f"Error al obtener distribuciones: {str(e)}"}), 500
+        # Histograma de scores de riesgo
+        "riskScoreHistogram": _create_histogram(risk_scores, bins=10, range_min=0, range_max=100),
+    }
+
+    return response, snapshot.version
 
 
 def _create_histogram(data, bins=10, range_min=None, range_max=None):
     """Crea datos para un histograma"""
-    if not data:
+    if data is None or not len(data):
         return None
     
-    clean_data = [float(x) for x in data if x is not None]
-    if not clean_data:
+    clean_data = np.asarray([x for x in data if x is not None], dtype=np.float64)
+    if not len(clean_data):
         return None
     
     if range_min is None:
-        range_min = min(clean_data)
+        range_min = float(clean_data.min())
     if range_max is None:
-        range_max = max(clean_data)
+        range_max = float(clean_data.max())
     
     hist, bin_edges = np.histogram(clean_data, bins=bins, range=(range_min, range_max))
     
@@ -1002,157 +1072,205 @@ def get_academic_insights():
     """
     Obtiene insights académicos avanzados basados en el análisis de datos reales
     
+    Query params:
+        ci: "true" agrega intervalos de confianza bootstrap al impacto de barreras
+    
     Returns:
         JSON con métricas avanzadas y correlaciones
     """
     try:
-        students = supabase_client.get_students(limit=1000)
-        
-        if not students:
-            return jsonify({"error": "No se encontraron estudiantes"}), 404
-        
-        # Análisis de correlaciones y métricas avanzadas
+        ci = _parse_ci(request.args)
+        response = _payload_cache.get("academic-insights", {"ci": ci}, lambda: _academic_insights_payload(ci))
         
-        # 1. Tendencia de notas por grado escolar
-        grades_by_school_grade = {}
-        
-        # 2. Materias con más estudiantes en riesgo (nota < 7)
-        subjects_at_risk = {}
+        logger.info("Academic insights retrieved successfully")
+        return jsonify(response), 200
         
-        # 3. Promedio por género
-        grades_by_gender = {"Masculino": [], "Femenino": []}
+    except LookupError:
+        return jsonify({"error": "No se encontraron estudiantes"}), 404
+    except Exception as e:
+        logger.error(f"Error in get_academic_insights: {str(e)}", exc_info=True)
+        return jsonify({"error": f"Error al obtener insights: {str(e)}"}), 500
+
+
+def _academic_insights_payload(ci=False):
+    """Payload de /academic-insights (con intervalos si ci) y versión de los datos"""
+    snapshot = get_roster_snapshot()
+    if snapshot is None or not len(snapshot):
+        raise LookupError("Roster snapshot not available")
+    
+    frame = get_roster_frame(snapshot)
+    has_promedio = frame.has_promedio
+    promedio = frame.promedio
+    
+    # 1. Tendencia de notas por grado escolar
+    grade_counts, grade_means = group_mean(
+        np.where(has_promedio, frame.grado, -1), promedio, len(frame.grado_labels)
+    )
+    
+    # 2. Materias con más estudiantes en riesgo (nota < 7)
+    subject_labels, subject_codes = frame.subject_codes()
+    kept = subject_codes >= 0
+    subject_totals = np.bincount(subject_codes[kept], minlength=len(subject_labels))
+    subject_at_risk = np.bincount(
+        subject_codes[kept & (frame.record_nota < 7.0)], minlength=len(subject_labels)
+    )
+    
+    # 3. Promedio por género
+    gender_counts, gender_means = group_mean(
+        np.where(has_promedio, frame.genero, -1), promedio, len(frame.genero_labels)
+    )
+    
+    # 4. Análisis de barreras acumuladas vs promedio
+    barrier_codes = np.where(has_promedio & frame.has_socio, frame.barriers, -1)
+    barrier_index = get_barrier_index(snapshot)
+    barrier_counts, barrier_means = group_mean(barrier_codes, promedio, int(barrier_codes.max()) + 1)
+    
+    # Calcular promedios por número de barreras
+    barriers_impact_avg = {
+        str(b): {
+            "avg_grade": round(float(barrier_means[b]), 2),
+            "count": int(barrier_counts[b])
+        } 
+        for b in np.flatnonzero(barrier_counts)
+    }
+    
+    # Calcular % en riesgo por materia
+    subjects_risk_percentage = [
+        {
+            "subject": subject,
+            "totalStudents": int(total),
+            "atRisk": int(at_risk),
+            "riskPercentage": round(float(at_risk / total) * 100, 1) if total > 0 else 0
+        }
+        for subject, total, at_risk in zip(subject_labels, subject_totals, subject_at_risk)
+        if total >= 10  # Solo materias con suficientes datos
+    ]
+    subjects_risk_percentage.sort(key=lambda x: x["riskPercentage"], reverse=True)
+    
+    response = {
+        # Tendencia por grado escolar
+        "gradesBySchoolGrade": {
+            grado: {
+                "mean": round(float(grade_means[i]), 2),
+                "count": int(grade_counts[i])
+            }
+            for i, grado in enumerate(frame.grado_labels)
+            if grade_counts[i] >= 5
+        },
         
-        # 4. Análisis de barreras acumuladas vs promedio
-        barriers_vs_grade = []
+        # Por género - only include if there's data
+        "gradesByGender": {
+            genero: {
+                "mean": round(float(gender_means[i]), 2),
+                "count": int(gender_counts[i])
+            }
+            for i, genero in enumerate(frame.genero_labels)
+            if genero in ("Masculino", "Femenino") and gender_counts[i] > 0
+        },
         
-        for student in students:
-            promedio = student.get("promedio_general")
-            grado = student.get("grado", "Desconocido")
-            genero = student.get("genero")
-            
-            if promedio:
-                promedio = float(promedio)
-                
-                # Por grado escolar
-                if grado not in grades_by_school_grade:
-                    grades_by_school_grade[grado] = []
-                grades_by_school_grade[grado].append(promedio)
-                
-                # Por género
-                if genero and genero in grades_by_gender:
-                    grades_by_gender[genero].append(promedio)
-                
-                # Barreras acumuladas
-                socio = student.get("socioeconomic_data")
-                if socio:
-                    if isinstance(socio, list) and len(socio) > 0:
-                        socio = socio[0]
-                    
-                    barriers_count = 0
-                    if not socio.get("laptop"):
-                        barriers_count += 1
-                    if not socio.get("internet"):
-                        barriers_count += 1
-                    if not socio.get("lectura_libros"):
-                        barriers_count += 1
-                    if socio.get("indice_cobertura_salud") == "Sin":
-                        barriers_count += 1
-                    if socio.get("indice_acceso_tecnologico") in ["Bajo", "Sin"]:
-                        barriers_count += 1
-                    if socio.get("indice_apoyo_familiar") == "Bajo":
-                        barriers_count += 1
-                    
-                    barriers_vs_grade.append({
-                        "barriers": barriers_count,
-                        "grade": promedio
-                    })
-            
-            # Materias en riesgo
-            academic = student.get("academic_performance", [])
-            if academic:
-                for record in academic:
-                    materia = record.get("materia")
-                    nota = record.get("nota")
-                    if materia and nota:
-                        # Normalize subject names using helper function
-                        materia = normalize_subject_name(materia)
-                        # Skip non-academic subjects
-                        if materia in NON_ACADEMIC_SUBJECTS:
-                            continue
-                        if materia not in subjects_at_risk:
-                            subjects_at_risk[materia] = {"total": 0, "at_risk": 0}
-                        subjects_at_risk[materia]["total"] += 1
-                        if float(nota) < 7.0:
-                            subjects_at_risk[materia]["at_risk"] += 1
+        # Impacto de barreras acumuladas
+        "barriersImpact": barriers_impact_avg,
         
-        # Calcular promedios por número de barreras
-        barriers_impact = {}
-        for item in barriers_vs_grade:
-            b = item["barriers"]
-            if b not in barriers_impact:
-                barriers_impact[b] = []
-            barriers_impact[b].append(item["grade"])
+        # Materias con más riesgo
+        "subjectsAtRisk": subjects_risk_percentage[:10],
         
-        barriers_impact_avg = {
-            str(k): {
-                "avg_grade": round(np.mean(v), 2),
-                "count": len(v)
-            } 
-            for k, v in sorted(barriers_impact.items())
+        # Resumen general
+        "summary": {
+            "totalStudents": frame.n_students,
+            "studentsWithData": int(has_promedio.sum()),
+            "avgGrade": round(float(np.mean(promedio[has_promedio])), 2) if has_promedio.any() else None,
+            "studentsWithBarriers": barrier_index.at_least(
+                3, within=barrier_index.bitset(HAS_PROMEDIO)
+            ).bit_count(),
         }
+    }
+
+    if ci:
+        intervals = get_roster_intervals(snapshot)
+        for b, impact in barriers_impact_avg.items():
+            impact["ci"] = intervals["barriers"].get(b)
+        response["confidenceIntervals"] = intervals["metadata"]
+
+    return response, snapshot.version
+
+
+@institutional_bp.route("/correlations", methods=["GET"])
+def get_correlations():
+    """
+    Obtiene la matriz de correlación entre features del estudiante y notas por materia
+    
+    Query params:
+        features: Columnas separadas por coma (ej: apoyo_familiar,nota:Matemáticas);
+                  sin valor se usan todas
+        method: "pearson" (por defecto) o "spearman"
+    
+    Returns:
+        JSON con la matriz de coeficientes y los pares completos de cada celda
+    """
+    try:
+        method = request.args.get("method", "pearson")
+        if method not in METHODS:
+            return jsonify({"error": "method debe ser 'pearson' o 'spearman'"}), 400
+        requested = [name.strip() for name in request.args.get("features", "").split(",") if name.strip()]
         
-        # Calcular % en riesgo por materia
-        subjects_risk_percentage = [
-            {
-                "subject": k,
-                "totalStudents": v["total"],
-                "atRisk": v["at_risk"],
-                "riskPercentage": round((v["at_risk"] / v["total"]) * 100, 1) if v["total"] > 0 else 0
-            }
-            for k, v in subjects_at_risk.items()
-            if v["total"] >= 10  # Solo materias con suficientes datos
-        ]
-        subjects_risk_percentage.sort(key=lambda x: x["riskPercentage"], reverse=True)
+        snapshot = get_roster_snapshot()
+        if snapshot is None or not len(snapshot):
+            return jsonify({"error": "No se encontraron estudiantes"}), 404
+        
+        correlations = get_correlation_frame(snapshot)
+        features = requested or correlations.names
+        try:
+            r, pairs = correlations.select(features, method)
+        except ValueError as e:
+            return jsonify({"error": str(e), "available": correlations.names}), 400
         
         response = {
-            # Tendencia por grado escolar
-            "gradesBySchoolGrade": {
-                k: {
-                    "mean": round(np.mean(v), 2),
-                    "count": len(v)
-                }
-                for k, v in grades_by_school_grade.items()
-                if len(v) >= 5
-            },
-            
-            # Por género - only include if there's data
-            "gradesByGender": {
-                k: {
-                    "mean": round(np.mean(v), 2) if v else 0,
-                    "count": len(v)
-                }
-                for k, v in grades_by_gender.items()
-                if len(v) > 0  # Only include genders with actual data
-            },
-            
-            # Impacto de barreras acumuladas
-            "barriersImpact": barriers_impact_avg,
-            
-            # Materias con más riesgo
-            "subjectsAtRisk": subjects_risk_percentage[:10],
-            
-            # Resumen general
-            "summary": {
-                "totalStudents": len(students),
-                "studentsWithData": len([s for s in students if s.get("promedio_general")]),
-                "avgGrade": round(np.mean([float(s["promedio_general"]) for s in students if s.get("promedio_general")]), 2),
-                "studentsWithBarriers": len([b for b in barriers_vs_grade if b["barriers"] >= 3]),
-            }
+            "method": method,
+            "features": features,
+            "matrix": [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in r],
+            "pairs": pairs.tolist(),
+            "dataVersion": snapshot.version,
         }
         
-        logger.info("Academic insights retrieved successfully")
+        logger.info(f"Correlations retrieved: {method}, {len(features)} features")
         return jsonify(response), 200
         
     except Exception as e:
-        logger.error(f"Error in get_academic_insights: {str(e)}", exc_info=True)
-        return jsonify({"error": f"Error al obtener insights: {str(e)}"}), 500
+        logger.error(f"Error in get_correlations: {str(e)}", exc_info=True)
+        return jsonify({"error": "Error al calcular correlaciones"}), 500
+
+
+@institutional_bp.route("/admin/payload-cache", methods=["GET"])
+def get_payload_cache_state():
+    """
+    Obtiene el estado de la caché de payloads de gráficos
+    
+    Returns:
+        JSON con TTL, contadores y entradas (endpoint, params, versión, antigüedad)
+    """
+    try:
+        return jsonify(_payload_cache.inspect()), 200
+    except Exception as e:
+        logger.error(f"Error in get_payload_cache_state: {str(e)}")
+        return jsonify({"error": "Error al obtener el estado de la caché"}), 500
+
+
+@institutional_bp.route("/admin/payload-cache", methods=["DELETE"])
+def purge_payload_cache():
+    """
+    Purga la caché de payloads
+    
+    Query params:
+        endpoint: Solo purgar las entradas de este endpoint (opcional)
+    
+    Returns:
+        JSON con el número de entradas eliminadas
+    """
+    try:
+        endpoint = request.args.get("endpoint", None)
+        purged = _payload_cache.purge(endpoint)
+        logger.info(f"Payload cache purged: {purged} entries ({endpoint or 'all'})")
+        return jsonify({"purged": purged, "endpoint": endpoint}), 200
+    except Exception as e:
+        logger.error(f"Error in purge_payload_cache: {str(e)}")
+        return jsonify({"error": "Error al purgar la caché"}), 500
@@ -4,10 +4,20 @@ Rutas relacionadas con predicciones del modelo ML
 Endpoints:
 - POST /api/predict: Genera predicción para un estudiante
 - GET /api/predictions: Obtiene historial de predicciones
+- POST /api/batch-predict: Genera predicciones para múltiples estudiantes
+- POST /api/batch-predict/jobs: Crea un trabajo asíncrono de predicción por lotes
+- GET /api/batch-predict/jobs/{id}: Progreso y resultados parciales de un trabajo
 """
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import base64
 from flask import Blueprint, jsonify, request
+from config import get_config
 from services.supabase_client import supabase_client
 from services.risk_calculator import risk_calculator
+from services.prediction_batcher import PredictionBatcher
+from services.batch_jobs import BatchJobManager
+from services.shadow_scorer import get_shadow_scorer
+from utils.validators import validate_risk_level
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,38 +46,20 @@ def predict_risk():
 
         student_id = data["student_id"]
 
-        # Obtener datos del estudiante
-        student = supabase_client.get_student_by_id(student_id)
+        # Las solicitudes concurrentes se agrupan en un solo lote
+        future = _prediction_batcher.submit(student_id)
+        try:
+            response = future.result(timeout=get_config().PREDICT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            logger.error(f"Prediction for student {student_id} timed out")
+            return jsonify({"error": "Tiempo de espera agotado al generar predicción"}), 503
 
-        if not student:
+        if response is None:
             return jsonify({"error": "Estudiante no encontrado"}), 404
 
-        # Calcular score de riesgo
-        risk_score, risk_level, components = risk_calculator.calculate_risk_score(
-            student
-        )
-
-        # Predecir quintil (simplificado - en producción usarías el modelo CatBoost)
-        predicted_quintil = _predict_quintil_from_barriers(student)
-
-        # Guardar predicción en la base de datos
-        prediction = supabase_client.save_prediction(
-            student_id=student_id,
-            risk_score=risk_score,
-            risk_level=risk_level,
-            predicted_quintil=predicted_quintil,
+        logger.info(
+            f"Prediction generated for student {student_id}: {response['risk_level']}"
         )
-
-        response = {
-            "student_id": student_id,
-            "risk_score": risk_score,
-            "risk_level": risk_level,
-            "predicted_quintil": predicted_quintil,
-            "components": components,
-            "prediction_saved": prediction is not None,
-        }
-
-        logger.info(f"Prediction generated for student {student_id}: {risk_level}")
         return jsonify(response), 200
 
     except Exception as e:
@@ -78,26 +70,70 @@ def predict_risk():
 @predictions_bp.route("/predictions", methods=["GET"])
 def get_predictions():
     """
-    Obtiene el historial de predicciones
+    Obtiene el historial de predicciones (paginación keyset)
     
     Query params:
         - student_id: Filtrar por estudiante específico
-        - limit: Número máximo de predicciones (default: 50)
+        - date_from / date_to: Rango de fechas (ISO 8601, inclusivo)
+        - risk_level: Filtrar por nivel de riesgo ('Alto', 'Medio', 'Bajo')
+        - model_version: Filtrar por versión del modelo
+        - cursor: Valor next_cursor de la página anterior
+        - limit: Número máximo de predicciones (default: 50, máximo: 200)
     
     Returns:
-        JSON con lista de predicciones
+        JSON con la página de predicciones y el cursor de la siguiente
     """
     try:
         student_id = request.args.get("student_id", None)
-        limit = request.args.get("limit", 50, type=int)
+        date_from = request.args.get("date_from", None)
+        date_to = request.args.get("date_to", None)
+        risk_level = request.args.get("risk_level", None)
+        model_version = request.args.get("model_version", None)
+        limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+
+        if risk_level and not validate_risk_level(risk_level):
+            return jsonify({"error": "risk_level debe ser Alto, Medio o Bajo"}), 400
+
+        after = None
+        cursor = request.args.get("cursor", None)
+        if cursor:
+            after = _decode_cursor(cursor)
+            if after is None:
+                return jsonify({"error": "cursor inválido"}), 400
+
+        rows = supabase_client.get_predictions(
+            student_id=student_id,
+            date_from=date_from,
+            date_to=date_to,
+            risk_level=risk_level,
+            model_version=model_version,
+            after=after,
+            limit=limit,
+        )
 
-        # TODO: Implementar consulta a la tabla risk_predictions
-        # Por ahora retornamos un ejemplo
+        if rows is None:
+            return jsonify({"error": "Error al obtener predicciones"}), 500
 
-        predictions = []
+        has_more = len(rows) > limit
+        predictions = rows[:limit]
+        next_cursor = (
+            _encode_cursor(predictions[-1]["prediction_date"], predictions[-1]["id"])
+            if has_more
+            else None
+        )
 
         logger.info(f"Retrieved {len(predictions)} predictions")
-        return jsonify(predictions), 200
+        return (
+            jsonify(
+                {
+                    "predictions": predictions,
+                    "count": len(predictions),
+                    "has_more": has_more,
+                    "next_cursor": next_cursor,
+                }
+            ),
+            200,
+        )
 
     except Exception as e:
         logger.error(f"Error in get_predictions: {str(e)}")
@@ -115,7 +151,9 @@ def batch_predict():
         }
     
     Returns:
-        JSON con lista de predicciones generadas
+        JSON con lista de predicciones generadas y los IDs no encontrados.
+        Si falla la consulta o la inserción de un bloque responde 503 con las
+        predicciones de los bloques ya guardados.
     """
     try:
         data = request.get_json()
@@ -128,45 +166,30 @@ def batch_predict():
         if not isinstance(student_ids, list):
             return jsonify({"error": "student_ids debe ser una lista"}), 400
 
+        # Consulta e inserción masiva por bloques. Para un colegio completo
+        # usar /batch-predict/jobs, que no depende del timeout de la petición
         predictions = []
-
-        for student_id in student_ids:
+        chunk_size = get_config().BATCH_JOB_CHUNK_SIZE
+        for start in range(0, len(student_ids), chunk_size):
             try:
-                # Obtener datos del estudiante
-                student = supabase_client.get_student_by_id(student_id)
-
-                if not student:
-                    logger.warning(f"Student {student_id} not found, skipping")
-                    continue
-
-                # Calcular score de riesgo
-                risk_score, risk_level, _ = risk_calculator.calculate_risk_score(
-                    student
-                )
-
-                # Predecir quintil
-                predicted_quintil = _predict_quintil_from_barriers(student)
-
-                # Guardar predicción
-                supabase_client.save_prediction(
-                    student_id=student_id,
-                    risk_score=risk_score,
-                    risk_level=risk_level,
-                    predicted_quintil=predicted_quintil,
-                )
-
-                predictions.append(
-                    {
-                        "student_id": student_id,
-                        "risk_score": risk_score,
-                        "risk_level": risk_level,
-                        "predicted_quintil": predicted_quintil,
-                    }
+                predictions.extend(_score_chunk(student_ids[start : start + chunk_size]))
+            except RuntimeError as e:
+                logger.error(f"Batch prediction failed on chunk at {start}: {str(e)}")
+                return (
+                    jsonify(
+                        {
+                            "error": "Error al obtener o guardar un bloque de predicciones",
+                            "total_requested": len(student_ids),
+                            "total_predicted": len(predictions),
+                            "failed_offset": start,
+                            "predictions": predictions,
+                        }
+                    ),
+                    503,
                 )
 
-            except Exception as e:
-                logger.error(f"Error predicting for student {student_id}: {str(e)}")
-                continue
+        predicted = {p["student_id"] for p in predictions}
+        not_found = [sid for sid in dict.fromkeys(student_ids) if sid not in predicted]
 
         logger.info(f"Batch prediction completed: {len(predictions)} students")
         return (
@@ -174,6 +197,7 @@ def batch_predict():
                 {
                     "total_requested": len(student_ids),
                     "total_predicted": len(predictions),
+                    "not_found": not_found,
                     "predictions": predictions,
                 }
             ),
@@ -185,67 +209,215 @@ def batch_predict():
         return jsonify({"error": "Error en predicción por lotes"}), 500
 
 
-# Funciones auxiliares
+@predictions_bp.route("/batch-predict/jobs", methods=["POST"])
+def create_batch_prediction_job():
+    """
+    Crea un trabajo asíncrono de predicción por lotes
+    
+    Body (JSON):
+        {
+            "student_ids": ["EST001", "EST002", ...]
+        }
+        o bien
+        {
+            "all_students": true
+        }
+    
+    Returns:
+        JSON con el ID del trabajo (202 Accepted)
+    """
+    try:
+        data = request.get_json() or {}
+
+        if data.get("all_students"):
+            student_ids = supabase_client.get_student_ids()
+            if student_ids is None:
+                return jsonify({"error": "No se pudieron obtener los IDs de estudiantes"}), 503
+        elif "student_ids" in data:
+            student_ids = data["student_ids"]
+            if not isinstance(student_ids, list):
+                return jsonify({"error": "student_ids debe ser una lista"}), 400
+        else:
+            return jsonify({"error": "student_ids o all_students es requerido"}), 400
+
+        job_id = _batch_job_manager.submit(
+            student_ids, _score_chunk, chunk_size=get_config().BATCH_JOB_CHUNK_SIZE
+        )
+
+        return (
+            jsonify(
+                {
+                    "job_id": job_id,
+                    "status": "pending",
+                    "total": len(student_ids),
+                }
+            ),
+            202,
+        )
+
+    except Exception as e:
+        logger.error(f"Error in create_batch_prediction_job: {str(e)}")
+        return jsonify({"error": "Error al crear el trabajo de predicción"}), 500
 
 
-def _predict_quintil_from_barriers(student_data):
+@predictions_bp.route("/batch-predict/jobs/<job_id>", methods=["GET"])
+def get_batch_prediction_job(job_id):
     """
-    Predice el quintil basándose en las barreras identificadas
-    (Simplificación - en producción se usaría el modelo CatBoost entrenado)
+    Obtiene el progreso y los resultados parciales de un trabajo
     
-    Args:
-        student_data: Datos del estudiante
+    Query params:
+        - offset: Retornar resultados a partir de esta posición (default: 0),
+          útil para polling incremental
     
     Returns:
-        int: Quintil predicho (1-5)
-    """
-    socioeconomic = student_data.get("socioeconomic_data", [])
-
-    if not socioeconomic:
-        return 3  # Default: Q3 (Medio)
-
-    socio_data = socioeconomic[0] if socioeconomic else {}
-
-    # Contador de barreras presentes
-    barriers_count = 0
-
-    # Barreras tecnológicas
-    if not socio_data.get("laptop", False):
-        barriers_count += 1
-    if not socio_data.get("internet", False):
-        barriers_count += 1
-    if not socio_data.get("computadora", False):
-        barriers_count += 0.5
-
-    # Barreras educativas
-    nivel = socio_data.get("nivel_instruccion_rep", "").lower()
-    if "primaria" in nivel:
-        barriers_count += 1.5
-    elif "básica" in nivel:
-        barriers_count += 1
-
-    # Barreras culturales
-    if not socio_data.get("lectura_libros", False):
-        barriers_count += 0.5
-
-    # Barreras de salud
-    indice_salud = socio_data.get("indice_cobertura_salud", "").lower()
-    if "sin" in indice_salud:
-        barriers_count += 1
-
-    # Barreras de apoyo familiar
-    indice_apoyo = socio_data.get("indice_apoyo_familiar", "").lower()
-    if "bajo" in indice_apoyo:
-        barriers_count += 1
-
-    # Clasificación por número de barreras
-    if barriers_count >= 5:
-        return 1  # Q1 (Muy vulnerable)
-    elif barriers_count >= 3:
-        return 2  # Q2 (Vulnerable)
-    elif barriers_count >= 1.5:
-        return 3  # Q3 (Medio)
-    elif barriers_count >= 0.5:
-        return 4  # Q4 (Acomodado)
-    else:
-        return 5  # Q5 (Alto)
+        JSON con estado, progreso y resultados del trabajo
+    """
+    try:
+        offset = max(0, request.args.get("offset", 0, type=int))
+        job = _batch_job_manager.get(job_id, offset=offset)
+
+        if job is None:
+            return jsonify({"error": "Trabajo no encontrado"}), 404
+
+        return jsonify(job), 200
+
+    except Exception as e:
+        logger.error(f"Error in get_batch_prediction_job: {str(e)}")
+        return jsonify({"error": "Error al obtener el trabajo de predicción"}), 500
+
+
+# Funciones auxiliares
+
+
+def _encode_cursor(prediction_date, prediction_id):
+    """Codifica la posición (prediction_date, id) como cursor opaco"""
+    raw = f"{prediction_date}|{prediction_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    """
+    Decodifica un cursor de paginación
+
+    Returns:
+        tuple: (prediction_date, id) o None si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        prediction_date, prediction_id = raw.rsplit("|", 1)
+        return prediction_date, int(prediction_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def _score_students(students):
+    """
+    Calcula riesgo y quintil predicho para una lista de estudiantes
+
+    Args:
+        students: Lista de estudiantes con sus datos relacionados
+
+    Returns:
+        list: Predicciones (incluye el desglose de componentes)
+    """
+    predictions = []
+    for student in students:
+        risk_score, risk_level, components = risk_calculator.calculate_risk_score(
+            student
+        )
+        predictions.append(
+            {
+                "student_id": student.get("id"),
+                "risk_score": risk_score,
+                "risk_level": risk_level,
+                "predicted_quintil": risk_calculator.predict_quintil_from_barriers(student),
+                "components": components,
+            }
+        )
+    return predictions
+
+
+def _score_chunk(student_ids):
+    """
+    Procesa un bloque de predicción por lotes: consulta masiva, cálculo
+    del grupo e inserción masiva
+
+    Args:
+        student_ids: IDs del bloque
+
+    Returns:
+        list: Predicciones generadas (sin desglose de componentes)
+
+    Raises:
+        RuntimeError: si la consulta de estudiantes o la inserción fallan (el
+            trabajo registra el bloque en sus errores)
+    """
+    students = supabase_client.get_students_by_ids(list(dict.fromkeys(student_ids)))
+    if students is None:
+        raise RuntimeError(f"Could not fetch {len(student_ids)} students")
+
+    found = {s.get("id") for s in students}
+    for student_id in student_ids:
+        if student_id not in found:
+            logger.warning(f"Student {student_id} not found, skipping")
+
+    predictions = [
+        {key: value for key, value in p.items() if key != "components"}
+        for p in _score_students(students)
+    ]
+
+    if supabase_client.save_predictions(predictions) is None:
+        raise RuntimeError(f"Could not save {len(predictions)} batch predictions")
+
+    return predictions
+
+
+def _predict_batch(student_ids):
+    """
+    Genera las predicciones de un lote de solicitudes a /predict
+
+    Hace una sola consulta de estudiantes, calcula el riesgo del grupo y guarda
+    todas las predicciones con una única inserción.
+
+    Args:
+        student_ids: Lista de IDs (puede contener repetidos)
+
+    Returns:
+        list: Un resultado por ID, en el mismo orden (None si no existe)
+    """
+    unique_ids = list(dict.fromkeys(student_ids))
+    students = supabase_client.get_students_by_ids(unique_ids)
+    if students is None:
+        # Falla todo el lote: /predict responde error en vez de "no encontrado"
+        raise RuntimeError(f"Could not fetch {len(unique_ids)} students")
+
+    predictions = {p["student_id"]: p for p in _score_students(students)}
+
+    saved = supabase_client.save_predictions(list(predictions.values()))
+
+    # Comparación en sombra con el modelo candidato (no bloquea la respuesta)
+    shadow = get_shadow_scorer()
+    if shadow is not None and predictions:
+        shadow.submit(list(predictions))
+
+    results = []
+    for student_id in student_ids:
+        prediction = predictions.get(student_id)
+        if prediction is not None:
+            prediction = {**prediction, "prediction_saved": saved is not None}
+        results.append(prediction)
+
+    logger.info(f"Prediction batch generated: {len(predictions)}/{len(unique_ids)} students")
+    return results
+
+
+_config = get_config()
+_prediction_batcher = PredictionBatcher(
+    _predict_batch,
+    max_batch_size=_config.PREDICT_BATCH_MAX_SIZE,
+    max_wait_ms=_config.PREDICT_BATCH_WINDOW_MS,
+)
+_batch_job_manager = BatchJobManager(
+    max_workers=_config.BATCH_JOB_WORKERS,
+    max_retained_jobs=_config.BATCH_JOB_MAX_RETAINED,
+)
@@ -8,12 +8,18 @@ Endpoints:
 from flask import Blueprint, jsonify, request
 from services.supabase_client import supabase_client
 from services.risk_calculator import risk_calculator
+from services.subject_taxonomy import subject_taxonomy
 import logging
 
 logger = logging.getLogger(__name__)
 
 students_bp = Blueprint("students", __name__)
 
+# Materias clave (las más afectadas por apoyo familiar)
+KEY_SUBJECTS = subject_taxonomy.code_set(
+    ["Matemáticas", "Biología", "Física", "Estudios Sociales", "Lengua y Literatura"]
+)
+
 
 @students_bp.route("/sat-list", methods=["GET"])
 def get_sat_list():
@@ -176,14 +182,10 @@ def _get_key_grades(academic_performance):
     - Física (ρ=+0.14)
     - Estudios Sociales (ρ=+0.14)
     """
-    key_subjects = ["matemáticas", "biología", "física", "estudios sociales", "lengua"]
-
     key_grades = []
     for materia_data in academic_performance:
-        materia_name = materia_data.get("materia", "").lower()
-
         # Verificar si es una materia clave
-        is_key = any(key in materia_name for key in key_subjects)
+        is_key = subject_taxonomy.code(materia_data.get("materia")) in KEY_SUBJECTS
 
         if is_key:
             key_grades.append(
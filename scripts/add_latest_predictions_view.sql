@@ -0,0 +1,14 @@
+-- SQL Script to add the latest_risk_predictions view
+-- Run this in Supabase SQL Editor (Database → SQL Editor → New Query)
+--
+-- The backend reads this view to compare new predictions against the last
+-- stored one per student and skips writes when nothing changed.
+-- Uses idx_predictions_student_date_id (see add_prediction_indexes.sql).
+
+CREATE OR REPLACE VIEW latest_risk_predictions AS
+SELECT DISTINCT ON (student_id) *
+FROM risk_predictions
+ORDER BY student_id, prediction_date DESC, id DESC;
+
+-- Verify view
+SELECT * FROM latest_risk_predictions LIMIT 10;
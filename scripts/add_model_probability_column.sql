@@ -0,0 +1,23 @@
+-- SQL Script to add the model_probability column to risk_predictions
+-- Run this in Supabase SQL Editor (Database → SQL Editor → New Query)
+--
+-- The scoring pipeline (python -m services.scoring_pipeline) stores the ML
+-- model probability next to the heuristic risk score. Predictions generated
+-- from the API leave it NULL.
+
+ALTER TABLE risk_predictions
+    ADD COLUMN IF NOT EXISTS model_probability NUMERIC(5,4)
+    CHECK (model_probability >= 0 AND model_probability <= 1);
+
+COMMENT ON COLUMN risk_predictions.model_probability IS 'Probabilidad de riesgo del modelo ML (pipeline de scoring)';
+
+-- SELECT * views are expanded when created: recreate it to expose the new column
+CREATE OR REPLACE VIEW latest_risk_predictions AS
+SELECT DISTINCT ON (student_id) *
+FROM risk_predictions
+ORDER BY student_id, prediction_date DESC, id DESC;
+
+-- Verify column
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'risk_predictions' AND column_name = 'model_probability';
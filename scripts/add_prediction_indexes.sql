@@ -0,0 +1,34 @@
+-- SQL Script to add the composite indexes used by GET /api/predictions
+-- Run this in Supabase SQL Editor (Database → SQL Editor → New Query)
+--
+-- The history endpoint filters by student_id / risk_level / model_version and
+-- pages with a keyset on (prediction_date, id). Each index below ends with
+-- (prediction_date, id) so filtered pages are read straight from the index
+-- in order, no matter how deep the page is.
+
+-- Student history (also covers lookups by student_id alone)
+CREATE INDEX IF NOT EXISTS idx_predictions_student_date_id
+    ON risk_predictions (student_id, prediction_date DESC, id DESC);
+
+-- Unfiltered history and date ranges
+CREATE INDEX IF NOT EXISTS idx_predictions_date_id
+    ON risk_predictions (prediction_date DESC, id DESC);
+
+-- Filter by risk level
+CREATE INDEX IF NOT EXISTS idx_predictions_level_date_id
+    ON risk_predictions (risk_level, prediction_date DESC, id DESC);
+
+-- Filter by model version
+CREATE INDEX IF NOT EXISTS idx_predictions_version_date_id
+    ON risk_predictions (model_version, prediction_date DESC, id DESC);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_predictions_student_id;
+DROP INDEX IF EXISTS idx_predictions_risk_level;
+DROP INDEX IF EXISTS idx_predictions_date;
+
+-- Verify indexes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'risk_predictions'
+ORDER BY indexname;
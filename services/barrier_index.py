@@ -0,0 +1,127 @@
+"""
+Índice de bitmaps sobre barreras y categorías del padrón
+
+Cada barrera (sin laptop, sin internet, ...) y cada valor de categoría (nivel
+de riesgo, grupo de quintil) tiene un bitset con un bit por estudiante,
+guardado como entero de Python. Una cohorte como "sin laptop Y sin internet Y
+apoyo familiar bajo" es un AND de enteros y su tamaño un int.bit_count(), sin
+recorrer los datos socioeconómicos. Los bitsets se construyen una vez por
+versión del snapshot (np.packbits sobre las columnas del RosterFrame) y no
+se modifican: un snapshot nuevo reconstruye el índice.
+"""
+import numpy as np
+from services.roster_frame import BARRIERS, QUINTIL_GROUPS, RISK_LEVELS, get_roster_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+BARRIER_LABELS = {
+    "sin_laptop": "Sin laptop",
+    "sin_internet": "Sin internet",
+    "sin_libros": "Sin lectura de libros",
+    "sin_cobertura_salud": "Sin cobertura de salud",
+    "acceso_tecnologico_bajo": "Acceso tecnológico bajo",
+    "apoyo_familiar_bajo": "Apoyo familiar bajo",
+}
+
+HAS_SOCIO = "con_datos_socioeconomicos"
+HAS_PROMEDIO = "con_promedio"
+RISK_SETS = tuple(f"riesgo_{level.lower()}" for level in RISK_LEVELS)
+QUINTIL_SETS = tuple("quintil_" + group.lower().replace("-", "_") for group in QUINTIL_GROUPS)
+
+SETS = BARRIERS + (HAS_SOCIO, HAS_PROMEDIO) + RISK_SETS + QUINTIL_SETS
+
+
+def _pack(mask):
+    """Array booleano -> entero con el bit i encendido si mask[i]"""
+    return int.from_bytes(np.packbits(np.asarray(mask, dtype=bool), bitorder="little").tobytes(), "little")
+
+
+class BarrierIndex:
+    """
+    Bitsets por barrera/categoría con consultas AND/OR/NOT y conteo por popcount
+    """
+
+    def __init__(self, bitsets, student_ids):
+        """
+        Args:
+            bitsets: dict nombre (de SETS) -> entero con un bit por estudiante
+            student_ids: ID del estudiante de cada posición de bit
+        """
+        self._bitsets = {name: bitsets.get(name, 0) for name in SETS}
+        self._universe = (1 << len(student_ids)) - 1
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Construye el índice desde un RosterFrame (vectorizado)"""
+        columns = {name: frame.barrier_flags[:, j] for j, name in enumerate(BARRIERS)}
+        columns[HAS_SOCIO] = frame.has_socio
+        columns[HAS_PROMEDIO] = frame.has_promedio
+        columns.update({name: frame.risk_level == i for i, name in enumerate(RISK_SETS)})
+        columns.update({name: frame.quintil_group == i for i, name in enumerate(QUINTIL_SETS)})
+        return cls({name: _pack(mask) for name, mask in columns.items()}, frame.student_ids)
+
+    @property
+    def population(self):
+        """Número de estudiantes indexados"""
+        return self._universe.bit_count()
+
+    def bitset(self, name):
+        """
+        Bitset de una barrera o categoría
+
+        Raises:
+            ValueError: si el nombre no está en SETS
+        """
+        if name not in self._bitsets:
+            raise ValueError(f"Unknown set: {name}")
+        return self._bitsets[name]
+
+    def query(self, all_of=(), any_of=(), none_of=()):
+        """
+        Bitset de los estudiantes que cumplen todas las condiciones de all_of,
+        al menos una de any_of (si se indica) y ninguna de none_of
+        """
+        result = self._universe
+        for name in all_of:
+            result &= self.bitset(name)
+        if any_of:
+            union = 0
+            for name in any_of:
+                union |= self.bitset(name)
+            result &= union
+        for name in none_of:
+            result &= ~self.bitset(name)
+        return result
+
+    def count(self, all_of=(), any_of=(), none_of=()):
+        """Tamaño de la cohorte de query()"""
+        return self.query(all_of, any_of, none_of).bit_count()
+
+    def at_least(self, k, names=BARRIERS, within=None):
+        """
+        Bitset de los estudiantes con al menos k de los conjuntos indicados
+
+        Acumula un contador por bits: reached[j] contiene a los estudiantes con
+        al menos j conjuntos vistos hasta el momento.
+        """
+        reached = [self._universe if within is None else within] + [0] * k
+        for name in names:
+            bits = self.bitset(name)
+            for j in range(k, 0, -1):
+                reached[j] |= reached[j - 1] & bits
+        return reached[k]
+
+    def cooccurrence(self, names=BARRIERS, within=None):
+        """
+        Matriz de co-ocurrencia (estudiantes con ambas barreras; la diagonal es
+        el total de cada barrera)
+        """
+        universe = self._universe if within is None else within
+        bits = [self.bitset(name) & universe for name in names]
+        return [[(a & b).bit_count() for b in bits] for a in bits]
+
+
+def get_barrier_index(snapshot):
+    """Índice de barreras del snapshot (se construye una vez por versión)"""
+    return snapshot.derived("barrier_index", lambda s: BarrierIndex.from_frame(get_roster_frame(s)))
@@ -0,0 +1,157 @@
+"""
+Trabajos asíncronos de predicción por lotes
+
+Un trabajo recibe la lista completa de elementos (IDs de estudiantes), la divide
+en bloques y la procesa en un pool acotado de hilos. El estado de cada trabajo
+(progreso, resultados parciales y errores) se mantiene en memoria para que el
+cliente lo consulte por polling sin quedar atado al timeout de la petición HTTP.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    """Estado de un trabajo de predicción por lotes"""
+
+    def __init__(self, items, chunk_size):
+        self.id = uuid.uuid4().hex
+        self.items = list(items)
+        self.chunk_size = max(1, int(chunk_size))
+        self.status = "pending"  # pending, running, completed, failed
+        self.processed = 0
+        self.results = []
+        self.errors = []
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self, offset=0):
+        """
+        Serializa el estado del trabajo
+
+        Args:
+            offset: Índice desde el cual incluir resultados (para polling incremental)
+        """
+        total = len(self.items)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": total,
+            "processed": self.processed,
+            "progress": round(self.processed / total * 100, 1) if total else 100.0,
+            "total_predicted": len(self.results),
+            "results_offset": offset,
+            "results": self.results[offset:],
+            "errors": self.errors,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class BatchJobManager:
+    """
+    Ejecuta trabajos por lotes en un pool de hilos de tamaño fijo
+    """
+
+    def __init__(self, max_workers=2, max_retained_jobs=50):
+        """
+        Args:
+            max_workers: Número máximo de trabajos ejecutándose a la vez
+            max_retained_jobs: Trabajos terminados que se conservan en memoria
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_workers)), thread_name_prefix="batch-job"
+        )
+        self._max_retained_jobs = max(1, int(max_retained_jobs))
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, items, chunk_handler, chunk_size=100):
+        """
+        Registra y encola un nuevo trabajo
+
+        Args:
+            items: Elementos a procesar
+            chunk_handler: Función que recibe un bloque de elementos y retorna
+                la lista de resultados de ese bloque
+            chunk_size: Tamaño de cada bloque
+
+        Returns:
+            str: ID del trabajo
+        """
+        job = BatchJob(items, chunk_size)
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished_jobs()
+
+        self._executor.submit(self._run, job, chunk_handler)
+        logger.info(f"Batch job {job.id} queued with {len(job.items)} items")
+        return job.id
+
+    def get(self, job_id, offset=0):
+        """
+        Obtiene el estado de un trabajo
+
+        Returns:
+            dict con el estado o None si el trabajo no existe
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict(offset=offset) if job else None
+
+    def _run(self, job, chunk_handler):
+        """Procesa un trabajo bloque por bloque"""
+        with self._lock:
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+
+        try:
+            for start in range(0, len(job.items), job.chunk_size):
+                chunk = job.items[start : start + job.chunk_size]
+
+                try:
+                    results = chunk_handler(chunk)
+                    error = None
+                except Exception as e:
+                    logger.error(f"Batch job {job.id} failed on chunk at {start}: {str(e)}")
+                    results = []
+                    error = {"offset": start, "size": len(chunk), "error": str(e)}
+
+                with self._lock:
+                    job.results.extend(results)
+                    job.processed += len(chunk)
+                    if error:
+                        job.errors.append(error)
+
+            with self._lock:
+                job.status = "completed"
+        except Exception as e:
+            logger.error(f"Batch job {job.id} failed: {str(e)}", exc_info=True)
+            with self._lock:
+                job.status = "failed"
+                job.errors.append({"error": str(e)})
+        finally:
+            with self._lock:
+                job.finished_at = datetime.utcnow()
+
+        logger.info(
+            f"Batch job {job.id} {job.status}: {len(job.results)}/{len(job.items)} predicted"
+        )
+
+    def _evict_finished_jobs(self):
+        """Descarta los trabajos terminados más antiguos (requiere el lock)"""
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in ("completed", "failed")
+        ]
+        for job_id in finished[: max(0, len(self._jobs) - self._max_retained_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,187 @@
+"""
+Intervalos de confianza bootstrap vectorizados
+
+Las réplicas de todos los grupos de una comparación se generan juntas: los
+valores se concatenan por grupo, se sortea una matriz (réplicas x valores) de
+índices dentro de cada grupo y la estadística se obtiene con reduceat (media)
+o con una selección parcial por grupo sobre todas las réplicas (mediana). El RNG se inicializa con una
+semilla fija, de modo que los intervalos son reproducibles para la misma
+versión de los datos, y se calculan una vez por versión del snapshot.
+"""
+import zlib
+import numpy as np
+from config import get_config
+from services.roster_frame import get_roster_frame, group_values
+
+# Tope de elementos por bloque de réplicas (acota la memoria con padrones grandes)
+_MAX_BLOCK_ELEMENTS = 4_000_000
+
+
+def bootstrap_replicates(groups, statistic="mean", n_resamples=2000, rng=None):
+    """
+    Réplicas bootstrap de una estadística para varios grupos a la vez
+
+    Args:
+        groups: Lista de arrays de valores (todos no vacíos)
+        statistic: "mean" o "median"
+        n_resamples: Número de réplicas
+        rng: numpy Generator
+
+    Returns:
+        Matriz (n_resamples, len(groups)) con la estadística de cada réplica
+    """
+    if statistic not in ("mean", "median"):
+        raise ValueError(f"Unknown statistic: {statistic}")
+    rng = rng if rng is not None else np.random.default_rng()
+
+    sizes = np.array([len(g) for g in groups], dtype=np.int64)
+    values = np.concatenate([np.asarray(g, dtype=np.float64) for g in groups])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    # Grupo, inicio y tamaño de cada columna de la matriz de réplicas
+    group_of = np.repeat(np.arange(len(groups)), sizes)
+    column_offsets = offsets[group_of]
+    column_sizes = sizes[group_of]
+
+    block = max(1, _MAX_BLOCK_ELEMENTS // max(len(values), 1))
+    replicates = []
+    for start in range(0, n_resamples, block):
+        rows = min(block, n_resamples - start)
+        index = column_offsets + (rng.random((rows, len(values))) * column_sizes).astype(np.int64)
+        samples = values[index]
+        if statistic == "mean":
+            replicates.append(np.add.reduceat(samples, offsets, axis=1) / sizes)
+        else:
+            # Selección parcial de las posiciones centrales de cada grupo (todas las réplicas a la vez)
+            medians = np.empty((rows, len(groups)))
+            for g, (offset, size) in enumerate(zip(offsets, sizes)):
+                middle = [(size - 1) // 2, size // 2]
+                part = np.partition(samples[:, offset:offset + size], middle, axis=1)
+                medians[:, g] = part[:, middle].mean(axis=1)
+            replicates.append(medians)
+
+    return np.vstack(replicates)
+
+
+def percentile_interval(replicates, confidence=0.95):
+    """
+    Intervalo percentil de cada columna de réplicas
+
+    Returns:
+        tuple: (low, high) arrays
+    """
+    alpha = (1 - confidence) / 2 * 100
+    low, high = np.percentile(replicates, [alpha, 100 - alpha], axis=0)
+    return low, high
+
+
+def _interval(low, high):
+    return {"low": round(float(low), 2), "high": round(float(high), 2)}
+
+
+class GroupIntervals:
+    """
+    Calcula intervalos bootstrap para listas de grupos con una configuración fija
+    """
+
+    def __init__(self, n_resamples=2000, confidence=0.95, seed=0):
+        self.n_resamples = int(n_resamples)
+        self.confidence = float(confidence)
+        self.seed = int(seed)
+
+    def _rng(self, name):
+        # Semilla por comparación: agregar un grupo no cambia los intervalos de otro gráfico
+        return np.random.default_rng([self.seed, zlib.crc32(name.encode())])
+
+    def intervals(self, name, groups, statistic="mean"):
+        """
+        Intervalo de cada grupo (None si tiene menos de 2 valores)
+        """
+        groups = [np.asarray(g, dtype=np.float64) for g in groups]
+        usable = [i for i, g in enumerate(groups) if len(g) >= 2]
+        result = [None] * len(groups)
+        if not usable:
+            return result
+
+        replicates = bootstrap_replicates(
+            [groups[i] for i in usable], statistic, self.n_resamples, self._rng(name)
+        )
+        low, high = percentile_interval(replicates, self.confidence)
+        for j, i in enumerate(usable):
+            result[i] = _interval(low[j], high[j])
+        return result
+
+    def difference(self, name, first, second, statistic="mean"):
+        """
+        Intervalo de la diferencia first - second (None si alguno tiene menos de 2 valores)
+        """
+        if len(first) < 2 or len(second) < 2:
+            return None
+        replicates = bootstrap_replicates([first, second], statistic, self.n_resamples, self._rng(name))
+        low, high = percentile_interval(replicates[:, 0] - replicates[:, 1], self.confidence)
+        return _interval(low, high)
+
+    def metadata(self):
+        return {
+            "method": "percentile bootstrap",
+            "resamples": self.n_resamples,
+            "confidence": self.confidence,
+            "seed": self.seed,
+        }
+
+
+def roster_intervals(snapshot, group_intervals):
+    """
+    Intervalos de las comparaciones de los gráficos institucionales
+
+    Returns:
+        dict con los intervalos de GPA con/sin laptop (y su diferencia), por
+        instrucción del representante, de la mediana por quintil y del GPA por
+        número de barreras
+    """
+    frame = get_roster_frame(snapshot)
+    has_promedio = frame.has_promedio
+    with_socio = has_promedio & frame.has_socio
+
+    with_laptop = frame.promedio[with_socio & frame.laptop]
+    without_laptop = frame.promedio[with_socio & ~frame.laptop]
+    laptop = group_intervals.intervals("laptop", [with_laptop, without_laptop])
+
+    parent_groups = group_values(
+        np.where(with_socio, frame.parent_education, -1), frame.promedio, len(frame.parent_education_labels)
+    )
+    quintil_groups = group_values(
+        np.where(has_promedio & (frame.quintil >= 1) & (frame.quintil <= 5), frame.quintil - 1, -1),
+        frame.promedio,
+        5,
+    )
+    barrier_codes = np.where(with_socio, frame.barriers, -1)
+    n_barrier_groups = int(barrier_codes.max()) + 1 if len(barrier_codes) else 0
+    barrier_groups = group_values(barrier_codes, frame.promedio, n_barrier_groups) if n_barrier_groups else []
+
+    return {
+        "laptop": {
+            "withLaptop": laptop[0],
+            "withoutLaptop": laptop[1],
+            "difference": group_intervals.difference("laptop_difference", with_laptop, without_laptop),
+        },
+        "parent_education": dict(
+            zip(frame.parent_education_labels, group_intervals.intervals("parent_education", parent_groups))
+        ),
+        "quintil_medians": dict(
+            zip(range(1, 6), group_intervals.intervals("quintil_medians", quintil_groups, statistic="median"))
+        ),
+        "barriers": dict(
+            zip(
+                (str(b) for b in range(len(barrier_groups))),
+                group_intervals.intervals("barriers", barrier_groups),
+            )
+        ),
+        "metadata": group_intervals.metadata(),
+    }
+
+
+def get_roster_intervals(snapshot):
+    """Intervalos bootstrap del snapshot (BOOTSTRAP_*; se calculan una vez por versión)"""
+    config = get_config()
+    group_intervals = GroupIntervals(config.BOOTSTRAP_RESAMPLES, config.BOOTSTRAP_CONFIDENCE, config.BOOTSTRAP_SEED)
+    return snapshot.derived("bootstrap_intervals", lambda s: roster_intervals(s, group_intervals))
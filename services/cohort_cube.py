@@ -0,0 +1,218 @@
+"""
+Cubo de cohortes para consultas multidimensionales
+
+Agrega el padrón sobre las dimensiones quintil, grado, nivel educativo,
+género, laptop, internet e instrucción del representante. Cada estudiante cae
+en una celda del cubo denso (un array de NumPy por medida: estudiantes, en
+riesgo, en riesgo alto y suma/cantidad de promedios), que se construye con un
+solo bincount sobre el RosterFrame. Una consulta (group_by + filtros) recorta
+el cubo por índices y suma los ejes restantes, así que su costo depende del
+tamaño del cubo y no del número de estudiantes. El cubo es de solo lectura:
+se reconstruye con cada versión del snapshot del padrón.
+"""
+import numpy as np
+from services.roster_aggregates import EDUCATION_LEVEL_GRADES, education_level
+from services.roster_frame import RISK_LEVELS, get_roster_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "Desconocido"
+
+DIMENSIONS = (
+    "quintil",
+    "grado",
+    "nivel_educativo",
+    "genero",
+    "laptop",
+    "internet",
+    "parent_education",
+)
+
+MEASURES = ("students", "at_risk", "high_risk", "gpa_count", "gpa_sum")
+
+_YES_NO = ["No", "Sí"]
+
+# Dimensiones sí/no: los filtros aceptan también true/false, 1/0, si/no
+YES_NO_DIMENSIONS = ("laptop", "internet")
+_YES_NO_ALIASES = {
+    "no": "No", "false": "No", "0": "No",
+    "sí": "Sí", "si": "Sí", "true": "Sí", "1": "Sí",
+}
+
+# En riesgo = nivel Alto o Medio (mismo criterio que summaryStats)
+_AT_RISK_LEVELS = (RISK_LEVELS.index("Alto"), RISK_LEVELS.index("Medio"))
+
+
+def _with_unknown(labels):
+    """Etiquetas con UNKNOWN al final (si no está) y su índice"""
+    labels = list(labels)
+    if UNKNOWN not in labels:
+        labels.append(UNKNOWN)
+    return labels, labels.index(UNKNOWN)
+
+
+class CohortCube:
+    """
+    Cubo denso de medidas por combinación de dimensiones
+    """
+
+    def __init__(self, labels, cells, measures):
+        """
+        Args:
+            labels: dict dimensión -> lista de etiquetas (índice = posición en el eje)
+            cells: Índice de celda (plano) de cada estudiante
+            measures: Matriz (n_students, len(MEASURES)) de aportes por estudiante
+        """
+        self.labels = {dim: list(labels[dim]) for dim in DIMENSIONS}
+        self._index = {dim: {label: i for i, label in enumerate(self.labels[dim])} for dim in DIMENSIONS}
+
+        size = int(np.prod(self.shape))
+        self.cube = np.stack(
+            [np.bincount(cells, weights=measures[:, m], minlength=size) for m in range(len(MEASURES))]
+        ).reshape((len(MEASURES),) + self.shape)
+
+    @property
+    def shape(self):
+        return tuple(len(self.labels[dim]) for dim in DIMENSIONS)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Construye el cubo desde un RosterFrame (vectorizado)"""
+        n = frame.n_students
+
+        quintil = np.where((frame.quintil >= 1) & (frame.quintil <= 5), frame.quintil - 1, 5)
+        levels = list(EDUCATION_LEVEL_GRADES)
+        grado_level = np.array(
+            [levels.index(education_level(g)) if education_level(g) else len(levels) for g in frame.grado_labels]
+            or [len(levels)],
+            dtype=np.int64,
+        )
+        generos, genero_unknown = _with_unknown(frame.genero_labels)
+        parents, parent_unknown = _with_unknown(frame.parent_education_labels)
+
+        labels = {
+            "quintil": ["1", "2", "3", "4", "5", UNKNOWN],
+            "grado": list(frame.grado_labels) or [UNKNOWN],
+            "nivel_educativo": levels + [UNKNOWN],
+            "genero": generos,
+            "laptop": _YES_NO + [UNKNOWN],
+            "internet": _YES_NO + [UNKNOWN],
+            "parent_education": parents,
+        }
+        codes = [
+            quintil,
+            np.maximum(frame.grado, 0),
+            grado_level[np.maximum(frame.grado, 0)] if n else np.zeros(0, dtype=np.int64),
+            np.where(frame.genero >= 0, frame.genero, genero_unknown),
+            np.where(frame.has_socio, frame.laptop.astype(np.int64), 2),
+            np.where(frame.has_socio, frame.internet.astype(np.int64), 2),
+            np.where(frame.parent_education >= 0, frame.parent_education, parent_unknown),
+        ]
+        shape = tuple(len(labels[dim]) for dim in DIMENSIONS)
+        cells = np.ravel_multi_index(codes, shape) if n else np.zeros(0, dtype=np.int64)
+
+        has_gpa = frame.has_promedio
+        measures = np.column_stack(
+            [
+                np.ones(n),
+                np.isin(frame.risk_level, _AT_RISK_LEVELS).astype(np.float64),
+                (frame.risk_level == RISK_LEVELS.index("Alto")).astype(np.float64),
+                has_gpa.astype(np.float64),
+                np.where(has_gpa, frame.promedio, 0.0),
+            ]
+        ) if n else np.zeros((0, len(MEASURES)))
+
+        return cls(labels, cells, measures)
+
+    def _filter_labels(self, dim, values):
+        """
+        Etiquetas del eje de una dimensión para los valores de un filtro
+
+        Raises:
+            ValueError: si algún valor no es una etiqueta del eje
+        """
+        labels = []
+        invalid = []
+        for value in values:
+            if dim in YES_NO_DIMENSIONS:
+                value = _YES_NO_ALIASES.get(str(value).strip().casefold(), value)
+            if value in self._index[dim]:
+                labels.append(value)
+            else:
+                invalid.append(str(value))
+        if invalid:
+            raise ValueError(
+                f"Valores desconocidos para {dim}: {', '.join(invalid)}. "
+                f"Valores válidos: {', '.join(self.labels[dim])}"
+            )
+        return labels
+
+    def query(self, group_by=(), filters=None):
+        """
+        Medidas agrupadas por un subconjunto de dimensiones
+
+        Args:
+            group_by: Dimensiones de agrupación (en orden)
+            filters: dict dimensión -> lista de etiquetas permitidas
+
+        Returns:
+            Lista de celdas no vacías con las etiquetas y las medidas
+
+        Raises:
+            ValueError: si una dimensión no existe o está repetida, o si un
+                filtro usa una etiqueta que no existe en su dimensión
+        """
+        filters = filters or {}
+        unknown = [dim for dim in list(group_by) + list(filters) if dim not in DIMENSIONS]
+        if unknown:
+            raise ValueError(
+                f"Dimensiones desconocidas: {', '.join(unknown)}. Dimensiones válidas: {', '.join(DIMENSIONS)}"
+            )
+        if len(set(group_by)) != len(group_by):
+            raise ValueError("Dimensiones de agrupación repetidas en group_by")
+
+        filter_labels = {dim: self._filter_labels(dim, values) for dim, values in filters.items()}
+        selectors = []
+        for dim in DIMENSIONS:
+            if dim in filter_labels:
+                selectors.append([self._index[dim][label] for label in filter_labels[dim]])
+            else:
+                selectors.append(list(range(len(self.labels[dim]))))
+
+        # Recorte del cubo (ejes de medidas + dimensiones) y suma de los ejes no agrupados
+        sliced = self.cube[np.ix_(range(len(MEASURES)), *selectors)]
+
+        group_axes = [DIMENSIONS.index(dim) for dim in group_by]
+        other_axes = tuple(axis + 1 for axis in range(len(DIMENSIONS)) if axis not in group_axes)
+        totals = sliced.sum(axis=other_axes)
+        # Ejes restantes en el orden de DIMENSIONS; reordenar según group_by
+        remaining = sorted(group_axes)
+        totals = np.moveaxis(totals, [1 + remaining.index(a) for a in group_axes], range(1, len(group_axes) + 1))
+
+        result = []
+        for index in zip(*np.nonzero(totals[0] > 0)) if group_axes else [()]:
+            students, at_risk, high_risk, gpa_count, gpa_sum = (float(totals[(m,) + index]) for m in range(len(MEASURES)))
+            if not students:
+                continue
+            cell = {
+                dim: self.labels[dim][selectors[DIMENSIONS.index(dim)][i]]
+                for dim, i in zip(group_by, index)
+            }
+            cell.update(
+                {
+                    "students": int(round(students)),
+                    "atRisk": int(round(at_risk)),
+                    "highRisk": int(round(high_risk)),
+                    "riskRate": round(at_risk / students, 4),
+                    "gpaMean": round(gpa_sum / gpa_count, 2) if gpa_count else None,
+                }
+            )
+            result.append(cell)
+
+        return result
+
+
+def get_cohort_cube(snapshot):
+    """Cubo de cohortes del snapshot (se construye una vez por versión)"""
+    return snapshot.derived("cohort_cube", lambda s: CohortCube.from_frame(get_roster_frame(s)))
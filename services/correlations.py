@@ -0,0 +1,248 @@
+"""
+Matrices de correlación sobre el padrón
+
+Las columnas numéricas por estudiante (promedio, quintil, riesgo, apoyo
+familiar, ...), las features numéricas del FeatureStore y la nota media por
+materia se reúnen una vez por versión del snapshot en una matriz
+(estudiantes x columnas) con NaN para los datos faltantes. Las correlaciones se
+calculan para todas las columnas a la vez con productos de matrices sobre los
+pares completos. Spearman rankea dentro de los pares completos de cada par de
+columnas (no sobre todos los valores de cada columna, que en notas por materia
+y apoyo familiar son mayormente NaN): para cada columna se rankean a la vez
+sus pares contra todas las demás. Cada método se calcula una vez por versión y
+las consultas solo recortan la matriz.
+"""
+import numpy as np
+from services.feature_store import get_feature_store
+from services.roster_frame import get_roster_frame
+import logging
+
+logger = logging.getLogger(__name__)
+
+METHODS = ("pearson", "spearman")
+
+# Prefijo de las columnas de nota media por materia
+SUBJECT_PREFIX = "nota:"
+
+# Mínimo de pares completos para reportar un coeficiente
+MIN_PAIRS = 3
+
+
+def average_ranks(X):
+    """
+    Rangos promedio (empates) de cada columna, ignorando NaN
+
+    Args:
+        X: Matriz (n, k) con NaN en los datos faltantes
+
+    Returns:
+        Matriz (n, k) de rangos (1..n_validos) con NaN donde X es NaN
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, k = X.shape
+    if not n:
+        return X.copy()
+
+    # NaN queda al final de cada columna ordenada
+    order = np.argsort(X, axis=0, kind="stable")
+    ordered = np.take_along_axis(X, order, axis=0)
+    position = np.arange(n)[:, None]
+
+    # Inicio y fin de cada bloque de valores iguales
+    starts = np.ones((n, k), dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ends = np.ones((n, k), dtype=bool)
+    ends[:-1] = starts[1:]
+    first = np.maximum.accumulate(np.where(starts, position, 0), axis=0)
+    last = np.minimum.accumulate(np.where(ends, position, n - 1)[::-1], axis=0)[::-1]
+
+    ranks = np.empty((n, k))
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=0)
+    ranks[np.isnan(X)] = np.nan
+    return ranks
+
+
+def _paired_pearson(A, B):
+    """Pearson columna a columna entre A y B (mismo patrón de NaN), con NaN si no es calculable"""
+    valid = ~np.isnan(A)
+    pairs = valid.sum(axis=0)
+    a = np.where(valid, A, 0.0)
+    b = np.where(valid, B, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = np.where(valid, a - a.sum(axis=0) / pairs, 0.0)
+        b = np.where(valid, b - b.sum(axis=0) / pairs, 0.0)
+        variance = (a * a).sum(axis=0) * (b * b).sum(axis=0)
+        r = (a * b).sum(axis=0) / np.sqrt(variance)
+    return np.where((pairs >= MIN_PAIRS) & (variance > 0), np.clip(r, -1.0, 1.0), np.nan)
+
+
+def spearman_matrix(X):
+    """
+    Spearman entre todas las columnas rankeando dentro de los pares completos de cada par
+
+    Returns:
+        tuple: (matriz de coeficientes con NaN si no es calculable, matriz de
+        pares completos)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    k = X.shape[1]
+    valid = ~np.isnan(X)
+    r = np.full((k, k), np.nan)
+    for i in range(k):
+        # Columna i contra las columnas j >= i: ambas restringidas a las filas completas de cada par
+        both = valid[:, i:] & valid[:, i:i + 1]
+        first = average_ranks(np.where(both, X[:, i:i + 1], np.nan))
+        second = average_ranks(np.where(both, X[:, i:], np.nan))
+        r[i, i:] = r[i:, i] = _paired_pearson(first, second)
+    pairs = valid.T.astype(np.int64) @ valid.astype(np.int64)
+    return r, pairs
+
+
+def correlation_matrix(X, method="pearson"):
+    """
+    Correlación entre todas las columnas usando los pares completos de cada par
+
+    Returns:
+        tuple: (matriz de coeficientes con NaN si no es calculable, matriz de
+        pares completos)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    X = np.asarray(X, dtype=np.float64)
+    if method == "spearman":
+        return spearman_matrix(X)
+
+    valid = (~np.isnan(X)).astype(np.float64)
+    values = np.where(np.isnan(X), 0.0, X)
+
+    # Sumas restringidas a los pares completos de cada (i, j)
+    pairs = valid.T @ valid
+    sum_x = values.T @ valid
+    sum_xx = (values * values).T @ valid
+    sum_xy = values.T @ values
+
+    covariance = pairs * sum_xy - sum_x * sum_x.T
+    variance = (pairs * sum_xx - sum_x * sum_x) * (pairs * sum_xx - sum_x * sum_x).T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = covariance / np.sqrt(variance)
+    r = np.where((pairs >= MIN_PAIRS) & (variance > 0), np.clip(r, -1.0, 1.0), np.nan)
+    return r, pairs.astype(np.int64)
+
+
+class CorrelationFrame:
+    """
+    Columnas numéricas por estudiante y sus correlaciones por método
+    """
+
+    def __init__(self, names, X):
+        self.names = list(names)
+        self.X = X
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._matrices = {}
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def matrix(self, method):
+        """Matriz completa (coeficientes, pares) del método (se calcula una vez)"""
+        if method not in self._matrices:
+            self._matrices[method] = correlation_matrix(self.X, method)
+        return self._matrices[method]
+
+    def select(self, features, method):
+        """
+        Submatriz de un subconjunto de columnas
+
+        Raises:
+            ValueError: si alguna columna no existe
+        """
+        unknown = [name for name in features if name not in self._index]
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(unknown)}")
+        index = [self._index[name] for name in features]
+        r, pairs = self.matrix(method)
+        return r[np.ix_(index, index)], pairs[np.ix_(index, index)]
+
+    def coefficient(self, first, second, method):
+        """Coeficiente entre dos columnas (None si no existe o no es calculable)"""
+        if first not in self._index or second not in self._index:
+            return None
+        r, _ = self.matrix(method)
+        value = r[self._index[first], self._index[second]]
+        return None if np.isnan(value) else float(value)
+
+
+def _subject_grades(frame):
+    """Nota media por (estudiante, materia académica) con un bincount sobre la tabla de notas"""
+    labels, codes = frame.subject_codes()
+    kept = codes >= 0
+    cells = frame.record_student[kept] * len(labels) + codes[kept]
+    size = frame.n_students * len(labels)
+    sums = np.bincount(cells, weights=frame.record_nota[kept], minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return labels, means.reshape(frame.n_students, len(labels))
+
+
+def _store_columns(student_ids, taken):
+    """Features numéricas del FeatureStore alineadas con student_ids (NaN si falta el estudiante)"""
+    store = get_feature_store()
+    if store is None:
+        return [], []
+
+    positions = {student_id: i for i, student_id in enumerate(store.ids)}
+    rows = np.array([positions.get(student_id, -1) for student_id in student_ids], dtype=np.int64)
+    found = rows >= 0
+    names, columns = [], []
+    for feature, column in store.columns().items():
+        if feature in taken or column.dtype == object:
+            continue
+        values = np.full(len(student_ids), np.nan)
+        values[found] = np.asarray(column, dtype=np.float64)[rows[found]]
+        names.append(feature)
+        columns.append(values)
+    return names, columns
+
+
+def build_correlation_frame(snapshot):
+    """
+    Reúne las columnas numéricas del padrón, del FeatureStore y de notas por materia
+
+    Args:
+        snapshot: RosterSnapshot
+
+    Returns:
+        CorrelationFrame
+    """
+    frame = get_roster_frame(snapshot)
+    socio = np.where(frame.has_socio, 1.0, np.nan)
+
+    roster = {
+        "promedio": frame.promedio,
+        "quintil": np.where(frame.quintil > 0, frame.quintil, np.nan),
+        "edad": np.where(frame.edad > 0, frame.edad, np.nan),
+        "risk_score": frame.risk_score,
+        "laptop": frame.laptop * socio,
+        "internet": frame.internet * socio,
+        "apoyo_familiar": frame.family_support,
+        "barriers": np.where(frame.barriers >= 0, frame.barriers, np.nan),
+    }
+    names = list(roster)
+    columns = list(roster.values())
+
+    store_names, store_columns = _store_columns(frame.student_ids, set(names))
+    names += store_names
+    columns += store_columns
+
+    subjects, grades = _subject_grades(frame)
+    names += [SUBJECT_PREFIX + subject for subject in subjects]
+
+    X = np.column_stack(columns + [grades]) if frame.n_students else np.zeros((0, len(names)))
+    logger.info(f"Correlation frame built: {X.shape[0]} students x {X.shape[1]} columns")
+    return CorrelationFrame(names, X)
+
+
+def get_correlation_frame(snapshot):
+    """Columnas de correlación del snapshot (se construyen una vez por versión)"""
+    return snapshot.derived("correlation_frame", build_correlation_frame)
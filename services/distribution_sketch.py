@@ -0,0 +1,122 @@
+"""
+Resumen de distribuciones de tamaño fijo
+
+Un HistogramSketch acumula valores en un número fijo de bins sobre un rango
+conocido (p. ej. notas 0-10) junto con count, suma, suma de cuadrados, mínimo y
+máximo. Es mergeable (dos sketches del mismo rango se suman bin a bin), se
+construye con un bincount en O(n) sin ordenar, y de él se obtienen cuantiles
+aproximados (error máximo de un ancho de bin) y la densidad para violin plots.
+El tamaño del resumen depende solo del número de bins, no de la matrícula.
+"""
+import numpy as np
+
+
+class HistogramSketch:
+    """
+    Histograma de bins fijos con momentos exactos y cuantiles aproximados
+    """
+
+    def __init__(self, lo, hi, bins):
+        if hi <= lo:
+            raise ValueError("hi must be greater than lo")
+        if bins < 1:
+            raise ValueError("bins must be positive")
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = int(bins)
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def of(cls, values, lo, hi, bins):
+        """Sketch de un array de valores"""
+        sketch = cls(lo, hi, bins)
+        sketch.add(values)
+        return sketch
+
+    @property
+    def edges(self):
+        return np.linspace(self.lo, self.hi, self.bins + 1)
+
+    def add(self, values):
+        """Agrega valores (los que caen fuera del rango van al bin del extremo)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        width = (self.hi - self.lo) / self.bins
+        index = np.clip(((values - self.lo) / width).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        """Suma otro sketch con el mismo rango y número de bins"""
+        if (self.lo, self.hi, self.bins) != (other.lo, other.hi, other.bins):
+            raise ValueError("Cannot merge sketches with different bins")
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantiles(self, qs):
+        """
+        Cuantiles aproximados por interpolación lineal dentro del bin
+
+        Returns:
+            array con un valor por cuantil (NaN si el sketch está vacío)
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+
+        cumulative = np.cumsum(self.counts)
+        target = qs * self.count
+        # Primer bin cuya cuenta acumulada alcanza el objetivo
+        index = np.minimum(np.searchsorted(cumulative, target, side="left"), self.bins - 1)
+        before = np.where(index > 0, cumulative[index - 1], 0)
+        in_bin = self.counts[index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(in_bin > 0, (target - before) / np.maximum(in_bin, 1), 0.0)
+
+        edges = self.edges
+        values = edges[index] + np.clip(fraction, 0.0, 1.0) * (edges[index + 1] - edges[index])
+        return np.clip(values, self.min, self.max)
+
+    def summary(self):
+        """
+        Estadísticas de resumen de tamaño fijo (mismas claves que el resumen
+        exacto, con la densidad por bin en lugar de los valores individuales)
+        """
+        if not self.count:
+            return None
+
+        mean = self.total / self.count
+        variance = max(self.total_sq / self.count - mean * mean, 0.0)
+        q1, median, q3 = self.quantiles([0.25, 0.5, 0.75])
+        return {
+            "min": self.min,
+            "max": self.max,
+            "mean": mean,
+            "median": float(median),
+            "std": float(np.sqrt(variance)),
+            "q1": float(q1),
+            "q3": float(q3),
+            "count": int(self.count),
+            "density": {
+                "binEdges": np.round(self.edges, 4).tolist(),
+                "counts": self.counts.tolist(),
+            },
+        }
@@ -0,0 +1,297 @@
+"""
+Almacén columnar de features por estudiante
+
+Materializa los registros de features (analysis/features.py) en un directorio
+con un archivo .npy por columna, que se abre con memory-map, y un index.json con
+el orden de los IDs, los vocabularios de las columnas categóricas y un hash de
+contenido por estudiante. Cada refresh reconstruye solo los estudiantes cuyos
+insumos cambiaron y reutiliza el resto, de modo que entrenamiento e inferencia
+leen exactamente las mismas features con búsquedas O(1) por estudiante.
+
+Estructura del directorio:
+    index.json          # generación activa, ids, hashes, vocabularios
+    gen-000003/<feature>.npy
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from config import get_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+STORE_FORMAT_VERSION = 1
+
+
+def content_hash(inputs):
+    """Hash estable de los insumos de un registro de features"""
+    payload = json.dumps(inputs, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _column_kind(values):
+    """Determina el tipo de almacenamiento de una columna"""
+    if any(isinstance(v, str) for v in values):
+        return "category"
+    if all(isinstance(v, (bool, int, np.integer)) for v in values):
+        return "int"
+    return "float"
+
+
+class FeatureStore:
+    """
+    Features por estudiante en formato columnar con memory-map
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Directorio del almacén (se crea al primer refresh)
+        """
+        self.directory = directory
+        self.ids = []
+        self.feature_order = []
+        self.features_version = None
+        self.built_at = None
+        self._hashes = {}
+        self._positions = {}
+        self._columns = {}
+        self._vocabularies = {}
+        self._generation = 0
+        self._index_mtime = None
+        self.load()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, student_id):
+        return student_id in self._positions
+
+    def load(self):
+        """
+        Carga (o recarga) el índice y abre las columnas con memory-map
+
+        Returns:
+            bool: True si había un almacén para cargar
+        """
+        if not os.path.exists(self.index_path):
+            return False
+
+        mtime = os.path.getmtime(self.index_path)
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+        if index.get("format_version") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature store format: {index.get('format_version')}")
+
+        data_dir = os.path.join(self.directory, index["data_dir"])
+        self._columns = {
+            feature: np.load(os.path.join(data_dir, f"{feature}.npy"), mmap_mode="r")
+            for feature in index["feature_order"]
+        }
+        self.ids = index["ids"]
+        self.feature_order = index["feature_order"]
+        self.features_version = index.get("features_version")
+        self.built_at = index.get("built_at")
+        self._hashes = index["hashes"]
+        self._vocabularies = index["vocabularies"]
+        self._generation = index["generation"]
+        self._positions = {student_id: i for i, student_id in enumerate(self.ids)}
+        self._index_mtime = mtime
+        return True
+
+    def is_stale(self):
+        """Indica si otro proceso actualizó el almacén desde la última carga"""
+        try:
+            return os.path.getmtime(self.index_path) != self._index_mtime
+        except OSError:
+            return False
+
+    def _value(self, feature, position):
+        """Valor de una feature para una fila, con categorías decodificadas"""
+        value = self._columns[feature][position]
+        vocabulary = self._vocabularies.get(feature)
+        if vocabulary is not None:
+            return vocabulary[int(value)]
+        return value.item()
+
+    def get(self, student_id):
+        """
+        Obtiene el registro de features de un estudiante
+
+        Returns:
+            dict {feature: valor} o None si el estudiante no está en el almacén
+        """
+        position = self._positions.get(student_id)
+        if position is None:
+            return None
+        return {feature: self._value(feature, position) for feature in self.feature_order}
+
+    def get_many(self, student_ids):
+        """Registros de varios estudiantes (None para los que no existen)"""
+        return [self.get(student_id) for student_id in student_ids]
+
+    def columns(self):
+        """
+        Todas las columnas en el orden de self.ids
+
+        Returns:
+            dict {feature: np.ndarray}; las categóricas como arrays de objetos
+        """
+        result = {}
+        for feature in self.feature_order:
+            column = self._columns[feature]
+            vocabulary = self._vocabularies.get(feature)
+            if vocabulary is not None:
+                result[feature] = np.asarray(vocabulary, dtype=object)[np.asarray(column)]
+            else:
+                result[feature] = np.asarray(column)
+        return result
+
+    def refresh(self, inputs, build_fn, features_version=None, batch=False):
+        """
+        Actualiza el almacén reconstruyendo solo las filas cuyos insumos cambiaron
+
+        Args:
+            inputs: Iterable de (student_id, insumos serializables a JSON)
+            build_fn: Función insumos -> registro (dict) o None para omitirlo
+            features_version: Versión de build_fn; si difiere de la almacenada
+                se reconstruyen todas las filas
+            batch: Si es True, build_fn recibe la lista de insumos a reconstruir
+                y retorna la lista de registros (construcción por columnas)
+
+        Returns:
+            dict con estadísticas: total, rebuilt, reused, skipped, removed
+        """
+        rebuild_all = features_version != self.features_version
+        entries, pending, hashes = [], [], {}
+        stats = {"total": 0, "rebuilt": 0, "reused": 0, "skipped": 0, "removed": 0}
+
+        for student_id, data in inputs:
+            digest = content_hash(data)
+            hashes[student_id] = digest
+            stats["total"] += 1
+
+            if not rebuild_all and self._hashes.get(student_id) == digest:
+                stats["reused"] += 1
+                entries.append((student_id, self.get(student_id)))
+            else:
+                stats["rebuilt"] += 1
+                entries.append((student_id, len(pending)))
+                pending.append(data)
+
+        built = build_fn(pending) if batch else [build_fn(data) for data in pending]
+
+        ids, rows = [], []
+        for student_id, row in entries:
+            if isinstance(row, int):
+                row = built[row]
+            if row is None:
+                # Omitido (sin cambios y previamente omitido, o reconstruido sin registro)
+                stats["skipped"] += 1
+                continue
+            ids.append(student_id)
+            rows.append(row)
+
+        stats["removed"] = len(set(self._hashes) - set(hashes))
+
+        if stats["rebuilt"] or stats["removed"] or rebuild_all:
+            self._write(ids, rows, hashes, features_version)
+
+        logger.info(
+            f"Feature store refreshed: {stats['rebuilt']} rebuilt, {stats['reused']} reused, "
+            f"{stats['skipped']} skipped, {stats['removed']} removed"
+        )
+        return stats
+
+    def _write(self, ids, rows, hashes, features_version):
+        """Escribe una nueva generación de columnas y publica el índice"""
+        feature_order = list(rows[0].keys()) if rows else []
+        for student_id, row in zip(ids, rows):
+            if list(row.keys()) != feature_order:
+                raise ValueError(f"Feature record for {student_id} has a different schema")
+
+        generation = self._generation + 1
+        data_dir_name = f"gen-{generation:06d}"
+        data_dir = os.path.join(self.directory, data_dir_name)
+        os.makedirs(data_dir, exist_ok=True)
+
+        vocabularies = {}
+        for feature in feature_order:
+            values = [row[feature] for row in rows]
+            kind = _column_kind(values)
+
+            if kind == "category":
+                vocabulary = sorted({str(v) for v in values})
+                codes = {value: code for code, value in enumerate(vocabulary)}
+                column = np.fromiter((codes[str(v)] for v in values), dtype=np.int32, count=len(values))
+                vocabularies[feature] = vocabulary
+            elif kind == "int":
+                column = np.asarray(values, dtype=np.int64)
+            else:
+                column = np.asarray(values, dtype=np.float64)
+
+            np.save(os.path.join(data_dir, f"{feature}.npy"), column)
+
+        index = {
+            "format_version": STORE_FORMAT_VERSION,
+            "features_version": features_version,
+            "generation": generation,
+            "data_dir": data_dir_name,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "feature_order": feature_order,
+            "vocabularies": vocabularies,
+            "ids": ids,
+            "hashes": hashes,
+        }
+
+        # El índice se reemplaza de forma atómica: los lectores ven la
+        # generación anterior completa o la nueva completa
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+        self.load()
+        self._remove_old_generations(data_dir_name)
+
+    def _remove_old_generations(self, current):
+        """Elimina directorios de generaciones anteriores"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("gen-") and name != current and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store():
+    """
+    Retorna el almacén configurado en FEATURE_STORE_PATH
+
+    Se recarga automáticamente cuando otro proceso (por ejemplo, el
+    entrenamiento) publica una nueva generación.
+
+    Returns:
+        FeatureStore o None si todavía no fue construido
+    """
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = FeatureStore(get_config().FEATURE_STORE_PATH)
+        elif _store.is_stale():
+            _store.load()
+
+    return _store if len(_store) else None
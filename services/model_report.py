@@ -0,0 +1,380 @@
+"""
+Registro en memoria de los artefactos del modelo comprehensivo
+
+/model-comparison y /feature-importance leían y parseaban
+comprehensive_model_report.json (y best_model.joblib) en cada petición y
+volvían a construir los payloads de los gráficos. El registro parsea cada
+artefacto una sola vez, precalcula los payloads y solo vuelve a leer el
+archivo cuando cambia su mtime; si el contenido (hash) es el mismo, conserva
+los payloads ya calculados. En el camino caliente solo hay un os.stat.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import numpy as np
+from config import get_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_model_comparison(report):
+    """
+    Payload de /model-comparison (Chart.js) a partir del reporte de entrenamiento
+    """
+    models = report.get('all_models', [])
+    
+    # Prepare Chart.js data for model comparison
+    model_names = [m['model'] for m in models]
+    
+    response = {
+        # ROC-AUC comparison (bar chart)
+        "rocAucComparison": {
+            "labels": model_names,
+            "datasets": [{
+                "label": "ROC-AUC",
+                "data": [round(m['roc_auc'], 3) for m in models],
+                "backgroundColor": [
+                    "rgba(75, 192, 192, 0.6)" if m['model'] == report['best_model']['name'] 
+                    else "rgba(54, 162, 235, 0.6)" 
+                    for m in models
+                ],
+                "borderColor": [
+                    "rgba(75, 192, 192, 1)" if m['model'] == report['best_model']['name'] 
+                    else "rgba(54, 162, 235, 1)" 
+                    for m in models
+                ],
+                "borderWidth": 1
+            }]
+        },
+        
+        # CV Score comparison (bar chart with error bars)
+        "cvScoreComparison": {
+            "labels": model_names,
+            "datasets": [{
+                "label": "CV Score (Mean)",
+                "data": [round(m['cv_mean'], 3) for m in models],
+                "error": [round(m['cv_std'], 3) for m in models],
+                "backgroundColor": "rgba(153, 102, 255, 0.6)",
+                "borderColor": "rgba(153, 102, 255, 1)",
+                "borderWidth": 1
+            }]
+        },
+        
+        # Recall vs Precision (scatter plot)
+        "recallVsPrecision": {
+            "datasets": [{
+                "label": "Models",
+                "data": [
+                    {"x": round(m['recall'] * 100, 1), "y": round(m['precision'] * 100, 1), "label": m['model']}
+                    for m in models
+                ],
+                "backgroundColor": [
+                    "rgba(255, 99, 132, 0.8)" if m['model'] == report['best_model']['name'] 
+                    else "rgba(54, 162, 235, 0.6)" 
+                    for m in models
+                ],
+                "pointRadius": 10
+            }]
+        },
+        
+        # Missed students comparison (bar chart - lower is better)
+        "missedStudentsComparison": {
+            "labels": model_names,
+            "datasets": [{
+                "label": "Estudiantes En Riesgo No Detectados",
+                "data": [m['missed_at_risk'] for m in models],
+                "backgroundColor": "rgba(255, 99, 132, 0.6)",
+                "borderColor": "rgba(255, 99, 132, 1)",
+                "borderWidth": 1
+            }]
+        },
+        
+        # Best model summary
+        "bestModel": {
+            "name": report['best_model']['name'],
+            "metrics": {
+                "rocAuc": round(report['best_model']['roc_auc'], 3),
+                "recall": round(report['best_model']['recall'] * 100, 1),
+                "precision": round(report['best_model']['precision'] * 100, 1),
+                "cvMean": round(report['best_model']['cv_mean'], 3),
+                "cvStd": round(report['best_model']['cv_std'], 3),
+                "missedAtRisk": report['best_model']['missed_at_risk'],
+                "falseAlarms": report['best_model']['false_alarms']
+            }
+        },
+        
+        # Threshold optimization data
+        "thresholdOptimization": {
+            "labels": [f"{t['threshold']:.2f}" for t in report.get('threshold_optimization', [])],
+            "datasets": [
+                {
+                    "label": "Recall (%)",
+                    "data": [round(t['recall'] * 100, 1) for t in report.get('threshold_optimization', [])],
+                    "borderColor": "rgba(75, 192, 192, 1)",
+                    "backgroundColor": "rgba(75, 192, 192, 0.2)",
+                    "fill": False,
+                    "yAxisID": "y"
+                },
+                {
+                    "label": "Estudiantes Perdidos",
+                    "data": [t['missed'] for t in report.get('threshold_optimization', [])],
+                    "borderColor": "rgba(255, 99, 132, 1)",
+                    "backgroundColor": "rgba(255, 99, 132, 0.2)",
+                    "fill": False,
+                    "yAxisID": "y1"
+                }
+            ]
+        },
+        
+        # Dataset info
+        "datasetInfo": {
+            "totalStudents": report['dataset']['total_students'],
+            "atRiskCount": report['dataset']['at_risk_count'],
+            "atRiskPercentage": round(report['dataset']['at_risk_percentage'], 1),
+            "totalFeatures": report['features']['total'],
+            "categoricalFeatures": report['features']['categorical'],
+            "numericFeatures": report['features']['numeric']
+        }
+    }
+
+    return response
+
+
+def _mean_abs(feature_data, predicate):
+    """Media de |coeficiente| de las características que cumplen el predicado"""
+    values = [abs(c) for f, c in feature_data if predicate(f)]
+    return round(float(np.mean(values)), 3) if values else 0.0
+
+
+def build_feature_importance(features, coefficients):
+    """
+    Payload de /feature-importance a partir de los coeficientes del modelo
+    """
+    coefficients = [float(c) for c in coefficients]
+    
+    # Sort by absolute importance
+    feature_data = sorted(
+        zip(features, coefficients),
+        key=lambda x: abs(x[1]),
+        reverse=True
+    )
+    
+    # Top 20 features for chart
+    top_20 = feature_data[:20]
+    
+    response = {
+        # Bar chart of top 20 features
+        "topFeatures": {
+            "labels": [f[0] for f in top_20],
+            "datasets": [{
+                "label": "Coeficiente (+ aumenta riesgo, - reduce riesgo)",
+                "data": [round(f[1], 3) for f in top_20],
+                "backgroundColor": [
+                    "rgba(255, 99, 132, 0.6)" if f[1] > 0 else "rgba(75, 192, 192, 0.6)"
+                    for f in top_20
+                ],
+                "borderColor": [
+                    "rgba(255, 99, 132, 1)" if f[1] > 0 else "rgba(75, 192, 192, 1)"
+                    for f in top_20
+                ],
+                "borderWidth": 1
+            }]
+        },
+        
+        # All features with details
+        "allFeatures": [
+            {
+                "rank": i + 1,
+                "feature": f[0],
+                "coefficient": round(f[1], 4),
+                "impact": "Aumenta riesgo" if f[1] > 0 else "Reduce riesgo",
+                "absImportance": round(abs(f[1]), 4)
+            }
+            for i, f in enumerate(feature_data)
+        ],
+        
+        # Feature categories
+        "featuresByCategory": {
+            "education": {
+                "features": ["nivel_educativo", "age_grade_status"],
+                "avgImportance": _mean_abs(feature_data, lambda f: f in ["nivel_educativo", "age_grade_status"])
+            },
+            "technology": {
+                "features": ["tiene_laptop", "tiene_computadora", "tiene_internet", "tech_score"],
+                "avgImportance": _mean_abs(feature_data, lambda f: "laptop" in f or "comput" in f or "internet" in f or "tech" in f)
+            },
+            "family": {
+                "features": ["relacion", "estado_civil", "edad_representante", "nivel_instruccion_num"],
+                "avgImportance": _mean_abs(feature_data, lambda f: f in ["relacion", "estado_civil", "edad_representante", "nivel_instruccion_num"])
+            },
+            "economic": {
+                "features": ["quintil", "asset_score", "num_vehiculos"],
+                "avgImportance": _mean_abs(feature_data, lambda f: f in ["quintil", "asset_score", "num_vehiculos"])
+            }
+        },
+        
+        # Laptop specific analysis
+        "laptopAnalysis": {
+            "coefficient": round(dict(feature_data).get("tiene_laptop", 0), 4),
+            "rank": next((i+1 for i, f in enumerate(feature_data) if f[0] == "tiene_laptop"), None),
+            "interpretation": "Coeficiente positivo indica que tener laptop se asocia con MAYOR riesgo académico. Esto es probablemente porque estudiantes en niveles educativos superiores (que tienen curricula más difícil) tienden a tener más laptops."
+        }
+    }
+
+    return response
+
+
+class ModelReport:
+    """
+    Reporte de entrenamiento parseado con el payload de comparación precalculado
+    """
+
+    def __init__(self, data, digest):
+        self.digest = digest
+        self.timestamp = data.get("timestamp")
+        self.best_model = data["best_model"]
+        self.models = data.get("all_models", [])
+        self.features = list(data["features"]["all_features"])
+        self.dataset = data["dataset"]
+        self.comparison = build_model_comparison(data)
+
+
+def _file_signature(path):
+    """(mtime_ns, tamaño) del archivo o None si no existe"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _TrackedArtifact:
+    """
+    Artefacto parseado que se vuelve a leer solo si cambia su mtime o tamaño;
+    si el hash del contenido no cambió se conserva el valor parseado
+    """
+
+    def __init__(self, path, parser):
+        self.path = path
+        self._parser = parser
+        self._signature = None
+        self.digest = None
+        self.value = None
+
+    def refresh(self):
+        """Actualiza el artefacto si cambió en disco y retorna su valor (o None)"""
+        signature = _file_signature(self.path)
+        if signature is None:
+            self._signature = self.digest = self.value = None
+            return None
+        if signature == self._signature:
+            return self.value
+
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()[:16]
+        self._signature = signature
+
+        if digest != self.digest:
+            try:
+                self.value = self._parser(raw, digest)
+                self.digest = digest
+                logger.info(f"Model artifact {self.path} loaded ({digest})")
+            except Exception as e:
+                logger.error(f"Error parsing model artifact {self.path}: {str(e)}")
+                self.value = self.digest = None
+        return self.value
+
+
+def _parse_report(raw, digest):
+    return ModelReport(json.loads(raw.decode("utf-8")), digest)
+
+
+def _parse_joblib_coefficients(raw, digest):
+    import joblib
+
+    return np.asarray(joblib.load(io.BytesIO(raw)).coef_[0], dtype=np.float64)
+
+
+class ModelReportRegistry:
+    """
+    Reporte del modelo y payloads de gráficos en memoria, sensibles al mtime
+    """
+
+    def __init__(self, report_path, model_path=None):
+        """
+        Args:
+            report_path: comprehensive_model_report.json
+            model_path: best_model.joblib (coeficientes si no hay scorer NumPy)
+        """
+        self._report = _TrackedArtifact(report_path, _parse_report)
+        self._model = _TrackedArtifact(model_path, _parse_joblib_coefficients) if model_path else None
+        self._importance_key = None
+        self._importance = None
+        self._lock = threading.Lock()
+
+    def report(self):
+        """ModelReport vigente o None si no existe"""
+        with self._lock:
+            return self._report.refresh()
+
+    def model_comparison(self):
+        """Payload de /model-comparison o None si no hay reporte"""
+        report = self.report()
+        return report.comparison if report is not None else None
+
+    def feature_importance(self, scorer=None):
+        """
+        Payload de /feature-importance
+
+        Args:
+            scorer: LogisticScorer (si es None se usan best_model.joblib y el reporte)
+
+        Returns:
+            dict o None si no hay artefactos del modelo
+        """
+        with self._lock:
+            if scorer is not None:
+                key = ("scorer", id(scorer))
+            else:
+                report = self._report.refresh()
+                coefficients = self._model.refresh() if self._model is not None else None
+                if report is None or coefficients is None:
+                    return None
+                key = ("joblib", report.digest, self._model.digest)
+
+            if key != self._importance_key:
+                if scorer is not None:
+                    self._importance = build_feature_importance(scorer.feature_order, scorer.coef)
+                else:
+                    self._importance = build_feature_importance(report.features, coefficients)
+                self._importance_key = key
+
+            return self._importance
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_report_registry():
+    """
+    Retorna el registro de artefactos usando MODEL_REPORT_PATH
+
+    El modelo joblib de respaldo se busca junto al reporte (best_model.joblib).
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                report_path = get_config().MODEL_REPORT_PATH
+                _registry = ModelReportRegistry(
+                    report_path,
+                    os.path.join(os.path.dirname(report_path), "best_model.joblib"),
+                )
+
+    return _registry
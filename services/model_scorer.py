@@ -0,0 +1,195 @@
+"""
+Scorer de Regresión Logística en NumPy puro
+
+El mejor modelo del entrenamiento comprehensivo es una Regresión Logística:
+coeficientes, intercepto y los vocabularios de los LabelEncoder. El paso de
+exportación de analysis/train_comprehensive_model.py guarda esos valores en un
+artefacto compacto (.npz + .json) y este módulo los carga para calcular las
+probabilidades con un único producto matriz-vector, sin importar sklearn ni
+joblib en el worker de la API.
+"""
+import json
+import os
+import threading
+import numpy as np
+from config import get_config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCORER_FORMAT_VERSION = 1
+
+# Valor usado en el entrenamiento para categorías faltantes
+UNKNOWN_CATEGORY = "Desconocido"
+
+
+def _metadata_path(npz_path):
+    """Ruta del archivo JSON que acompaña al .npz"""
+    return os.path.splitext(npz_path)[0] + ".json"
+
+
+def save_logistic_scorer(
+    npz_path, coef, intercept, feature_order, vocabularies, metadata=None
+):
+    """
+    Guarda un modelo logístico como artefacto NumPy + JSON
+
+    Args:
+        npz_path: Ruta del archivo .npz (el .json se guarda al lado)
+        coef: Coeficientes en el orden de feature_order
+        intercept: Intercepto del modelo
+        feature_order: Lista de nombres de features en el orden de entrenamiento
+        vocabularies: {columna categórica: lista de clases del LabelEncoder}
+        metadata: Información adicional (nombre del modelo, fecha, etc.)
+    """
+    coef = np.asarray(coef, dtype=np.float64).ravel()
+    if len(coef) != len(feature_order):
+        raise ValueError(
+            f"coef has {len(coef)} values but there are {len(feature_order)} features"
+        )
+
+    np.savez(
+        npz_path,
+        coef=coef,
+        intercept=np.asarray(intercept, dtype=np.float64).ravel()[:1],
+    )
+
+    with open(_metadata_path(npz_path), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format_version": SCORER_FORMAT_VERSION,
+                "feature_order": list(feature_order),
+                "vocabularies": {k: [str(v) for v in vals] for k, vals in vocabularies.items()},
+                "metadata": metadata or {},
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+
+
+class LogisticScorer:
+    """
+    Calcula probabilidades de riesgo a partir de coeficientes exportados
+    """
+
+    def __init__(self, coef, intercept, feature_order, vocabularies, metadata=None):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.feature_order = list(feature_order)
+        self.vocabularies = vocabularies
+        self.metadata = metadata or {}
+
+        # Lookup categoría -> código (mismo orden que LabelEncoder.classes_)
+        self._codes = {
+            col: {value: code for code, value in enumerate(values)}
+            for col, values in vocabularies.items()
+        }
+
+    @classmethod
+    def load(cls, npz_path):
+        """
+        Carga un artefacto guardado con save_logistic_scorer
+
+        Args:
+            npz_path: Ruta del archivo .npz
+        """
+        with open(_metadata_path(npz_path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("format_version") != SCORER_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scorer format: {meta.get('format_version')}")
+
+        with np.load(npz_path) as arrays:
+            coef = arrays["coef"]
+            intercept = arrays["intercept"][0]
+
+        return cls(
+            coef,
+            intercept,
+            meta["feature_order"],
+            meta["vocabularies"],
+            meta.get("metadata"),
+        )
+
+    @property
+    def name(self):
+        """Nombre del modelo exportado"""
+        return self.metadata.get("model_name", "Logistic_Regression")
+
+    def encode(self, records):
+        """
+        Convierte registros de features en la matriz de diseño del modelo
+
+        Las columnas categóricas se codifican con el vocabulario del entrenamiento;
+        una categoría no vista se trata como "Desconocido" (o el código 0 si el
+        vocabulario no lo incluye).
+
+        Args:
+            records: Lista de diccionarios {feature: valor}
+
+        Returns:
+            np.ndarray de forma (n_registros, n_features)
+        """
+        X = np.empty((len(records), len(self.feature_order)), dtype=np.float64)
+
+        for j, feature in enumerate(self.feature_order):
+            codes = self._codes.get(feature)
+            if codes is None:
+                X[:, j] = [float(r.get(feature) or 0) for r in records]
+            else:
+                fallback = codes.get(UNKNOWN_CATEGORY, 0)
+                X[:, j] = [codes.get(str(r.get(feature)), fallback) for r in records]
+
+        return X
+
+    def decision_function(self, X):
+        """Logit del modelo para cada fila de X"""
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_proba(self, X):
+        """
+        Probabilidades por clase, con la misma forma que sklearn: (n, 2)
+        """
+        z = self.decision_function(X)
+        # sigmoid(z) = exp(-log(1 + exp(-z))), estable para |z| grandes
+        positive = np.exp(-np.logaddexp(0.0, -z))
+        return np.column_stack([1.0 - positive, positive])
+
+    def score_records(self, records):
+        """Probabilidad de riesgo para cada registro de features"""
+        if not records:
+            return np.empty(0, dtype=np.float64)
+        return self.predict_proba(self.encode(records))[:, 1]
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_model_scorer():
+    """
+    Retorna el scorer configurado en MODEL_SCORER_PATH (carga perezosa)
+
+    Returns:
+        LogisticScorer o None si el artefacto no existe o no se puede cargar
+    """
+    global _scorer
+
+    if _scorer is not None:
+        return _scorer
+
+    with _scorer_lock:
+        if _scorer is None:
+            path = get_config().MODEL_SCORER_PATH
+            if not os.path.exists(path):
+                logger.info(f"Model scorer artifact not found at {path}")
+                return None
+            try:
+                _scorer = LogisticScorer.load(path)
+                logger.info(f"Model scorer loaded from {path}")
+            except Exception as e:
+                logger.error(f"Error loading model scorer from {path}: {str(e)}")
+                return None
+
+    return _scorer
@@ -0,0 +1,374 @@
+"""
+Tabla de puntos de operación del clasificador de riesgo
+
+A partir de las probabilidades de un conjunto de prueba se construye, con un solo
+ordenamiento y sumas acumuladas, la tabla densa (threshold, TP, FP, FN, TN,
+recall, precision) para cada probabilidad distinta. La tabla se guarda junto al
+modelo y en la API permite elegir el umbral de alerta en tiempo de ejecución
+("threshold = 0.3", "recall >= 0.9", "precision >= 0.5") con búsqueda binaria,
+sin reentrenar ni volver a evaluar el modelo. El umbral de F1 máximo y el de
+costo mínimo (un estudiante en riesgo no detectado cuesta cost_ratio falsas
+alarmas) son exactos sobre todas las probabilidades y salen de un argmin
+vectorizado sobre la tabla.
+
+Convención: un estudiante genera alerta si probabilidad >= threshold.
+
+El umbral de alerta vigente (AlertThreshold) es una configuración del tablero
+institucional: define la matriz de confusión y las métricas esperadas que
+muestra la API, pero no cambia /predict, /batch-predict ni el pipeline de
+scoring, que siguen entregando la probabilidad y el nivel de riesgo del modelo.
+"""
+import json
+import os
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLE_COLUMNS = ("threshold", "tp", "fp", "fn", "tn", "recall", "precision")
+
+
+def build_operating_points(y_true, y_prob):
+    """
+    Construye la tabla densa de puntos de operación
+
+    Args:
+        y_true: Etiquetas reales (0/1)
+        y_prob: Probabilidad predicha de la clase positiva
+
+    Returns:
+        dict de arrays (TABLE_COLUMNS) ordenados por threshold ascendente
+    """
+    y_true = np.asarray(y_true, dtype=np.int64).ravel()
+    y_prob = np.asarray(y_prob, dtype=np.float64).ravel()
+    if y_true.shape != y_prob.shape:
+        raise ValueError("y_true and y_prob must have the same length")
+
+    # Orden descendente: al bajar el umbral se van sumando positivos predichos
+    order = np.argsort(-y_prob, kind="mergesort")
+    probs = y_prob[order]
+    labels = y_true[order]
+
+    tp_cum = np.cumsum(labels)
+    fp_cum = np.cumsum(1 - labels)
+
+    # Último índice de cada probabilidad distinta (todos los empates entran juntos)
+    last = np.r_[np.flatnonzero(np.diff(probs)), len(probs) - 1] if len(probs) else np.array([], dtype=np.int64)
+
+    positives = int(labels.sum())
+    negatives = int(len(labels) - positives)
+
+    tp = tp_cum[last][::-1]
+    fp = fp_cum[last][::-1]
+    predicted = tp + fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recall = np.where(positives > 0, tp / max(positives, 1), 0.0)
+        precision = np.where(predicted > 0, tp / np.maximum(predicted, 1), 0.0)
+
+    return {
+        "threshold": probs[last][::-1],
+        "tp": tp,
+        "fp": fp,
+        "fn": positives - tp,
+        "tn": negatives - fp,
+        "recall": recall,
+        "precision": precision,
+    }
+
+
+def roc_auc_from_points(points):
+    """ROC-AUC (regla del trapecio) a partir de la tabla de puntos de operación"""
+    positives = points["tp"][0] + points["fn"][0] if len(points["tp"]) else 0
+    negatives = points["fp"][0] + points["tn"][0] if len(points["fp"]) else 0
+    if not positives or not negatives:
+        return None
+
+    # De umbral alto a bajo, con el origen (0, 0)
+    tpr = np.r_[0.0, points["tp"][::-1] / positives]
+    fpr = np.r_[0.0, points["fp"][::-1] / negatives]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def save_operating_points(path, y_true, y_prob, metadata=None):
+    """
+    Calcula y guarda la tabla de puntos de operación en JSON (formato columnar)
+
+    Returns:
+        OperatingPoints
+    """
+    points = build_operating_points(y_true, y_prob)
+    table = OperatingPoints(points, {
+        **(metadata or {}),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "roc_auc": roc_auc_from_points(points),
+    })
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(table.to_dict(), f)
+
+    return table
+
+
+class OperatingPoints:
+    """
+    Tabla de puntos de operación con búsquedas binarias por umbral o métrica
+    """
+
+    def __init__(self, points, metadata=None):
+        self.threshold = np.asarray(points["threshold"], dtype=np.float64)
+        self.tp = np.asarray(points["tp"], dtype=np.int64)
+        self.fp = np.asarray(points["fp"], dtype=np.int64)
+        self.fn = np.asarray(points["fn"], dtype=np.int64)
+        self.tn = np.asarray(points["tn"], dtype=np.int64)
+        self.recall = np.asarray(points["recall"], dtype=np.float64)
+        self.precision = np.asarray(points["precision"], dtype=np.float64)
+        self.metadata = metadata or {}
+
+        # Máximo acumulado de precision: permite buscar "precision >= p" en O(log n)
+        self._precision_prefix_max = np.maximum.accumulate(self.precision) if len(self) else self.precision
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.f1 = np.where(
+                self.precision + self.recall > 0,
+                2 * self.precision * self.recall / (self.precision + self.recall),
+                0.0,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Carga una tabla guardada con save_operating_points"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["points"], data.get("metadata"))
+
+    def __len__(self):
+        return len(self.threshold)
+
+    def to_dict(self):
+        return {
+            "metadata": self.metadata,
+            "points": {column: getattr(self, column).tolist() for column in TABLE_COLUMNS},
+        }
+
+    def point(self, index):
+        """Punto de operación en una posición de la tabla"""
+        tp, fp = int(self.tp[index]), int(self.fp[index])
+        fn, tn = int(self.fn[index]), int(self.tn[index])
+        total = tp + fp + fn + tn
+        precision = float(self.precision[index])
+        recall = float(self.recall[index])
+        # El umbral va exacto: es el valor que se aplica como umbral de alerta y
+        # redondearlo podría dejar fuera la probabilidad que define el punto
+        return {
+            "threshold": float(self.threshold[index]),
+            "recall": round(recall, 4),
+            "precision": round(precision, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+            "accuracy": round((tp + tn) / total, 4) if total else 0.0,
+            "tp": tp,
+            "fp": fp,
+            "fn": fn,
+            "tn": tn,
+        }
+
+    def at_threshold(self, threshold):
+        """
+        Punto de operación para un umbral arbitrario
+
+        Las predicciones con threshold t son las mismas que con la menor
+        probabilidad distinta >= t.
+        """
+        if not len(self):
+            return None
+
+        index = int(np.searchsorted(self.threshold, threshold, side="left"))
+        if index >= len(self):
+            # Ningún estudiante alcanza el umbral
+            positives = int(self.tp[0] + self.fn[0])
+            negatives = int(self.fp[0] + self.tn[0])
+            return {
+                "threshold": float(threshold), "recall": 0.0, "precision": 0.0,
+                "f1": 0.0, "accuracy": round(negatives / (positives + negatives), 4) if positives + negatives else 0.0,
+                "tp": 0, "fp": 0, "fn": positives, "tn": negatives,
+            }
+
+        point = self.point(index)
+        point["threshold"] = float(threshold)
+        return point
+
+    def for_min_recall(self, min_recall):
+        """
+        Umbral más alto (menos falsas alarmas) con recall >= min_recall
+
+        Returns:
+            dict con el punto de operación o None si no es alcanzable
+        """
+        # recall es no creciente con el umbral: -recall es no decreciente
+        index = int(np.searchsorted(-self.recall, -float(min_recall), side="right")) - 1
+        return self.point(index) if index >= 0 else None
+
+    def for_min_precision(self, min_precision):
+        """
+        Umbral más bajo (mayor recall) con precision >= min_precision
+
+        Returns:
+            dict con el punto de operación o None si no es alcanzable
+        """
+        index = int(np.searchsorted(self._precision_prefix_max, float(min_precision), side="left"))
+        return self.point(index) if index < len(self) else None
+
+    def _last_best(self, values):
+        """Posición del umbral más alto (menos alertas) entre los empates del mínimo"""
+        return int(np.flatnonzero(values <= values.min() + 1e-12)[-1])
+
+    def _no_alert_point(self):
+        """Punto "no alertar a nadie": umbral apenas por encima de la mayor probabilidad"""
+        return self.at_threshold(float(np.nextafter(self.threshold[-1], np.inf)))
+
+    def for_max_f1(self):
+        """
+        Umbral con F1 máximo (None si la tabla está vacía)
+
+        Si ningún umbral de la tabla tiene F1 > 0, el óptimo es no alertar a nadie.
+        """
+        if not len(self):
+            return None
+        index = self._last_best(-self.f1)
+        if self.f1[index] <= 0:
+            return self._no_alert_point()
+        return self.point(index)
+
+    def expected_cost(self, cost_ratio):
+        """Costo de cada umbral: cost_ratio * FN + FP (en unidades de falsa alarma)"""
+        return float(cost_ratio) * self.fn + self.fp
+
+    def for_min_cost(self, cost_ratio):
+        """
+        Umbral de costo mínimo cuando un estudiante en riesgo no detectado
+        cuesta cost_ratio falsas alarmas
+
+        Los candidatos son todas las probabilidades de la tabla más el punto
+        "no alertar a nadie" (FN = todos los positivos, FP = 0), que gana los
+        empates por generar menos alertas.
+
+        Returns:
+            dict con el punto de operación y su costo (None si la tabla está vacía)
+        """
+        if not len(self):
+            return None
+        cost = self.expected_cost(cost_ratio)
+        index = self._last_best(cost)
+        no_alert_cost = float(cost_ratio) * int(self.tp[0] + self.fn[0])
+        if no_alert_cost <= cost[index] + 1e-12:
+            point = self._no_alert_point()
+            point["cost"] = round(no_alert_cost, 4)
+            return point
+        point = self.point(index)
+        point["cost"] = round(float(cost[index]), 4)
+        return point
+
+    def select(self, threshold=None, min_recall=None, min_precision=None, cost_ratio=None):
+        """Resuelve una política de umbral (exactamente uno de los argumentos)"""
+        given = [v is not None for v in (threshold, min_recall, min_precision, cost_ratio)]
+        if sum(given) != 1:
+            raise ValueError("Specify exactly one of threshold, min_recall, min_precision or cost_ratio")
+
+        if threshold is not None:
+            return self.at_threshold(threshold)
+        if min_recall is not None:
+            return self.for_min_recall(min_recall)
+        if cost_ratio is not None:
+            return self.for_min_cost(cost_ratio)
+        return self.for_min_precision(min_precision)
+
+
+class AlertThreshold:
+    """
+    Umbral de alerta vigente en la API (modificable en tiempo de ejecución)
+
+    Solo lo usa el tablero institucional (matriz de confusión y métricas
+    esperadas); no se aplica a las predicciones.
+    """
+
+    def __init__(self, table_path, default_threshold=0.5):
+        self._table_path = table_path
+        self._table = None
+        self._table_mtime = None
+        self._lock = threading.Lock()
+        self._policy = {"threshold": float(default_threshold)}
+        self._threshold = float(default_threshold)
+
+    def table(self):
+        """Tabla de puntos de operación (se recarga si el archivo cambió)"""
+        try:
+            mtime = os.path.getmtime(self._table_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            if self._table is None or mtime != self._table_mtime:
+                try:
+                    self._table = OperatingPoints.load(self._table_path)
+                    self._table_mtime = mtime
+                except Exception as e:
+                    logger.error(f"Error loading operating points from {self._table_path}: {str(e)}")
+                    return None
+            return self._table
+
+    @property
+    def threshold(self):
+        with self._lock:
+            return self._threshold
+
+    def current(self):
+        """Política vigente y su punto de operación"""
+        table = self.table()
+        with self._lock:
+            threshold = self._threshold
+            policy = dict(self._policy)
+        return {
+            "threshold": threshold,
+            "policy": policy,
+            "operatingPoint": table.at_threshold(threshold) if table is not None else None,
+        }
+
+    def update(self, threshold=None, min_recall=None, min_precision=None, cost_ratio=None):
+        """
+        Cambia el umbral de alerta
+
+        Raises:
+            ValueError: si la política es inválida o no es alcanzable
+            LookupError: si la política requiere la tabla y no está disponible
+        """
+        table = self.table()
+
+        if threshold is not None and table is None:
+            point = None
+        else:
+            if table is None:
+                raise LookupError("Operating points table not available")
+            point = table.select(threshold, min_recall, min_precision, cost_ratio)
+            if point is None:
+                raise ValueError("No threshold satisfies the requested policy")
+
+        new_threshold = float(threshold) if threshold is not None else point["threshold"]
+        policy = {
+            key: value
+            for key, value in (
+                ("threshold", threshold),
+                ("min_recall", min_recall),
+                ("min_precision", min_precision),
+                ("cost_ratio", cost_ratio),
+            )
+            if value is not None
+        }
+
+        with self._lock:
+            self._threshold = new_threshold
+            self._policy = policy
+
+        logger.info(f"Alert threshold set to {new_threshold:.4f} ({policy})")
+        return self.current()
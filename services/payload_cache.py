@@ -0,0 +1,200 @@
+"""
+Caché stale-while-revalidate de payloads de gráficos
+
+Cada payload se guarda por (endpoint, parámetros) junto con la versión de los
+datos con que se construyó. Una petición:
+- Con la entrada vigente (más nueva que el TTL y de la versión actual de los
+  datos) la sirve directamente.
+- Con la entrada vencida pero dentro de la antigüedad máxima la sirve de
+  inmediato y lanza una sola reconstrucción en segundo plano.
+- Sin entrada (o demasiado antigua) la construye en la petición; las peticiones
+  concurrentes de la misma clave esperan esa misma construcción.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from config import get_config
+from services.roster_snapshot import current_roster_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """Payload construido con su versión de datos y métricas"""
+
+    def __init__(self, payload, version, build_seconds):
+        self.payload = payload
+        self.version = version
+        self.build_seconds = build_seconds
+        self.built_at = time.monotonic()
+        self.built_at_iso = datetime.now(timezone.utc).isoformat()
+        self.hits = 0
+
+
+class PayloadCache:
+    """
+    Caché de payloads con revalidación en segundo plano y single-flight
+    """
+
+    def __init__(self, ttl_seconds=60, max_stale_seconds=3600, version_lookup=None, max_workers=2):
+        """
+        Args:
+            ttl_seconds: Antigüedad a partir de la cual una entrada se revalida
+            max_stale_seconds: Antigüedad máxima para servir una entrada vencida
+            version_lookup: Función sin argumentos que retorna la versión actual
+                de los datos sin hacer I/O (None si no se conoce)
+            max_workers: Hilos para reconstrucciones en segundo plano
+        """
+        self._ttl = max(0.0, float(ttl_seconds))
+        self._max_stale = max(self._ttl, float(max_stale_seconds))
+        self._version_lookup = version_lookup
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="payload-cache")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    @staticmethod
+    def _key(endpoint, params):
+        return endpoint, tuple(sorted((params or {}).items()))
+
+    def get(self, endpoint, params, builder):
+        """
+        Payload de un endpoint
+
+        Args:
+            endpoint: Nombre del endpoint
+            params: dict de parámetros que cambian el payload
+            builder: Función sin argumentos que retorna (payload, versión de datos)
+
+        Returns:
+            payload (las excepciones de builder se propagan si no hay entrada servible)
+        """
+        key = self._key(endpoint, params)
+        current_version = self._version_lookup() if self._version_lookup else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.built_at
+                outdated = current_version is not None and entry.version != current_version
+                if age < self._ttl and not outdated:
+                    entry.hits += 1
+                    self._stats["hits"] += 1
+                    return entry.payload
+                if age < self._max_stale:
+                    entry.hits += 1
+                    self._stats["stale_hits"] += 1
+                    self._refresh_locked(key, builder)
+                    return entry.payload
+
+            self._stats["misses"] += 1
+            future, owner = self._claim_locked(key)
+
+        if owner:
+            self._run(key, builder, future)
+        return future.result()
+
+    def _claim_locked(self, key):
+        """Future de la construcción en curso de key (owner=True si hay que lanzarla)"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = self._inflight[key] = Future()
+        return future, True
+
+    def _refresh_locked(self, key, builder):
+        """Lanza una reconstrucción en segundo plano si no hay una en curso"""
+        future, owner = self._claim_locked(key)
+        if owner:
+            self._stats["refreshes"] += 1
+            self._executor.submit(self._run, key, builder, future)
+
+    def _run(self, key, builder, future):
+        """Construye el payload, actualiza la entrada y resuelve el future"""
+        started = time.perf_counter()
+        try:
+            payload, version = builder()
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                self._inflight.pop(key, None)
+            logger.error(f"Error building payload for {key[0]}: {str(e)}")
+            future.set_exception(e)
+            return
+
+        entry = _Entry(payload, version, time.perf_counter() - started)
+        with self._lock:
+            self._entries[key] = entry
+            self._inflight.pop(key, None)
+        future.set_result(payload)
+
+    def inspect(self):
+        """Estado de las entradas y contadores"""
+        now = time.monotonic()
+        current_version = self._version_lookup() if self._version_lookup else None
+        with self._lock:
+            entries = [
+                {
+                    "endpoint": endpoint,
+                    "params": dict(params),
+                    "dataVersion": entry.version,
+                    "builtAt": entry.built_at_iso,
+                    "ageSeconds": round(now - entry.built_at, 3),
+                    "stale": (now - entry.built_at) >= self._ttl
+                    or (current_version is not None and entry.version != current_version),
+                    "buildMs": round(entry.build_seconds * 1000, 3),
+                    "hits": entry.hits,
+                    "refreshing": (endpoint, params) in self._inflight,
+                }
+                for (endpoint, params), entry in self._entries.items()
+            ]
+            stats = dict(self._stats)
+
+        return {
+            "ttlSeconds": self._ttl,
+            "maxStaleSeconds": self._max_stale,
+            "currentDataVersion": current_version,
+            "stats": stats,
+            "entries": sorted(entries, key=lambda e: (e["endpoint"], str(e["params"]))),
+        }
+
+    def purge(self, endpoint=None):
+        """
+        Elimina entradas (todas o las de un endpoint)
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key in self._entries if endpoint is None or key[0] == endpoint]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+
+_payload_cache = None
+_payload_cache_lock = threading.Lock()
+
+
+def get_payload_cache():
+    """
+    Retorna la caché de payloads (PAYLOAD_CACHE_TTL_SECONDS, PAYLOAD_CACHE_MAX_STALE_SECONDS)
+
+    La versión de los datos es la del snapshot del padrón ya cargado.
+    """
+    global _payload_cache
+
+    if _payload_cache is None:
+        with _payload_cache_lock:
+            if _payload_cache is None:
+                config = get_config()
+                _payload_cache = PayloadCache(
+                    ttl_seconds=config.PAYLOAD_CACHE_TTL_SECONDS,
+                    max_stale_seconds=config.PAYLOAD_CACHE_MAX_STALE_SECONDS,
+                    version_lookup=current_roster_version,
+                )
+
+    return _payload_cache
@@ -0,0 +1,107 @@
+"""
+Micro-batching de solicitudes de predicción
+
+Las llamadas concurrentes a /predict se agrupan durante una ventana de pocos
+milisegundos (o hasta completar un lote de N elementos) y se procesan juntas:
+una sola consulta de estudiantes, un solo cálculo de riesgo para el grupo y una
+sola inserción en la base de datos. Cada solicitud recibe luego su propio
+resultado a través de un Future.
+"""
+import threading
+import time
+from concurrent.futures import Future
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionBatcher:
+    """
+    Agrupa elementos enviados desde varios hilos y los procesa por lotes
+    """
+
+    def __init__(self, handler, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Args:
+            handler: Función que recibe una lista de elementos y retorna una
+                lista de resultados en el mismo orden
+            max_batch_size: Número máximo de elementos por lote
+            max_wait_ms: Tiempo máximo (ms) que espera el primer elemento de un
+                lote antes de procesarlo
+        """
+        self._handler = handler
+        self._max_batch_size = max(1, int(max_batch_size))
+        self._max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending = []  # [(item, future, enqueued_at)]
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def submit(self, item):
+        """
+        Encola un elemento para el próximo lote
+
+        Args:
+            item: Elemento a procesar (por ejemplo, un student_id)
+
+        Returns:
+            Future: Se resuelve con el resultado del elemento
+        """
+        future = Future()
+
+        with self._condition:
+            self._ensure_worker()
+            self._pending.append((item, future, time.monotonic()))
+            self._condition.notify()
+
+        return future
+
+    def _ensure_worker(self):
+        """Inicia el hilo consumidor si no está corriendo"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name="prediction-batcher", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self):
+        """Bucle principal: arma lotes y los entrega al handler"""
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+
+                # La ventana se cuenta desde la llegada del elemento más antiguo,
+                # de modo que ninguna solicitud espera más de max_wait
+                deadline = self._pending[0][2] + self._max_wait
+                while len(self._pending) < self._max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = self._pending[: self._max_batch_size]
+                del self._pending[: self._max_batch_size]
+
+            self._process(batch)
+
+    def _process(self, batch):
+        """Ejecuta el handler para un lote y reparte los resultados"""
+        items = [item for item, _, _ in batch]
+
+        try:
+            results = self._handler(items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"Batch handler returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            logger.error(f"Error processing prediction batch of {len(items)}: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        logger.debug(f"Processed prediction batch of {len(items)} items")
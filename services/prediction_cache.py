@@ -0,0 +1,100 @@
+"""
+Caché de la última predicción guardada por estudiante
+
+Permite a la capa de persistencia omitir (o convertir en un simple "heartbeat")
+las inserciones en risk_predictions cuando el score, el nivel, el quintil y la
+versión del modelo no cambiaron respecto a la última predicción almacenada.
+
+La caché es por proceso y no ve las escrituras de otros procesos (p. ej. el
+pipeline de scoring, services/scoring_pipeline.py, escribe la misma tabla).
+Por eso cada entrada vale solo ttl_seconds: pasado ese tiempo se vuelve a leer
+la última fila de latest_risk_predictions antes de decidir si una predicción
+cambió. Con el TTL por defecto (30 s) otro proceso puede haber escrito una
+predicción distinta dentro de esa ventana y la API omitiría una inserción que
+sí cambiaba la última fila; si hay varios escritores y eso importa, usar
+ttl_seconds=0 (releer siempre, sin aciertos de caché).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Campos que definen si una predicción aporta información nueva
+PREDICTION_KEY_FIELDS = (
+    "risk_score",
+    "risk_level",
+    "predicted_quintil",
+    "model_version",
+    "model_probability",
+)
+
+
+def prediction_key(row):
+    """
+    Construye la clave comparable de una predicción
+
+    El score se redondea a 2 decimales y la probabilidad a 4, igual que las
+    columnas NUMERIC(5,2) y NUMERIC(5,4).
+    """
+    score = row.get("risk_score")
+    quintil = row.get("predicted_quintil")
+    probability = row.get("model_probability")
+    return (
+        round(float(score), 2) if score is not None else None,
+        row.get("risk_level"),
+        int(quintil) if quintil is not None else None,
+        row.get("model_version"),
+        round(float(probability), 4) if probability is not None else None,
+    )
+
+
+class LastPredictionCache:
+    """
+    Caché LRU (thread-safe) de la última fila de risk_predictions por estudiante,
+    con vencimiento de ttl_seconds por entrada
+    """
+
+    def __init__(self, max_size=10000, ttl_seconds=30):
+        self._max_size = max(1, int(max_size))
+        self._ttl = max(0.0, float(ttl_seconds))
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fresh_row(self, student_id, now):
+        entry = self._rows.get(student_id)
+        if entry is None:
+            return None
+        row, stored_at = entry
+        if now - stored_at >= self._ttl:
+            del self._rows[student_id]
+            return None
+        self._rows.move_to_end(student_id)
+        return row
+
+    def get(self, student_id):
+        """Retorna la última predicción conocida (vigente) o None"""
+        with self._lock:
+            return self._fresh_row(student_id, time.monotonic())
+
+    def latest(self, student_ids):
+        """Retorna {student_id: fila} de los IDs con una entrada vigente"""
+        now = time.monotonic()
+        with self._lock:
+            rows = {sid: self._fresh_row(sid, now) for sid in student_ids}
+        return {sid: row for sid, row in rows.items() if row is not None}
+
+    def put(self, row):
+        """Registra una fila como la última predicción de su estudiante"""
+        student_id = row.get("student_id")
+        if student_id is None:
+            return
+
+        with self._lock:
+            self._rows[student_id] = (row, time.monotonic())
+            self._rows.move_to_end(student_id)
+            while len(self._rows) > self._max_size:
+                self._rows.popitem(last=False)
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._rows.clear()
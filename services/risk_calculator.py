@@ -297,6 +297,69 @@ class RiskCalculator:
 
         return barriers
 
+    @staticmethod
+    def predict_quintil_from_barriers(student_data):
+        """
+        Predice el quintil basándose en las barreras identificadas
+        (Simplificación - en producción se usaría el modelo CatBoost entrenado)
+
+        Args:
+            student_data: Datos del estudiante
+
+        Returns:
+            int: Quintil predicho (1-5)
+        """
+        socioeconomic = student_data.get("socioeconomic_data", [])
+
+        if not socioeconomic:
+            return 3  # Default: Q3 (Medio)
+
+        socio_data = socioeconomic[0] if socioeconomic else {}
+
+        # Contador de barreras presentes
+        barriers_count = 0
+
+        # Barreras tecnológicas
+        if not socio_data.get("laptop", False):
+            barriers_count += 1
+        if not socio_data.get("internet", False):
+            barriers_count += 1
+        if not socio_data.get("computadora", False):
+            barriers_count += 0.5
+
+        # Barreras educativas
+        nivel = socio_data.get("nivel_instruccion_rep", "").lower()
+        if "primaria" in nivel:
+            barriers_count += 1.5
+        elif "básica" in nivel:
+            barriers_count += 1
+
+        # Barreras culturales
+        if not socio_data.get("lectura_libros", False):
+            barriers_count += 0.5
+
+        # Barreras de salud
+        indice_salud = socio_data.get("indice_cobertura_salud", "").lower()
+        if "sin" in indice_salud:
+            barriers_count += 1
+
+        # Barreras de apoyo familiar
+        indice_apoyo = socio_data.get("indice_apoyo_familiar", "").lower()
+        if "bajo" in indice_apoyo:
+            barriers_count += 1
+
+        # Clasificación por número de barreras
+        if barriers_count >= 5:
+            return 1  # Q1 (Muy vulnerable)
+        elif barriers_count >= 3:
+            return 2  # Q2 (Vulnerable)
+        elif barriers_count >= 1.5:
+            return 3  # Q3 (Medio)
+        elif barriers_count >= 0.5:
+            return 4  # Q4 (Acomodado)
+        else:
+            return 5  # Q5 (Alto)
+
 
 # Instancia global
 risk_calculator = RiskCalculator()
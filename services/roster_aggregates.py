@@ -0,0 +1,246 @@
+"""
+Agregaciones institucionales sobre el padrón de estudiantes
+
+Sobre el padrón columnar (RosterFrame) se agrupa todo lo que consumen los
+gráficos institucionales (distribuciones por quintil y riesgo, GPA por laptop,
+por nivel de instrucción del representante y por quintil, y riesgo por nivel
+educativo). El resultado se guarda en el RosterSnapshot, de modo que se calcula
+una sola vez por versión de los datos.
+"""
+import numpy as np
+from services.roster_frame import QUINTIL_GROUPS, RISK_LEVELS, get_roster_frame, group_values
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Objetivo del modelo comprehensivo: alguna nota <= 7.5
+AT_RISK_GRADE = 7.5
+
+# Nivel educativo por grado (mismo criterio que analysis/features.py)
+EDUCATION_LEVEL_GRADES = {
+    "Basica_Elemental": ["1", "2", "3", "4"],
+    "Basica_Media": ["5", "6", "7"],
+    "Basica_Superior": ["8", "9", "10"],
+    "Bachillerato": ["1BGU", "2BGU", "3BGU"],
+}
+EDUCATION_LEVEL_LABELS = {
+    "Basica_Elemental": "1-4",
+    "Basica_Media": "5-7",
+    "Basica_Superior": "8-10",
+    "Bachillerato": "1BGU-3BGU",
+}
+_LEVEL_BY_GRADE = {
+    grade: level for level, grades in EDUCATION_LEVEL_GRADES.items() for grade in grades
+}
+
+
+# Etiquetas legibles de las características del modelo
+FEATURE_LABELS = {
+    "nivel_educativo": "Nivel Educativo",
+    "age_grade_status": "Edad vs Grado",
+    "indice_accesibilidad": "Accesibilidad",
+    "genero": "Género",
+    "quintil": "Quintil",
+    "grupo_socioeconomico": "Grupo Socioeconómico",
+    "tiene_diagnostico": "Diagnóstico",
+    "escuela_procedencia": "Escuela Procedencia",
+    "tipo_vivienda": "Tipo Vivienda",
+    "material_paredes": "Material Paredes",
+    "material_piso": "Material Piso",
+    "cuartos_bano": "Cuartos de Baño",
+    "tipo_sanitario": "Tipo Sanitario",
+    "tiene_internet": "Tiene Internet",
+    "tiene_computadora": "Tiene Computadora",
+    "tiene_laptop": "Tiene Laptop",
+    "num_celulares": "Núm. Celulares",
+    "tech_score": "Índice Tecnológico",
+    "tiene_telefono": "Tiene Teléfono",
+    "tiene_cocina": "Tiene Cocina",
+    "tiene_refrigeradora": "Tiene Refrigeradora",
+    "tiene_lavadora": "Tiene Lavadora",
+    "tiene_equipo_sonido": "Tiene Equipo Sonido",
+    "num_tv": "Núm. TV",
+    "num_vehiculos": "Núm. Vehículos",
+    "asset_score": "Índice de Bienes",
+    "usa_internet": "Usa Internet",
+    "usa_correo": "Usa Correo",
+    "usa_redes": "Usa Redes",
+    "digital_score": "Índice Digital",
+    "compra_ropa_centros": "Compra en Centros",
+    "lectura_libros": "Lectura de Libros",
+    "edad_representante": "Edad Representante",
+    "relacion": "Relación Representante",
+    "estado_civil": "Estado Civil",
+    "nivel_instruccion_num": "Instrucción Representante",
+    "tiene_seguro_salud": "Seguro de Salud",
+    "tiene_seguro_privado": "Seguro Privado",
+    "ocupacion_jefe": "Ocupación Jefe Hogar",
+    "num_subjects": "Núm. Materias",
+    "high_risk_subject_count": "Materias de Alto Riesgo",
+    "takes_lengua": "Toma Lengua y Lit.",
+    "takes_matematicas": "Toma Matemáticas",
+    "takes_ciencias": "Toma Ciencias",
+    "takes_sociales": "Toma Sociales",
+    "takes_ingles": "Toma Inglés",
+    "takes_fisica": "Toma Física",
+}
+
+# Categorías de barreras (radar chart) por característica del modelo
+BARRIER_CATEGORIES = {
+    "Salud": ["tiene_diagnostico", "tiene_seguro_salud", "tiene_seguro_privado"],
+    "Tecnología": [
+        "tiene_internet", "tiene_computadora", "tiene_laptop", "num_celulares", "tech_score",
+        "tiene_telefono", "usa_internet", "usa_correo", "usa_redes", "digital_score",
+    ],
+    "Educ. Familiar": [
+        "nivel_instruccion_num", "relacion", "estado_civil", "edad_representante", "ocupacion_jefe",
+    ],
+    "Cultural": ["lectura_libros", "compra_ropa_centros"],
+    "Socioeconómico": [
+        "quintil", "grupo_socioeconomico", "indice_accesibilidad", "tipo_vivienda",
+        "material_paredes", "material_piso", "cuartos_bano", "tipo_sanitario", "tiene_cocina",
+        "tiene_refrigeradora", "tiene_lavadora", "tiene_equipo_sonido", "num_tv",
+        "num_vehiculos", "asset_score",
+    ],
+}
+
+
+def education_level(grado):
+    """Nivel educativo de un grado (None si no se reconoce)"""
+    return _LEVEL_BY_GRADE.get(str(grado))
+
+
+def summary_stats(values):
+    """
+    Estadísticas de resumen (box plot) de una lista de valores
+
+    Returns:
+        dict con min, q1, median, q3, max, mean y count (None si está vacía)
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    if not len(arr):
+        return None
+    q1, median, q3 = np.percentile(arr, [25, 50, 75])
+    return {
+        "min": round(float(arr.min()), 2),
+        "q1": round(float(q1), 2),
+        "median": round(float(median), 2),
+        "q3": round(float(q3), 2),
+        "max": round(float(arr.max()), 2),
+        "mean": round(float(arr.mean()), 2),
+        "count": int(len(arr)),
+    }
+
+
+def aggregate_roster(snapshot):
+    """
+    Agrupa todos los indicadores institucionales sobre el padrón columnar
+
+    Args:
+        snapshot: RosterSnapshot
+
+    Returns:
+        dict con los grupos listos para construir los gráficos
+    """
+    frame = get_roster_frame(snapshot)
+    has_promedio = frame.has_promedio
+
+    quintil_counts = np.bincount(frame.quintil_group[frame.quintil_group >= 0], minlength=len(QUINTIL_GROUPS))
+    # Si el cálculo de riesgo falló se cuenta como Bajo
+    risk_codes = np.where(frame.risk_level >= 0, frame.risk_level, RISK_LEVELS.index("Bajo"))
+    risk_counts = np.bincount(risk_codes, minlength=len(RISK_LEVELS))
+
+    with_socio = has_promedio & frame.has_socio
+    parent_groups = group_values(
+        np.where(with_socio, frame.parent_education, -1), frame.promedio, len(frame.parent_education_labels)
+    )
+    quintil_groups = group_values(
+        np.where(has_promedio & (frame.quintil >= 1) & (frame.quintil <= 5), frame.quintil - 1, -1),
+        frame.promedio,
+        5,
+    )
+
+    # Riesgo por nivel educativo (objetivo del modelo: alguna nota <= 7.5)
+    level_names = list(EDUCATION_LEVEL_GRADES)
+    level_of_grado = np.array(
+        [level_names.index(education_level(g)) if education_level(g) else -1 for g in frame.grado_labels] or [-1],
+        dtype=np.int64,
+    )
+    level = np.where(frame.grado >= 0, level_of_grado[np.maximum(frame.grado, 0)], -1)
+    level = np.where(np.isnan(frame.min_nota), -1, level)
+    level_students = np.bincount(level[level >= 0], minlength=len(level_names))
+    at_risk = level[(level >= 0) & (frame.min_nota <= AT_RISK_GRADE)]
+    level_at_risk = np.bincount(at_risk, minlength=len(level_names))
+    level_ages = group_values(np.where(frame.edad > 0, level, -1), frame.edad, len(level_names))
+
+    return {
+        "version": snapshot.version,
+        "total_students": frame.n_students,
+        "average_grade": round(float(np.mean(frame.promedio[has_promedio])), 2) if has_promedio.any() else 0.0,
+        "quintil_distribution": {
+            group: int(count) for group, count in zip(QUINTIL_GROUPS, quintil_counts)
+        },
+        "risk_distribution": {level: int(count) for level, count in zip(RISK_LEVELS, risk_counts)},
+        "laptop": {
+            "withLaptop": summary_stats(frame.promedio[with_socio & frame.laptop]),
+            "withoutLaptop": summary_stats(frame.promedio[with_socio & ~frame.laptop]),
+        },
+        "parent_education": {
+            label: summary_stats(values)
+            for label, values in zip(frame.parent_education_labels, parent_groups)
+            if len(values)
+        },
+        "quintil_grades": {q + 1: summary_stats(values) for q, values in enumerate(quintil_groups)},
+        "education_levels": {
+            name: {
+                "students": int(level_students[i]),
+                "at_risk": int(level_at_risk[i]),
+                "age_range": (int(level_ages[i].min()), int(level_ages[i].max())) if len(level_ages[i]) else None,
+            }
+            for i, name in enumerate(level_names)
+        },
+    }
+
+
+def model_barriers(feature_order, coefficients, top=10):
+    """
+    Barreras predictivas a partir de los coeficientes del modelo
+
+    Args:
+        feature_order: Nombres de las características
+        coefficients: Coeficientes del modelo (mismo orden)
+        top: Número de barreras a retornar
+
+    Returns:
+        dict con top (feature, etiqueta, coeficiente) y el porcentaje de
+        importancia (|coef|) de cada categoría de barreras
+    """
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    magnitude = np.abs(coefficients)
+    total = float(magnitude.sum()) or 1.0
+    position = {feature: i for i, feature in enumerate(feature_order)}
+
+    ranked = np.argsort(-magnitude, kind="mergesort")[:top]
+    top_barriers = [
+        {
+            "feature": feature_order[i],
+            "label": f"{FEATURE_LABELS.get(feature_order[i], feature_order[i])} "
+                     f"({'+' if coefficients[i] > 0 else '-'})",
+            "coefficient": round(float(coefficients[i]), 3),
+        }
+        for i in ranked
+    ]
+
+    categories = {
+        category: round(
+            float(sum(magnitude[position[f]] for f in features if f in position)) / total * 100, 2
+        )
+        for category, features in BARRIER_CATEGORIES.items()
+    }
+
+    return {"top": top_barriers, "categories": categories}
+
+
+def get_roster_aggregates(snapshot):
+    """Agregaciones del snapshot (calculadas una vez por versión)"""
+    return snapshot.derived("roster_aggregates", aggregate_roster)
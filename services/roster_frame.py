@@ -0,0 +1,299 @@
+"""
+Padrón en formato columnar para agregaciones vectorizadas
+
+Los registros anidados del padrón (estudiante -> socioeconomic_data,
+academic_performance) se aplanan una sola vez por versión en arrays de NumPy:
+una fila por estudiante y una tabla aparte con una fila por nota. Las
+categorías (quintil, nivel de riesgo, grado, género, instrucción del
+representante, materia) se guardan como códigos enteros, de modo que cada
+agrupación de los endpoints institucionales es un bincount/argsort sobre
+arrays en lugar de un recorrido de diccionarios.
+"""
+import numpy as np
+from services.risk_calculator import risk_calculator
+from services.subject_taxonomy import subject_taxonomy
+import logging
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ("Alto", "Medio", "Bajo")
+
+# quintil_agrupado -> grupo (0: Q1-Q2, 1: Q3, 2: Q4-Q5, -1: sin dato)
+QUINTIL_GROUPS = ("Q1-Q2", "Q3", "Q4-Q5")
+
+
+def _quintil_group(value):
+    value = (value or "").lower()
+    if "bajo" in value:
+        return 0
+    if "medio" in value:
+        return 1
+    if "alto" in value or "acomodado" in value:
+        return 2
+    return -1
+
+
+def _first_socio(student):
+    socio = student.get("socioeconomic_data")
+    if isinstance(socio, list):
+        return socio[0] if socio else None
+    return socio or None
+
+
+# indice_apoyo_familiar -> valor ordinal (NaN sin dato)
+FAMILY_SUPPORT_LEVELS = {"Bajo": 0.0, "Medio": 1.0, "Alto": 2.0}
+
+# Barreras acumuladas (mismo criterio que /academic-insights)
+BARRIERS = (
+    "sin_laptop",
+    "sin_internet",
+    "sin_libros",
+    "sin_cobertura_salud",
+    "acceso_tecnologico_bajo",
+    "apoyo_familiar_bajo",
+)
+
+
+def barrier_flags(socio):
+    """Presencia de cada barrera de BARRIERS en los datos socioeconómicos"""
+    return (
+        not socio.get("laptop"),
+        not socio.get("internet"),
+        not socio.get("lectura_libros"),
+        socio.get("indice_cobertura_salud") == "Sin",
+        socio.get("indice_acceso_tecnologico") in ["Bajo", "Sin"],
+        socio.get("indice_apoyo_familiar") == "Bajo",
+    )
+
+
+_RISK_INDEX = {level: i for i, level in enumerate(RISK_LEVELS)}
+
+
+def student_row(student):
+    """
+    Valores de un estudiante para las columnas del RosterFrame
+
+    Las categorías se retornan como etiquetas (el frame las codifica). También
+    lo usan los índices que se actualizan estudiante por estudiante.
+    """
+    promedio = student.get("promedio_general")
+    row = {
+        "promedio": float(promedio) if promedio else np.nan,
+        "quintil": student.get("quintil") or 0,
+        "quintil_group": _quintil_group(student.get("quintil_agrupado")),
+        "grado": str(student.get("grado") or "Desconocido"),
+        "genero": student.get("genero"),
+        "edad": int(student.get("edad") or 0),
+        "risk_score": np.nan,
+        "risk_level": -1,
+        "has_socio": False,
+        "laptop": False,
+        "internet": False,
+        "parent_education": None,
+        "family_support": np.nan,
+        "barriers": -1,
+        "barrier_flags": (False,) * len(BARRIERS),
+        "min_nota": np.nan,
+    }
+
+    try:
+        risk_score, risk_level, _ = risk_calculator.calculate_risk_score(student)
+        row["risk_score"] = risk_score
+        row["risk_level"] = _RISK_INDEX.get(risk_level, -1)
+    except Exception as e:
+        logger.debug(f"Error calculating risk for student {student.get('id')}: {e}")
+
+    socio = _first_socio(student)
+    if socio:
+        row["has_socio"] = True
+        row["laptop"] = bool(socio.get("laptop"))
+        row["internet"] = bool(socio.get("internet"))
+        row["parent_education"] = socio.get("nivel_instruccion_rep") or None
+        row["family_support"] = FAMILY_SUPPORT_LEVELS.get(socio.get("indice_apoyo_familiar"), np.nan)
+        row["barrier_flags"] = barrier_flags(socio)
+        row["barriers"] = sum(row["barrier_flags"])
+
+    notas = [
+        float(r["nota"]) for r in student.get("academic_performance") or [] if r.get("nota") is not None
+    ]
+    if notas:
+        row["min_nota"] = min(notas)
+
+    return row
+
+
+class _Encoder:
+    """Asigna códigos enteros a categorías en orden de aparición"""
+
+    def __init__(self):
+        self.labels = []
+        self._codes = {}
+
+    def __call__(self, value):
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.labels)
+            self.labels.append(value)
+        return code
+
+
+def group_values(codes, values, n_groups):
+    """
+    Agrupa valores por código con un solo ordenamiento
+
+    Args:
+        codes: Código de grupo por fila (-1 = sin grupo)
+        values: Valor por fila
+        n_groups: Número de grupos
+
+    Returns:
+        Lista de arrays, uno por grupo (en el orden de los códigos)
+    """
+    codes = np.asarray(codes)
+    values = np.asarray(values)
+    keep = codes >= 0
+    codes, values = codes[keep], values[keep]
+    order = np.argsort(codes, kind="stable")
+    counts = np.bincount(codes, minlength=n_groups)[:n_groups]
+    return np.split(values[order], np.cumsum(counts)[:-1])
+
+
+def group_mean(codes, values, n_groups):
+    """
+    Conteo y media por grupo (bincount con pesos)
+
+    Returns:
+        tuple: (counts, means) con NaN en los grupos vacíos
+    """
+    codes = np.asarray(codes)
+    values = np.asarray(values, dtype=np.float64)
+    keep = codes >= 0
+    counts = np.bincount(codes[keep], minlength=n_groups)[:n_groups]
+    sums = np.bincount(codes[keep], weights=values[keep], minlength=n_groups)[:n_groups]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return counts, means
+
+
+class RosterFrame:
+    """
+    Padrón aplanado en columnas
+
+    Columnas por estudiante (longitud n_students, en el orden de student_ids):
+        promedio (NaN sin dato), quintil (0 sin dato), quintil_group,
+        risk_score (NaN si falló el cálculo), risk_level (índice de
+        RISK_LEVELS, -1 si falló), has_socio, laptop, internet, parent_education,
+        family_support (ordinal de FAMILY_SUPPORT_LEVELS, NaN sin dato),
+        barriers (-1 sin datos socioeconómicos), barrier_flags (n_students x
+        len(BARRIERS), False sin datos socioeconómicos), grado, genero, edad (0 sin
+        dato), min_nota (NaN sin notas)
+
+    Columnas por nota (longitud n_records):
+        record_student, record_subject, record_nota
+    """
+
+    def __init__(self, students):
+        n = len(students)
+        self.n_students = n
+        self.student_ids = [student.get("id") for student in students]
+
+        self.promedio = np.full(n, np.nan)
+        self.quintil = np.zeros(n, dtype=np.int64)
+        self.quintil_group = np.full(n, -1, dtype=np.int64)
+        self.risk_score = np.full(n, np.nan)
+        self.risk_level = np.full(n, -1, dtype=np.int64)
+        self.has_socio = np.zeros(n, dtype=bool)
+        self.laptop = np.zeros(n, dtype=bool)
+        self.internet = np.zeros(n, dtype=bool)
+        self.parent_education = np.full(n, -1, dtype=np.int64)
+        self.family_support = np.full(n, np.nan)
+        self.barriers = np.full(n, -1, dtype=np.int64)
+        self.barrier_flags = np.zeros((n, len(BARRIERS)), dtype=bool)
+        self.grado = np.full(n, -1, dtype=np.int64)
+        self.genero = np.full(n, -1, dtype=np.int64)
+        self.edad = np.zeros(n, dtype=np.int64)
+        self.min_nota = np.full(n, np.nan)
+
+        parent_education = _Encoder()
+        grados = _Encoder()
+        generos = _Encoder()
+        subjects = _Encoder()
+
+        record_student = []
+        record_subject = []
+        record_nota = []
+
+        # Único recorrido de los registros anidados
+        for i, student in enumerate(students):
+            row = student_row(student)
+            self.promedio[i] = row["promedio"]
+            self.quintil[i] = row["quintil"]
+            self.quintil_group[i] = row["quintil_group"]
+            self.grado[i] = grados(row["grado"])
+            self.genero[i] = generos(row["genero"])
+            self.edad[i] = row["edad"]
+            self.risk_score[i] = row["risk_score"]
+            self.risk_level[i] = row["risk_level"]
+            self.has_socio[i] = row["has_socio"]
+            self.laptop[i] = row["laptop"]
+            self.internet[i] = row["internet"]
+            self.parent_education[i] = parent_education(row["parent_education"])
+            self.family_support[i] = row["family_support"]
+            self.barriers[i] = row["barriers"]
+            self.barrier_flags[i] = row["barrier_flags"]
+            self.min_nota[i] = row["min_nota"]
+
+            for record in student.get("academic_performance") or []:
+                materia = record.get("materia")
+                nota = record.get("nota")
+                if materia and nota:
+                    record_student.append(i)
+                    record_subject.append(subjects(materia))
+                    record_nota.append(float(nota))
+
+        self.parent_education_labels = parent_education.labels
+        self.grado_labels = grados.labels
+        self.genero_labels = generos.labels
+        self.subject_labels = subjects.labels
+
+        self.record_student = np.asarray(record_student, dtype=np.int64)
+        self.record_subject = np.asarray(record_subject, dtype=np.int64)
+        self.record_nota = np.asarray(record_nota, dtype=np.float64)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.students)
+
+    @property
+    def has_promedio(self):
+        return ~np.isnan(self.promedio)
+
+    def subject_codes(self, academic_only=True):
+        """
+        Recodifica las materias de las notas con la taxonomía compartida
+
+        La taxonomía se consulta solo para el vocabulario (una vez por materia
+        distinta), no para cada nota.
+
+        Args:
+            academic_only: Descarta las clases de apoyo (código -1)
+
+        Returns:
+            tuple: (nombres canónicos, código por nota)
+        """
+        encoder = _Encoder()
+        remap = []
+        for label in self.subject_labels:
+            code = subject_taxonomy.code(label)
+            keep = subject_taxonomy.is_academic(code) if academic_only else code >= 0
+            remap.append(encoder(subject_taxonomy.name(code)) if keep else -1)
+        remap = np.array(remap, dtype=np.int64)
+        codes = remap[self.record_subject] if len(self.record_subject) else self.record_subject
+        return encoder.labels, codes
+
+
+def get_roster_frame(snapshot):
+    """Padrón columnar del snapshot (se construye una vez por versión)"""
+    return snapshot.derived("roster_frame", RosterFrame.from_snapshot)
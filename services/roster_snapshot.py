@@ -0,0 +1,142 @@
+"""
+Snapshot versionado del padrón de estudiantes
+
+Los endpoints institucionales necesitan el padrón completo (estudiantes con sus
+datos socioeconómicos, académicos y de asistencia). En lugar de consultarlo en
+cada petición, se mantiene un snapshot en memoria que se vuelve a leer cuando
+vence su TTL. Cada snapshot tiene una versión (hash del contenido): si los
+datos no cambiaron se conserva el mismo snapshot y, con él, todos los
+resultados derivados ya calculados (agregaciones, payloads de gráficos).
+"""
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from config import get_config
+from services.supabase_client import supabase_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def roster_version(students):
+    """Hash estable del contenido del padrón (independiente del orden)"""
+    ordered = sorted(students, key=lambda s: str(s.get("id")))
+    payload = json.dumps(ordered, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RosterSnapshot:
+    """
+    Padrón inmutable con resultados derivados memorizados
+    """
+
+    def __init__(self, students, version):
+        self.students = students
+        self.version = version
+        self.fetched_at = datetime.now(timezone.utc)
+        self._derived = {}
+        # Reentrante: un resultado derivado puede depender de otro (agregados -> frame)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.students)
+
+    def derived(self, key, builder):
+        """
+        Resultado derivado del snapshot, calculado una sola vez
+
+        Args:
+            key: Identificador del resultado
+            builder: Función snapshot -> resultado
+        """
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self)
+            return self._derived[key]
+
+
+class RosterSnapshotCache:
+    """
+    Mantiene el snapshot vigente y lo refresca al vencer el TTL
+    """
+
+    def __init__(self, loader, ttl_seconds=300):
+        """
+        Args:
+            loader: Función sin argumentos que retorna la lista de estudiantes
+            ttl_seconds: Segundos antes de volver a consultar el padrón
+        """
+        self._loader = loader
+        self._ttl = max(0.0, float(ttl_seconds))
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Retorna el snapshot vigente (None si nunca se pudo cargar)
+        """
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self._ttl:
+                return self._snapshot
+
+            students = self._loader()
+            self._loaded_at = time.monotonic()
+
+            if not students:
+                if self._snapshot is not None:
+                    logger.warning("Roster reload returned no students, keeping previous snapshot")
+                return self._snapshot
+
+            version = roster_version(students)
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = RosterSnapshot(students, version)
+                logger.info(f"Roster snapshot {version} loaded ({len(students)} students)")
+
+            return self._snapshot
+
+    def peek(self):
+        """
+        Snapshot cargado actualmente, sin volver a consultar el padrón
+
+        No toma el lock: no espera a una recarga en curso.
+        """
+        return self._snapshot
+
+    def invalidate(self):
+        """Fuerza una nueva lectura en el próximo get()"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+
+_roster_cache = None
+_roster_cache_lock = threading.Lock()
+
+
+def get_roster_snapshot():
+    """
+    Retorna el snapshot del padrón usando ROSTER_SNAPSHOT_TTL_SECONDS
+
+    Returns:
+        RosterSnapshot o None si no se pudo cargar
+    """
+    global _roster_cache
+
+    if _roster_cache is None:
+        with _roster_cache_lock:
+            if _roster_cache is None:
+                config = get_config()
+                _roster_cache = RosterSnapshotCache(
+                    lambda: supabase_client.get_students(limit=config.ROSTER_SNAPSHOT_LIMIT),
+                    ttl_seconds=config.ROSTER_SNAPSHOT_TTL_SECONDS,
+                )
+
+    return _roster_cache.get()
+
+
+def current_roster_version():
+    """Versión del snapshot ya cargado (None si aún no se cargó)"""
+    snapshot = _roster_cache.peek() if _roster_cache is not None else None
+    return snapshot.version if snapshot is not None else None
@@ -0,0 +1,334 @@
+"""
+Pipeline de re-scoring de todos los estudiantes
+
+Uso:
+    python -m services.scoring_pipeline \\
+        --snapshot ./analysis/feature_store \\
+        --model ./analysis/comprehensive_model_output/best_model_scorer.npz
+
+Procesa los estudiantes en bloques, cada uno a través de estas etapas:
+1. fetch     - consulta masiva del bloque (el siguiente bloque se precarga en
+               segundo plano mientras se procesa el actual)
+2. features  - lectura de features desde el feature store (O(1) por estudiante)
+3. score     - predict_proba del modelo para el bloque completo + heurística
+               de RiskCalculator
+4. diff      - comparación contra la última predicción guardada
+5. write     - inserción masiva solo de las predicciones que cambiaron
+
+Tras cada bloque se guarda un checkpoint; con --resume se retoma desde el
+último bloque completado. Al terminar se imprime un reporte de tiempos por etapa.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import get_config
+from services.supabase_client import supabase_client
+from services.risk_calculator import risk_calculator
+from services.feature_store import FeatureStore
+from services.model_scorer import LogisticScorer
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("fetch", "features", "score", "diff", "write")
+
+DEFAULT_CHECKPOINT = "./scoring_pipeline.checkpoint.json"
+
+
+class StageTimer:
+    """Acumula tiempo y elementos procesados por etapa"""
+
+    def __init__(self, stages=STAGES):
+        self.stages = OrderedDict(
+            (name, {"seconds": 0.0, "items": 0, "calls": 0}) for name in stages
+        )
+
+    @contextmanager
+    def measure(self, stage, items=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages[stage]
+            entry["seconds"] += time.perf_counter() - start
+            entry["items"] += items
+            entry["calls"] += 1
+
+    def report(self):
+        """Tiempos por etapa con throughput (elementos/segundo)"""
+        return {
+            name: {
+                "seconds": round(entry["seconds"], 3),
+                "items": entry["items"],
+                "calls": entry["calls"],
+                "items_per_second": (
+                    round(entry["items"] / entry["seconds"], 1) if entry["seconds"] else None
+                ),
+            }
+            for name, entry in self.stages.items()
+        }
+
+
+def _load_checkpoint(path):
+    """Lee el checkpoint si existe"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path, state):
+    """Guarda el checkpoint de forma atómica"""
+    if not path:
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _fetch_chunk(timer, index, student_ids):
+    """
+    Etapa fetch: estudiantes del bloque con sus datos relacionados
+
+    Raises:
+        RuntimeError: si la consulta falla (el checkpoint no avanza y
+            --resume reintenta el bloque)
+    """
+    with timer.measure("fetch", len(student_ids)):
+        students = supabase_client.get_students_by_ids(student_ids)
+    if students is None:
+        raise RuntimeError(f"Could not fetch chunk {index}, resume with --resume")
+    return students
+
+
+def _score_chunk(timer, students, store, scorer):
+    """
+    Etapas features + score para un bloque de estudiantes
+
+    Returns:
+        tuple: (predicciones, estudiantes sin features en el snapshot)
+    """
+    student_ids = [s.get("id") for s in students]
+
+    with timer.measure("features", len(students)):
+        records = store.get_many(student_ids) if store is not None else [None] * len(students)
+
+    with timer.measure("score", len(students)):
+        probabilities = {}
+        if scorer is not None:
+            scored = [(sid, r) for sid, r in zip(student_ids, records) if r is not None]
+            if scored:
+                values = scorer.score_records([r for _, r in scored])
+                probabilities = {sid: round(float(p), 4) for (sid, _), p in zip(scored, values)}
+
+        predictions = []
+        for student in students:
+            risk_score, risk_level, _ = risk_calculator.calculate_risk_score(student)
+            prediction = {
+                "student_id": student.get("id"),
+                "risk_score": risk_score,
+                "risk_level": risk_level,
+                "predicted_quintil": risk_calculator.predict_quintil_from_barriers(student),
+            }
+            if prediction["student_id"] in probabilities:
+                prediction["model_probability"] = probabilities[prediction["student_id"]]
+            predictions.append(prediction)
+
+    missing_features = sum(1 for r in records if r is None)
+    return predictions, missing_features
+
+
+def run_pipeline(
+    snapshot,
+    model,
+    chunk_size=500,
+    checkpoint_path=DEFAULT_CHECKPOINT,
+    resume=False,
+    dry_run=False,
+    limit=None,
+):
+    """
+    Re-calcula y guarda las predicciones de todos los estudiantes
+
+    Args:
+        snapshot: Directorio del feature store
+        model: Ruta del artefacto .npz del scorer
+        chunk_size: Estudiantes por bloque
+        checkpoint_path: Archivo de checkpoint (None para desactivarlo)
+        resume: Retomar desde el checkpoint existente
+        dry_run: Calcular y comparar sin escribir en la base de datos
+        limit: Número máximo de estudiantes (None = todos)
+
+    Returns:
+        dict: Reporte con contadores y tiempos por etapa
+    """
+    started = time.perf_counter()
+    timer = StageTimer()
+
+    store = FeatureStore(snapshot)
+    if not len(store):
+        logger.warning(f"Feature store at {snapshot} is empty, model scores will be skipped")
+        store = None
+
+    scorer = None
+    if model and os.path.exists(model):
+        scorer = LogisticScorer.load(model)
+    else:
+        logger.warning(f"Model scorer not found at {model}, using the heuristic only")
+
+    state = _load_checkpoint(checkpoint_path) if resume else None
+    if state is not None:
+        logger.info(
+            f"Resuming from checkpoint {checkpoint_path}: "
+            f"chunk {state['next_chunk']} of {len(state['chunks'])}"
+        )
+    else:
+        with timer.measure("fetch"):
+            student_ids = supabase_client.get_student_ids(limit=limit)
+        if not student_ids:
+            raise RuntimeError("No students to score")
+
+        size = max(1, int(chunk_size))
+        state = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "snapshot": snapshot,
+            "model": model,
+            "chunks": [student_ids[i : i + size] for i in range(0, len(student_ids), size)],
+            "next_chunk": 0,
+            "counts": {"students": 0, "changed": 0, "unchanged": 0, "written": 0, "missing_features": 0},
+        }
+        _save_checkpoint(checkpoint_path, state)
+
+    chunks = state["chunks"]
+    counts = state["counts"]
+
+    # Pre-carga del siguiente bloque mientras se procesa el actual
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring-fetch") as prefetcher:
+        pending = None
+        if state["next_chunk"] < len(chunks):
+            pending = prefetcher.submit(
+                _fetch_chunk, timer, state["next_chunk"], chunks[state["next_chunk"]]
+            )
+
+        for index in range(state["next_chunk"], len(chunks)):
+            students = pending.result()
+            pending = None
+            if index + 1 < len(chunks):
+                pending = prefetcher.submit(_fetch_chunk, timer, index + 1, chunks[index + 1])
+
+            predictions, missing_features = _score_chunk(timer, students, store, scorer)
+
+            with timer.measure("diff", len(predictions)):
+                changed, unchanged = supabase_client.diff_predictions(predictions)
+
+            if changed and not dry_run:
+                with timer.measure("write", len(changed)):
+                    # changed ya está diferenciado: se inserta sin volver a coalescer
+                    saved = supabase_client.save_predictions(changed, coalesce=False)
+                if saved is None:
+                    raise RuntimeError(f"Could not write chunk {index}, resume with --resume")
+                counts["written"] += len(changed)
+
+            counts["students"] += len(students)
+            counts["changed"] += len(changed)
+            counts["unchanged"] += len(unchanged)
+            counts["missing_features"] += missing_features
+
+            state["next_chunk"] = index + 1
+            if not dry_run:
+                _save_checkpoint(checkpoint_path, state)
+
+            logger.info(
+                f"Chunk {index + 1}/{len(chunks)}: {len(students)} students, "
+                f"{len(changed)} changed, {len(unchanged)} unchanged"
+            )
+
+    if checkpoint_path and os.path.exists(checkpoint_path) and not dry_run:
+        os.remove(checkpoint_path)
+
+    return {
+        "started_at": state["started_at"],
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "chunks": len(chunks),
+        "dry_run": dry_run,
+        "model": scorer.name if scorer is not None else None,
+        **counts,
+        "stages": timer.report(),
+    }
+
+
+def _print_report(report):
+    """Imprime el reporte de tiempos por etapa"""
+    print("\n" + "=" * 60)
+    print("SCORING PIPELINE REPORT")
+    print("=" * 60)
+    print(
+        f"Students: {report['students']} | Changed: {report['changed']} | "
+        f"Unchanged: {report['unchanged']} | Written: {report['written']}"
+    )
+    print(f"Missing features: {report['missing_features']} | Model: {report['model']}")
+    print(f"\n{'Stage':<10}{'Seconds':>10}{'Items':>10}{'Items/s':>12}")
+    for name, stage in report["stages"].items():
+        rate = stage["items_per_second"] if stage["items_per_second"] is not None else "-"
+        print(f"{name:<10}{stage['seconds']:>10}{stage['items']:>10}{rate:>12}")
+    print(f"\nWall time: {report['wall_seconds']}s")
+
+
+def main(argv=None):
+    config = get_config()
+
+    parser = argparse.ArgumentParser(description="Re-score all students and store changed predictions")
+    parser.add_argument("--snapshot", default=config.FEATURE_STORE_PATH,
+                        help="Feature store directory")
+    parser.add_argument("--model", default=config.MODEL_SCORER_PATH,
+                        help="NumPy scorer artifact (.npz)")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="Students per chunk")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="Maximum number of students (default: all)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT,
+                        help="Checkpoint file used by --resume")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume from the last completed chunk")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Score and diff without writing to the database")
+    parser.add_argument("--report", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, config.LOG_LEVEL),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    try:
+        report = run_pipeline(
+            args.snapshot,
+            args.model,
+            chunk_size=args.chunk_size,
+            checkpoint_path=args.checkpoint,
+            resume=args.resume,
+            dry_run=args.dry_run,
+            limit=args.limit,
+        )
+    except Exception as e:
+        logger.error(f"Scoring pipeline failed: {str(e)}", exc_info=True)
+        return 1
+
+    _print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
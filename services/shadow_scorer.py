@@ -0,0 +1,220 @@
+"""
+Scoring en modo sombra (shadow) de un modelo candidato
+
+Cada lote de /predict se encola (sin bloquear la respuesta) para que un hilo en
+segundo plano lo puntúe con el modelo principal y con el candidato a partir del
+feature store. Por cada estudiante se registra en un archivo JSON Lines la
+probabilidad de ambos modelos, la diferencia, si coinciden en la clasificación y
+la latencia de cada modelo. Así se valida un modelo reentrenado con tráfico real
+antes de reemplazar al principal.
+
+La cola es acotada: si está llena, el lote se descarta. Los lotes que esperaron
+más que el presupuesto de latencia también se descartan, y los que lo exceden
+al puntuarse se marcan como over_budget.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from config import get_config
+from services.feature_store import get_feature_store
+from services.model_scorer import LogisticScorer, get_model_scorer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowScorer:
+    """
+    Compara un modelo candidato contra el principal en un hilo en segundo plano
+    """
+
+    def __init__(
+        self,
+        primary,
+        candidate,
+        log_path,
+        feature_lookup=get_feature_store,
+        latency_budget_ms=50.0,
+        max_queue_size=1000,
+        agreement_threshold=0.5,
+    ):
+        """
+        Args:
+            primary: LogisticScorer del modelo en producción
+            candidate: LogisticScorer del modelo candidato
+            log_path: Archivo JSON Lines donde se registran las comparaciones
+            feature_lookup: Función que retorna el FeatureStore (o None)
+            latency_budget_ms: Presupuesto por lote (espera en cola + scoring)
+            max_queue_size: Lotes pendientes máximos antes de descartar
+            agreement_threshold: Umbral de probabilidad para comparar clases
+        """
+        self.primary = primary
+        self.candidate = candidate
+        self.log_path = log_path
+        self._feature_lookup = feature_lookup
+        self._budget = max(0.0, float(latency_budget_ms)) / 1000.0
+        self._threshold = float(agreement_threshold)
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_size)))
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "scored": 0,
+            "dropped_queue_full": 0,
+            "dropped_over_budget": 0,
+            "over_budget": 0,
+            "missing_features": 0,
+            "errors": 0,
+        }
+        self._worker = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._worker.start()
+
+    def submit(self, student_ids):
+        """
+        Encola un lote para scoring en sombra (nunca bloquea)
+
+        Returns:
+            bool: False si el lote se descartó por cola llena
+        """
+        try:
+            self._queue.put_nowait((list(student_ids), time.monotonic()))
+        except queue.Full:
+            self._count("dropped_queue_full")
+            return False
+
+        self._count("submitted")
+        return True
+
+    def stats(self):
+        """Contadores del modo sombra"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        """Bucle del hilo en segundo plano"""
+        while True:
+            student_ids, enqueued_at = self._queue.get()
+            try:
+                self._score(student_ids, enqueued_at)
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"Shadow scoring failed for {len(student_ids)} students: {str(e)}")
+
+    def _score(self, student_ids, enqueued_at):
+        """Puntúa un lote con ambos modelos y registra la comparación"""
+        started = time.monotonic()
+        queue_wait = started - enqueued_at
+        if queue_wait > self._budget:
+            self._count("dropped_over_budget")
+            return
+
+        store = self._feature_lookup()
+        records = store.get_many(student_ids) if store is not None else [None] * len(student_ids)
+        found = [(sid, r) for sid, r in zip(student_ids, records) if r is not None]
+        self._count("missing_features", len(student_ids) - len(found))
+        if not found:
+            return
+
+        features = [r for _, r in found]
+
+        t0 = time.perf_counter()
+        primary_scores = self.primary.score_records(features)
+        t1 = time.perf_counter()
+        candidate_scores = self.candidate.score_records(features)
+        t2 = time.perf_counter()
+
+        over_budget = (time.monotonic() - enqueued_at) > self._budget
+        if over_budget:
+            self._count("over_budget")
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        lines = []
+        for (student_id, _), primary_p, candidate_p in zip(found, primary_scores, candidate_scores):
+            primary_p = float(primary_p)
+            candidate_p = float(candidate_p)
+            lines.append(
+                json.dumps(
+                    {
+                        "timestamp": timestamp,
+                        "student_id": student_id,
+                        "primary_model": self.primary.name,
+                        "candidate_model": self.candidate.name,
+                        "primary_probability": round(primary_p, 4),
+                        "candidate_probability": round(candidate_p, 4),
+                        "delta": round(candidate_p - primary_p, 4),
+                        "agree": (primary_p >= self._threshold) == (candidate_p >= self._threshold),
+                        "primary_latency_ms": round((t1 - t0) * 1000, 3),
+                        "candidate_latency_ms": round((t2 - t1) * 1000, 3),
+                        "queue_wait_ms": round(queue_wait * 1000, 3),
+                        "batch_size": len(found),
+                        "over_budget": over_budget,
+                    }
+                )
+            )
+
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        self._count("scored", len(found))
+
+
+_shadow = None
+_shadow_lock = threading.Lock()
+_shadow_disabled = False
+
+
+def get_shadow_scorer():
+    """
+    Retorna el scorer en sombra si SHADOW_MODEL_PATH está configurado
+
+    Returns:
+        ShadowScorer o None si el modo sombra está desactivado o no se pudo
+        cargar alguno de los modelos
+    """
+    global _shadow, _shadow_disabled
+
+    if _shadow is not None or _shadow_disabled:
+        return _shadow
+
+    with _shadow_lock:
+        if _shadow is not None or _shadow_disabled:
+            return _shadow
+
+        config = get_config()
+        if not config.SHADOW_MODEL_PATH:
+            _shadow_disabled = True
+            return None
+
+        primary = get_model_scorer()
+        if primary is None:
+            logger.warning("Shadow scoring disabled: primary model scorer not available")
+            _shadow_disabled = True
+            return None
+
+        try:
+            candidate = LogisticScorer.load(config.SHADOW_MODEL_PATH)
+        except Exception as e:
+            logger.error(f"Shadow scoring disabled: cannot load {config.SHADOW_MODEL_PATH}: {str(e)}")
+            _shadow_disabled = True
+            return None
+
+        _shadow = ShadowScorer(
+            primary,
+            candidate,
+            config.SHADOW_LOG_PATH,
+            latency_budget_ms=config.SHADOW_LATENCY_BUDGET_MS,
+            max_queue_size=config.SHADOW_QUEUE_SIZE,
+            agreement_threshold=config.SHADOW_AGREEMENT_THRESHOLD,
+        )
+        logger.info(f"Shadow scoring enabled with candidate {config.SHADOW_MODEL_PATH}")
+
+    return _shadow
@@ -0,0 +1,117 @@
+"""
+Taxonomía de materias compartida
+
+Convierte los nombres de materia tal como llegan de la base de datos o de los
+CSV ("MATEMÁTICA", "Estudios sociales", "Animación lectura", ...) en códigos
+enteros internados. La comparación se hace sobre el nombre plegado (casefold,
+sin tildes y con espacios normalizados) y el resultado se memoiza por nombre
+crudo, así que cada variante se resuelve una sola vez por proceso. Las materias
+que no están en el catálogo reciben un código nuevo la primera vez que
+aparecen, de modo que sus variantes de mayúsculas/tildes también se agrupan.
+
+Las rutas, el RosterFrame y los scripts de entrenamiento usan esta misma
+taxonomía, y las agregaciones por materia son bincounts sobre los códigos.
+"""
+import threading
+import unicodedata
+import numpy as np
+
+# Materias del catálogo: nombre canónico -> variantes adicionales
+SUBJECTS = {
+    "Matemáticas": ("Matemática",),
+    "Lengua y Literatura": ("Lengua", "Animación lectura"),
+    "Ciencias Naturales": (),
+    "Estudios Sociales": (),
+    "Inglés": (),
+    "Física": (),
+    "Química": (),
+    "Biología": (),
+    "Historia": (),
+    "Filosofía": (),
+    "Educación ciudadanía": ("Educación para la ciudadanía",),
+    "Emprendimiento": ("Emprendimiento y gestión",),
+    "Educación Física": (),
+    "Educación Cultural y Artística": (),
+    "Acompañamiento": (),
+    "PPE": (),
+}
+
+# Clases de apoyo que no son materias académicas
+NON_ACADEMIC_SUBJECTS = ("Acompañamiento", "PPE")
+
+
+def fold(name):
+    """Forma de comparación de un nombre: casefold, sin tildes y espacios simples"""
+    decomposed = unicodedata.normalize("NFKD", str(name).casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.split())
+
+
+class SubjectTaxonomy:
+    """
+    Nombres de materia -> códigos enteros estables dentro del proceso
+    """
+
+    def __init__(self, subjects=SUBJECTS, non_academic=NON_ACADEMIC_SUBJECTS):
+        self.names = []
+        self._by_fold = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+        for canonical, aliases in subjects.items():
+            code = self._intern(canonical)
+            for alias in aliases:
+                self._by_fold[fold(alias)] = code
+        self._non_academic = frozenset(self.code(name) for name in non_academic)
+
+    def _intern(self, name):
+        key = fold(name)
+        code = self._by_fold.get(key)
+        if code is None:
+            code = self._by_fold[key] = len(self.names)
+            self.names.append(" ".join(str(name).split()))
+        return code
+
+    def code(self, raw):
+        """
+        Código de un nombre de materia
+
+        Returns:
+            int (-1 si el nombre está vacío)
+        """
+        code = self._memo.get(raw)
+        if code is not None:
+            return code
+        if raw is None or not str(raw).strip():
+            return -1
+        with self._lock:
+            code = self._memo[raw] = self._intern(raw)
+        return code
+
+    def codes(self, raws):
+        """Códigos de una secuencia de nombres (array int64)"""
+        return np.fromiter((self.code(raw) for raw in raws), dtype=np.int64)
+
+    def name(self, code):
+        """Nombre canónico de un código (None para -1)"""
+        return self.names[code] if code >= 0 else None
+
+    def canonical(self, raw):
+        """Nombre canónico de un nombre crudo (None si está vacío)"""
+        return self.name(self.code(raw))
+
+    def is_academic(self, code):
+        return code >= 0 and code not in self._non_academic
+
+    def academic_mask(self, codes):
+        """Máscara de los códigos de materias académicas"""
+        codes = np.asarray(codes)
+        return (codes >= 0) & ~np.isin(codes, list(self._non_academic))
+
+    def code_set(self, names):
+        """Conjunto de códigos de una lista de nombres"""
+        return frozenset(self.code(name) for name in names)
+
+
+# Instancia global
+subject_taxonomy = SubjectTaxonomy()
@@ -1,8 +1,10 @@
 """
 Cliente de Supabase para interactuar con la base de datos
 """
+from datetime import datetime, timezone
 from supabase import create_client, Client
 from config import get_config
+from services.prediction_cache import LastPredictionCache, prediction_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,6 +36,9 @@ class SupabaseClient:
             )
 
         self._client = create_client(url, key)
+        self._prediction_cache = LastPredictionCache(
+            config.PREDICTION_CACHE_SIZE, config.PREDICTION_CACHE_TTL
+        )
         logger.info(f"Supabase client initialized successfully (using {'SERVICE_KEY' if config.SUPABASE_SERVICE_KEY else 'ANON_KEY'})")
 
     @property
@@ -100,72 +105,160 @@ class SupabaseClient:
             logger.error(f"Error getting student {student_id}: {str(e)}", exc_info=True)
             return None
 
-    def get_institutional_stats(self):
+    def get_student_ids(self, limit=None, page_size=1000):
         """
-        Obtiene estadísticas institucionales agregadas
+        Obtiene solo los IDs de los estudiantes (consulta liviana)
         
+        Pagina por id (keyset: id > último id de la página anterior) para no
+        quedar truncado por el máximo de filas por respuesta de PostgREST.
+        
+        Args:
+            limit: Número máximo de IDs a retornar (None = todos)
+            page_size: IDs por consulta
+            
         Returns:
-            Diccionario con estadísticas
+            Lista de IDs ordenada, o None si alguna página falla (nunca una
+            lista parcial)
         """
+        ids = []
         try:
-            # Obtener todos los estudiantes con sus datos
-            students = self.get_students(limit=1000)
-
-            stats = {
-                "total_students": len(students),
-                "quintil_distribution": self._calculate_quintil_distribution(students),
-                "risk_distribution": self._calculate_risk_distribution(students),
-                "average_grade": self._calculate_average_grade(students),
-            }
-
-            return stats
+            while limit is None or len(ids) < limit:
+                size = page_size if limit is None else min(page_size, limit - len(ids))
+                query = self._client.table("students").select("id")
+                if ids:
+                    query = query.gt("id", ids[-1])
+                response = query.order("id").limit(size).execute()
+                page = [row["id"] for row in response.data]
+                # Una página corta no implica el final (el servidor puede recortarla a su max-rows)
+                if not page:
+                    break
+                ids.extend(page)
+            return ids
         except Exception as e:
-            logger.error(f"Error getting institutional stats: {str(e)}")
+            logger.error(f"Error getting student ids after {len(ids)} rows: {str(e)}", exc_info=True)
             return None
 
-    def _calculate_quintil_distribution(self, students):
-        """Calcula la distribución por quintil"""
-        distribution = {"Q1-Q2": 0, "Q3": 0, "Q4-Q5": 0}
-
-        for student in students:
-            quintil_group = (student.get("quintil_agrupado") or "").lower()
-            if "bajo" in quintil_group:
-                distribution["Q1-Q2"] += 1
-            elif "medio" in quintil_group:
-                distribution["Q3"] += 1
-            elif "alto" in quintil_group or "acomodado" in quintil_group:
-                distribution["Q4-Q5"] += 1
+    def get_students_by_ids(self, student_ids):
+        """
+        Obtiene varios estudiantes en una sola consulta
+        
+        Args:
+            student_ids: Lista de IDs de estudiantes
+            
+        Returns:
+            Lista de estudiantes encontrados (sin orden garantizado), o None si
+            la consulta falla
+        """
+        if not student_ids:
+            return []
 
-        return distribution
+        try:
+            response = (
+                self._client.table("students")
+                .select(
+                    """
+                    *,
+                    socioeconomic_data(*),
+                    academic_performance(*),
+                    attendance(*)
+                """
+                )
+                .in_("id", list(student_ids))
+                .execute()
+            )
+            return response.data
+        except Exception as e:
+            logger.error(f"Error getting {len(student_ids)} students: {str(e)}", exc_info=True)
+            return None
 
-    def _calculate_risk_distribution(self, students):
-        """Calcula la distribución por nivel de riesgo"""
-        from services.risk_calculator import risk_calculator
+    def get_predictions(
+        self,
+        student_id=None,
+        date_from=None,
+        date_to=None,
+        risk_level=None,
+        model_version=None,
+        after=None,
+        limit=50,
+    ):
+        """
+        Obtiene el historial de predicciones con paginación keyset
         
-        distribution = {"Alto": 0, "Medio": 0, "Bajo": 0}
+        Las filas se ordenan por (prediction_date, id) descendente. En lugar de
+        OFFSET se usa la última fila de la página anterior como límite, de modo
+        que cada página se lee directamente del índice compuesto correspondiente
+        sin importar qué tan profunda sea.
+        
+        Args:
+            student_id: Filtrar por estudiante
+            date_from: Fecha mínima (ISO 8601, inclusiva)
+            date_to: Fecha máxima (ISO 8601, inclusiva)
+            risk_level: Filtrar por nivel de riesgo
+            model_version: Filtrar por versión del modelo
+            after: Tupla (prediction_date, id) de la última fila ya entregada
+            limit: Número máximo de filas
+            
+        Returns:
+            Lista de predicciones (hasta limit + 1 filas, para detectar si hay
+            más páginas) o None si la consulta falla
+        """
+        try:
+            query = self._client.table("risk_predictions").select("*")
 
-        for student in students:
-            try:
-                _, risk_level, _ = risk_calculator.calculate_risk_score(student)
-                distribution[risk_level] = distribution.get(risk_level, 0) + 1
-            except Exception as e:
-                logger.debug(f"Error calculating risk for student {student.get('id')}: {e}")
-                distribution["Bajo"] += 1
+            if student_id:
+                query = query.eq("student_id", student_id)
+            if risk_level:
+                query = query.eq("risk_level", risk_level)
+            if model_version:
+                query = query.eq("model_version", model_version)
+            if date_from:
+                query = query.gte("prediction_date", date_from)
+            if date_to:
+                query = query.lte("prediction_date", date_to)
 
-        return distribution
+            if after:
+                last_date, last_id = after
+                query = query.or_(
+                    f'prediction_date.lt."{last_date}",'
+                    f'and(prediction_date.eq."{last_date}",id.lt.{int(last_id)})'
+                )
 
-    def _calculate_average_grade(self, students):
-        """Calcula el promedio general de calificaciones"""
-        total_grade = 0
-        count = 0
+            response = (
+                query.order("prediction_date", desc=True)
+                .order("id", desc=True)
+                .limit(limit + 1)
+                .execute()
+            )
+            return response.data
+        except Exception as e:
+            logger.error(f"Error getting predictions: {str(e)}", exc_info=True)
+            return None
 
-        for student in students:
-            grade = student.get("promedio_general")
-            if grade:
-                total_grade += float(grade)
-                count += 1
+    def get_latest_predictions(self, student_ids):
+        """
+        Obtiene la última predicción guardada de cada estudiante
+        (vista latest_risk_predictions)
+        
+        Args:
+            student_ids: Lista de IDs de estudiantes
+            
+        Returns:
+            Lista con a lo sumo una fila por estudiante o None si falla
+        """
+        if not student_ids:
+            return []
 
-        return round(total_grade / count, 2) if count > 0 else 0.0
+        try:
+            response = (
+                self._client.table("latest_risk_predictions")
+                .select("*")
+                .in_("student_id", list(student_ids))
+                .execute()
+            )
+            return response.data
+        except Exception as e:
+            logger.error(f"Error getting latest predictions: {str(e)}")
+            return None
 
     def save_prediction(self, student_id, risk_score, risk_level, predicted_quintil):
         """
@@ -177,23 +270,169 @@ class SupabaseClient:
             risk_level: Nivel de riesgo (Alto/Medio/Bajo)
             predicted_quintil: Quintil predicho por el modelo
         """
+        return self.save_predictions(
+            [
+                {
+                    "student_id": student_id,
+                    "risk_score": risk_score,
+                    "risk_level": risk_level,
+                    "predicted_quintil": predicted_quintil,
+                }
+            ]
+        )
+
+    def save_predictions(self, predictions, coalesce=True):
+        """
+        Guarda varias predicciones con una única inserción
+        
+        Si PREDICTION_WRITE_COALESCING está activo, las predicciones iguales a la
+        última guardada del estudiante (mismo score, nivel, quintil y versión del
+        modelo) no se insertan de nuevo. Con PREDICTION_HEARTBEAT solo se
+        actualiza su prediction_date.
+        
+        Args:
+            predictions: Lista de diccionarios con student_id, risk_score,
+                risk_level, predicted_quintil y opcionalmente model_probability
+            coalesce: False para insertar todas sin comparar (predicciones ya
+                separadas con diff_predictions)
+        
+        Returns:
+            Filas insertadas o coalescidas, o None si la escritura falla
+        """
+        if not predictions:
+            return []
+
+        config = get_config()
+
+        if coalesce and config.PREDICTION_WRITE_COALESCING:
+            to_insert, unchanged = self.diff_predictions(predictions)
+        else:
+            to_insert, unchanged = self._prediction_rows(predictions), []
+
         try:
-            config = get_config()
-            data = {
-                "student_id": student_id,
-                "risk_score": risk_score,
-                "risk_level": risk_level,
-                "predicted_quintil": predicted_quintil,
-                "model_version": config.MODEL_VERSION,
-            }
-
-            response = self._client.table("risk_predictions").insert(data).execute()
-            logger.info(f"Prediction saved for student {student_id}")
-            return response.data
+            inserted = []
+            if to_insert:
+                response = (
+                    self._client.table("risk_predictions").insert(to_insert).execute()
+                )
+                inserted = response.data or []
+                for row in inserted:
+                    self._prediction_cache.put(row)
         except Exception as e:
-            logger.error(f"Error saving prediction for {student_id}: {str(e)}")
+            logger.error(f"Error saving {len(to_insert)} predictions: {str(e)}")
             return None
 
+        # El heartbeat no invalida la inserción: si falla, las filas sin cambios
+        # siguen siendo la última predicción guardada
+        if unchanged and config.PREDICTION_HEARTBEAT:
+            try:
+                unchanged = self._touch_predictions(unchanged)
+            except Exception as e:
+                logger.warning(
+                    f"Error refreshing prediction_date of {len(unchanged)} "
+                    f"unchanged predictions: {str(e)}"
+                )
+
+        logger.info(
+            f"Predictions saved: {len(inserted)} inserted, "
+            f"{len(unchanged)} unchanged (coalesced)"
+        )
+        return inserted + unchanged
+
+    def diff_predictions(self, predictions):
+        """
+        Separa las predicciones que cambiaron respecto a la última guardada
+
+        Args:
+            predictions: Lista de diccionarios con student_id, risk_score,
+                risk_level, predicted_quintil y opcionalmente model_probability
+
+        Returns:
+            tuple: (filas nuevas a insertar, últimas filas guardadas sin cambios)
+        """
+        rows = self._prediction_rows(predictions)
+        last_rows = self._latest_prediction_rows([row["student_id"] for row in rows])
+
+        changed = []
+        unchanged = []
+        for row in rows:
+            last = last_rows.get(row["student_id"])
+            if last is not None and prediction_key(last) == prediction_key(row):
+                unchanged.append(last)
+            else:
+                changed.append(row)
+        return changed, unchanged
+
+    def _prediction_rows(self, predictions):
+        """Filas a insertar, una por estudiante: (student_id, prediction_date) es único"""
+        rows = {}
+        for p in predictions:
+            rows[p["student_id"]] = self._prediction_row(
+                p["student_id"],
+                p["risk_score"],
+                p["risk_level"],
+                p["predicted_quintil"],
+                p.get("model_probability"),
+            )
+        rows = list(rows.values())
+
+        # Una inserción masiva requiere las mismas columnas en todas las filas
+        if any("model_probability" in row for row in rows):
+            for row in rows:
+                row.setdefault("model_probability", None)
+        return rows
+
+    def _latest_prediction_rows(self, student_ids):
+        """
+        Última predicción guardada de cada estudiante: de la caché si la entrada
+        está vigente (PREDICTION_CACHE_TTL), si no releída de latest_risk_predictions
+        """
+        last_rows = self._prediction_cache.latest(student_ids)
+        missing = [sid for sid in student_ids if sid not in last_rows]
+        if not missing:
+            return last_rows
+
+        for row in self.get_latest_predictions(missing) or []:
+            self._prediction_cache.put(row)
+            last_rows[row["student_id"]] = row
+        return last_rows
+
+    def _touch_predictions(self, rows):
+        """
+        Actualiza prediction_date de predicciones sin cambios (heartbeat)
+        
+        Returns:
+            Filas actualizadas
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        response = (
+            self._client.table("risk_predictions")
+            .update({"prediction_date": now})
+            .in_("id", [row["id"] for row in rows])
+            .execute()
+        )
+        updated = response.data or []
+        for row in updated:
+            self._prediction_cache.put(row)
+        return updated
+
+    def _prediction_row(
+        self, student_id, risk_score, risk_level, predicted_quintil, model_probability=None
+    ):
+        """Construye la fila a insertar en risk_predictions"""
+        config = get_config()
+        row = {
+            "student_id": student_id,
+            "risk_score": risk_score,
+            "risk_level": risk_level,
+            "predicted_quintil": predicted_quintil,
+            "model_version": config.MODEL_VERSION,
+        }
+        # Solo el pipeline de scoring calcula la probabilidad del modelo
+        if model_probability is not None:
+            row["model_probability"] = model_probability
+        return row
+
 
 # Instancia global del cliente
 supabase_client = SupabaseClient()
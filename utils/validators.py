@@ -70,6 +70,44 @@ def validate_risk_level(risk_level):
     return risk_level in valid_levels
 
 
+def validate_probability(value):
+    """
+    Valida que un valor sea una probabilidad (0-1)
+    
+    Args:
+        value: Valor a validar
+    
+    Returns:
+        bool: True si es válido
+    """
+    if isinstance(value, bool):
+        return False
+    try:
+        value_float = float(value)
+        return 0.0 <= value_float <= 1.0
+    except (ValueError, TypeError):
+        return False
+
+
+def validate_positive_number(value):
+    """
+    Valida que un valor sea un número positivo (> 0)
+    
+    Args:
+        value: Valor a validar
+    
+    Returns:
+        bool: True si es válido
+    """
+    if isinstance(value, bool):
+        return False
+    try:
+        value_float = float(value)
+        return 0.0 < value_float < float("inf")
+    except (ValueError, TypeError):
+        return False
+
+
 def sanitize_string(text):
     """
     Limpia y sanitiza un string